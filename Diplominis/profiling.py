@@ -0,0 +1,270 @@
+"""
+profiling modulis matuoja kiekvienos (atrinktos) užklausos SQL, šablonų ir likusio view kodo trukmę.
+
+ProfilingMiddleware rezultatus grąžina Server-Timing antraštėje (matosi naršyklės DevTools), o užklausas,
+trukusias ilgiau nei SLOW_THRESHOLD_MS, su jų SQL ir pasikartojančių užklausų atspaudais įrašo į
+"Diplominis.profiling" žurnalą JSON formatu.
+
+Nustatymai (settings.PROFILING):
+    - SAMPLE_RATE - kokia užklausų dalis profiliuojama (0.0 - 1.0). Neatrinktoms užklausoms matuojama tik bendra
+      trukmė (be SQL ir šablonų matavimų ir be Server-Timing antraštės).
+    - SLOW_THRESHOLD_MS - nuo kokios trukmės užklausa įrašoma į žurnalą. Įrašomos visos lėtos užklausos, neatrinktos -
+      tik su bendra trukme, be SQL.
+    - SERVER_TIMING - kam pridėti Server-Timing antraštę: 'staff' (numatyta) - tik personalui (is_staff) arba kai
+      DEBUG įjungtas, True - visiems, False - niekam. Antraštė atskleidžia SQL užklausų kiekį ir trukmes,
+      todėl anoniminiams lankytojams produkcijoje ji nerodoma.
+    - MAX_QUERIES - kiek daugiausiai SQL užklausų tekstų saugoti vienai užklausai.
+
+Šablonų trukmei matuoti TEMPLATES nustatyme reikia naudoti ProfilingDjangoTemplates.
+
+SQL matuojamas per vieną execute_wrapper, kuris įdiegiamas kiekvienam prisijungimui (ir sukurtam kitose gijose,
+pvz. async view lygiagrečioms užklausoms) ir skaito profilį iš ContextVar, todėl veikia ir WSGI, ir ASGI režimu.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SAMPLE_RATE': 0.01,
+    'SLOW_THRESHOLD_MS': 500,
+    'SERVER_TIMING': 'staff',
+    'MAX_QUERIES': 200,
+}
+
+_current = ContextVar('profiling_request', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+def server_timing_allowed(config, user):
+    """
+    server_timing_allowed() nusprendžia, ar šiam vartotojui rodyti Server-Timing antraštę (žr. SERVER_TIMING).
+    """
+    if config['SERVER_TIMING'] != 'staff':
+        return bool(config['SERVER_TIMING'])
+
+    return settings.DEBUG or (user is not None and user.is_staff)
+
+
+def fingerprint(sql):
+    """
+    fingerprint() gražina SQL užklausos atspaudą: be reikšmių, su sutrauktais IN (...) sąrašais.
+    Vienodi atspaudai toje pačioje užklausoje dažniausiai reiškia N+1 problemą.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    """
+    RequestProfile kaupia vienos užklausos matavimus.
+    """
+
+    def __init__(self, max_queries):
+        self.max_queries = max_queries
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.queries = []
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            with self.lock:
+                self.sql_count += 1
+                self.sql_time += duration
+                if len(self.queries) < self.max_queries:
+                    self.queries.append((sql, duration))
+
+    def duplicates(self):
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return [{'fingerprint': sql, 'count': count} for sql, count in counts.most_common() if count > 1]
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    record_query() yra execute_wrapper, perduodantis užklausą einamajam profiliui (jei užklausa atrinkta).
+    """
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    return profile(execute, sql, params, many, context)
+
+
+def install_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_wrapper)
+
+
+class ProfilingTemplate(Template):
+    """
+    ProfilingTemplate prideda šablono atvaizdavimo trukmę prie einamosios užklausos profilio.
+    Įdėti šablonai (pvz. crispy forms) įskaičiuojami tik į išorinio šablono trukmę.
+    """
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_depth -= 1
+            if profile.template_depth == 0:
+                profile.template_time += time.perf_counter() - started
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """
+    ProfilingDjangoTemplates yra įprastas Django šablonų variklis, kurio šablonai matuoja atvaizdavimo trukmę.
+    """
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return ProfilingTemplate(super().get_template(template_name).template, self)
+
+
+class ProfilingMiddleware:
+    """
+    ProfilingMiddleware turi būti pirmas MIDDLEWARE sąraše, kad bendra trukmė apimtų visus kitus middleware.
+    Veikia ir su sinchroniniais, ir su async view (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        config = get_config()
+        started = time.perf_counter()
+
+        if random.random() >= config['SAMPLE_RATE']:
+            return self.finish_unsampled(request, self.get_response(request), config, started)
+
+        # prisijungimai sukurti prieš įkeliant šį modulį negavo connection_created signalo
+        for alias in connections:
+            install_wrapper(connections[alias])
+
+        profile = RequestProfile(config['MAX_QUERIES'])
+        token = _current.set(profile)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        timing = server_timing_allowed(config, getattr(request, 'user', None))
+        return self.finish(request, response, profile, config, started, timing)
+
+    async def __acall__(self, request):
+        config = get_config()
+        started = time.perf_counter()
+
+        if random.random() >= config['SAMPLE_RATE']:
+            return self.finish_unsampled(request, await self.get_response(request), config, started)
+
+        profile = RequestProfile(config['MAX_QUERIES'])
+        token = _current.set(profile)
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        user = await request.auser() if hasattr(request, 'auser') else None
+        timing = server_timing_allowed(config, user)
+        return self.finish(request, response, profile, config, started, timing)
+
+    def finish(self, request, response, profile, config, started, timing):
+        total = time.perf_counter() - started
+        view = max(total - profile.sql_time - profile.template_time, 0.0)
+
+        if timing:
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={profile.sql_time * 1000:.1f};desc="{profile.sql_count} queries"',
+                f'tpl;dur={profile.template_time * 1000:.1f}',
+                f'view;dur={view * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        if total * 1000 >= config['SLOW_THRESHOLD_MS']:
+            self.log_slow_request(request, response, total, profile, view)
+
+        return response
+
+    def finish_unsampled(self, request, response, config, started):
+        """
+        finish_unsampled() įrašo lėtą neatrinktą užklausą tik su bendra trukme, kad žurnalas apimtų visas lėtas
+        užklausas, o ne tik SAMPLE_RATE jų dalį.
+        """
+        total = time.perf_counter() - started
+
+        if total * 1000 >= config['SLOW_THRESHOLD_MS']:
+            self.log_slow_request(request, response, total)
+
+        return response
+
+    def log_slow_request(self, request, response, total, profile=None, view=None):
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sampled': profile is not None,
+        }
+
+        if profile is not None:
+            entry.update({
+                'sql_ms': round(profile.sql_time * 1000, 1),
+                'sql_count': profile.sql_count,
+                'template_ms': round(profile.template_time * 1000, 1),
+                'view_ms': round(view * 1000, 1),
+                'duplicates': profile.duplicates(),
+                'queries': [
+                    {'sql': sql, 'ms': round(duration * 1000, 2)} for sql, duration in profile.queries
+                ],
+            })
+
+        logger.warning(json.dumps(entry, ensure_ascii=False))
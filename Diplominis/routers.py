@@ -0,0 +1,151 @@
+"""
+routers modulis skirsto užklausas tarp pagrindinės (default) ir skaitymo kopijos (replica) duomenų bazių.
+
+Į kopiją siunčiami tik Vyrtuve modelių skaitymai GET/HEAD užklausose, kurias praleido ReplicaMiddleware.
+Visa kita (rašymai, POST užklausos, foninės užduotys, valdymo komandos, shell) naudoja pagrindinę bazę, todėl
+kopijos vėlavimas negali sugadinti duomenų. Kai užklausa ką nors įrašo, vartotojui nustatomas slapukas ir jo
+užklausos REPLICA_STICKY_SECONDS sekundžių skaito iš pagrindinės bazės, kad jis iškart matytų savo pakeitimus.
+
+Kopija naudojama tik jei DATABASES turi 'replica' (žr. settings.py ir `manage.py sync_replica`).
+
+Kopija gali atsilikti nuo podėlio versijų (Vyrtuve/caching.py), kurias signalai padidina iškart po rašymo.
+Todėl iš kopijos perskaityti duomenys podėlyje laikomi su kopijos versija (replica_generation), kuri pasikeičia
+kiekvieną kartą atnaujinus kopiją, ir nepakeičia iš pagrindinės bazės suskaičiuotų įrašų.
+"""
+import os
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_APPS = {'Vyrtuve'}
+STICKY_COOKIE = 'vyrtuve_primary'
+
+_state = ContextVar('database_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def database_path(alias):
+    """
+    database_path() gražina SQLite failo kelią (be "file:" ir URI parametrų).
+    """
+    name = str(settings.DATABASES[alias]['NAME'])
+
+    if name.startswith('file:'):
+        name = name[len('file:'):].split('?', 1)[0]
+
+    return name
+
+
+def replica_generation():
+    """
+    replica_generation() gražina kopijos failo pakeitimo laiką, jei ši užklausa skaito iš kopijos, kitaip None.
+    sync_replica kopiją pakeičia nauju failu, todėl laikas pasikeičia po kiekvieno atnaujinimo.
+    """
+    state = _state.get()
+    if state is None or not state.use_replica:
+        return None
+
+    try:
+        return os.stat(database_path(REPLICA_DB_ALIAS)).st_mtime_ns
+    except OSError:
+        return None
+
+
+class PrimaryReplicaRouter:
+    """
+    PrimaryReplicaRouter skaitymus leidžiamose užklausose nukreipia į kopiją, o rašymus - į pagrindinę bazę.
+    Po pirmo rašymo likusi užklausos dalis skaito iš pagrindinės bazės.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+
+        if state is not None and state.use_replica and model._meta.app_label in REPLICA_APPS:
+            return REPLICA_DB_ALIAS
+
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+
+        if state is not None:
+            state.use_replica = False
+            state.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # kopija yra tos pačios bazės kopija, todėl ryšiai tarp jų objektų leidžiami
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    ReplicaMiddleware leidžia skaityti iš kopijos tik saugioms (GET/HEAD) užklausoms be "lipnaus" slapuko
+    ir nustato slapuką, jei užklausa ką nors įrašė. Būsena laikoma ContextVar, todėl ją mato ir async view
+    užklausos, vykdomos kitose gijose (sync_to_async kopijuoja kontekstą).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = self.routing_state(request)
+        token = _state.set(state)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = self.routing_state(request)
+        token = _state.set(state)
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        return self.finish(state, response)
+
+    def routing_state(self, request):
+        use_replica = (
+            replica_configured()
+            and request.method in ('GET', 'HEAD')
+            and STICKY_COOKIE not in request.COOKIES
+        )
+        return RoutingState(use_replica)
+
+    def finish(self, state, response):
+        if state.wrote and replica_configured():
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+
+        return response
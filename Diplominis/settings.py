@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    'Diplominis.profiling.ProfilingMiddleware',
+    'Diplominis.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +61,7 @@ ROOT_URLCONF = 'Diplominis.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'Diplominis.profiling.ProfilingDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,13 +81,64 @@ WSGI_APPLICATION = 'Diplominis.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite rašytojams: WAL leidžia skaityti rašymo metu, busy_timeout laukia užrakto vietoj "database is locked",
+# o IMMEDIATE transakcijos užrakinamos pradžioje, todėl perskaičiusios ir rašančios transakcijos (Reitingas.upsert)
+# viena kitos nelenkia ir laukimas veikia (DEFERRED transakcija užrakto nelaukia, jei jau ką nors perskaitė).
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA busy_timeout=5000',
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # testai su lygiagrečiais rašytojais (Vyrtuve/tests.py) reikalauja bazės failo, o ne atminties bazės
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Skaitymo kopija (Diplominis/routers.py) įjungiama nurodžius VYRTUVE_REPLICA_DB kelią, pvz. db_replica.sqlite3.
+# Vietiniam bandymui kopiją atnaujina `manage.py sync_replica`; ji atidaroma tik skaitymui.
+if os.environ.get('VYRTUVE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{os.environ['VYRTUVE_REPLICA_DB']}?mode=ro",
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['Diplominis.routers.PrimaryReplicaRouter']
+
+# Kiek sekundžių po savo rašymo vartotojas skaito iš pagrindinės bazės
+REPLICA_STICKY_SECONDS = 10
+
+# Async index, recepto ir viešo profilio view (Vyrtuve/urls.py). Įjungti tik paleidus per ASGI serverį
+# (pvz. uvicorn Diplominis.asgi:application), nes per WSGI async view vykdomas per papildomą įvykių ciklą.
+VYRTUVE_ASYNC_VIEWS = os.environ.get('VYRTUVE_ASYNC_VIEWS') == '1'
+
+# Statinės recepto ir sąrašo puslapių kopijos anoniminiams lankytojams (Vyrtuve/prerender.py).
+# Įjungiama nurodžius katalogą, kurį priekinis serveris pateikia tiesiogiai, pvz. VYRTUVE_PRERENDER_ROOT=prerendered
+VYRTUVE_PRERENDER = {
+    'ROOT': os.environ.get('VYRTUVE_PRERENDER_ROOT'),
+    'INDEX_PAGES': 3,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Keliems procesams reikia bendro podėlio, pvz. 'django.core.cache.backends.filebased.FileBasedCache'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vyrtuve',
     }
 }
 
+# Receptų sąrašo puslapių podėlis (Vyrtuve/caching.py)
+VYRTUVE_LISTING_CACHE = 'default'
+VYRTUVE_LISTING_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -128,6 +181,48 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Foninių užduočių eilė (Vyrtuve/jobs.py): ImmediateBackend, LocalBackend (OPTIONS: DELAY, MAX_ATTEMPTS)
+# arba DatabaseBackend (OPTIONS: MAX_ATTEMPTS). Nepavykusias užduotis vykdo `manage.py run_jobs`
+VYRTUVE_JOBS = {
+    'BACKEND': 'Vyrtuve.jobs.LocalBackend',
+    'OPTIONS': {
+        'DELAY': 0.5,
+    },
+}
+
+# Užklausų profiliavimas (Diplominis/profiling.py): Server-Timing antraštė ir lėtų užklausų žurnalas
+PROFILING = {
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.01,
+    'SLOW_THRESHOLD_MS': 500,
+    # 'staff' - antraštė rodoma tik personalui arba kai DEBUG įjungtas
+    'SERVER_TIMING': 'staff',
+    'MAX_QUERIES': 200,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {
+            'format': '{"time": "%(asctime)s", "request": %(message)s}',
+        },
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'slow_requests.log',
+            'formatter': 'json_line',
+        },
+    },
+    'loggers': {
+        'Diplominis.profiling': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 LOGOUT_REDIRECT_URL = 'index'
 LOGIN_REDIRECT_URL = '/'
 MEDIA_URL = '/media/'
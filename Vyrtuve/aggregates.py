@@ -0,0 +1,321 @@
+"""
+aggregates modulis perskaičiuoja denormalizuotus skaitiklius (receptų reitingus ir favoritus, profilių prestižą)
+aibėmis: įrašai skaitomi dalimis pagal id, kiekvienos dalies tikrosios reikšmės gaunamos viena GROUP BY užklausa
+per reitingus (id intervalu, (receptas, profilis) indeksu), o įrašomos viena bulk_update (UPDATE ... CASE) užklausa.
+Užklausų skaičius priklauso nuo dalių, o ne nuo receptų ar profilių skaičiaus.
+
+Naudojama po masinių įrašymų (bulk_create), kurie nesiunčia signalų ir neatnaujina skaitiklių.
+
+Skaitikliai taip pat gali išsiderinti ir veikiant svetainei (reitingų keitimas admin puslapyje, profilių ištrynimas
+kartu su reitingais, lenktynės). reconcile_recipes() ir reconcile_prestige() juos patikrina tomis pačiomis
+dalimis ir tomis pačiomis GROUP BY užklausomis (recipe_totals, prestige_totals), o neteisingus įrašus perrašo.
+Juos paleidžia `manage.py reconcile_aggregates`.
+
+Užduotys po balsavimo (jobs.py recipe_ratings ir author_prestige) prie skaitiklių prideda pokyčius. Jei įrašas būtų
+perskaičiuotas, kol jo užduotis dar laukia, pokytis būtų pritaikytas antrą kartą. Todėl reconcile praleidžia įrašus,
+kurių užduotys laukia Uzduotis lentelėje. LocalBackend užduotys laukia svetainės proceso atmintyje (ne ilgiau nei
+SETTLE_SECONDS), todėl išsiderinę įrašai, kurių receptai įvertinti per paskutines SETTLE_SECONDS sekundžių,
+patikrinami dar kartą praėjus SETTLE_SECONDS: laukęs pokytis per tą laiką pritaikomas ir skirtumą pakeičia, o
+nepasikeitęs skirtumas yra tikras išsiderinimas ir pataisomas, net jei už receptą balsuojama nuolat.
+"""
+import math
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import leaderboard
+from .caching import invalidate_listing, invalidate_profile
+from .jobs import enqueue_prerender
+from .models import Profilis, Receptas, Reitingas, Uzduotis
+from .prestige import FAVORITE_POINTS, FIVE_STAR_POINTS, tier_for_points
+from .rankings import recompute_bayes
+
+CHUNK_SIZE = 5000
+
+# kiek sekundžių po balsavimo jo užduotis dar gali laukti LocalBackend eilėje (DELAY ir pakartotiniai bandymai)
+SETTLE_SECONDS = 300
+
+RECIPE_FIELDS = ('reitingu_kiekis', 'reitingu_suma', 'favoritu_kiekis', 'vidutinis_reitingas')
+PROFILE_FIELDS = ('prestizo_taskai', 'prestizas_id')
+
+
+def _chunks(queryset, fields, chunk_size):
+    """
+    _chunks() skaito queryset eilutes (id, *fields) dalimis pagal id, be OFFSET.
+    """
+    last_id = 0
+
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).order_by('id').values('id', *fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def recipe_totals(rows):
+    """
+    recipe_totals() viena GROUP BY užklausa suskaičiuoja dalies receptų (rows, surūšiuotų pagal id) skaitiklių
+    (RECIPE_FIELDS) tikrąsias reikšmes. Gražina {recepto id: {laukas: reikšmė}}.
+    """
+    totals = {
+        row['id']: {'reitingu_kiekis': 0, 'reitingu_suma': 0, 'favoritu_kiekis': 0, 'vidutinis_reitingas': 0.0}
+        for row in rows
+    }
+    grouped = Reitingas.objects.filter(
+        receptas__gte=rows[0]['id'], receptas__lte=rows[-1]['id'],
+    ).order_by().values('receptas_id').annotate(
+        kiekis=Count('id'), suma=Sum('reitingas'), favoritai=Count('id', filter=Q(favoritas=True)),
+    )
+
+    for group in grouped:
+        if group['receptas_id'] in totals:
+            totals[group['receptas_id']] = {
+                'reitingu_kiekis': group['kiekis'],
+                'reitingu_suma': group['suma'],
+                'favoritu_kiekis': group['favoritai'],
+                'vidutinis_reitingas': group['suma'] / group['kiekis'],
+            }
+
+    return totals
+
+
+def prestige_totals(rows):
+    """
+    prestige_totals() viena GROUP BY užklausa suskaičiuoja dalies profilių (rows su prestizas_id, surūšiuotų pagal
+    id) prestižo taškus iš jų receptų reitingų ir lygį (prestige.tier_for_points). Jei joks lygis netinka,
+    paliekamas esamas. Gražina {profilio id: {laukas: reikšmė}}.
+    """
+    points = dict.fromkeys((row['id'] for row in rows), 0)
+    grouped = Reitingas.objects.filter(
+        receptas__profilis__gte=rows[0]['id'], receptas__profilis__lte=rows[-1]['id'],
+    ).order_by().values('receptas__profilis_id').annotate(
+        taskai=Count('id', filter=Q(favoritas=True)) * FAVORITE_POINTS
+        + Count('id', filter=Q(reitingas=5)) * FIVE_STAR_POINTS,
+    )
+
+    for group in grouped:
+        if group['receptas__profilis_id'] in points:
+            points[group['receptas__profilis_id']] = group['taskai']
+
+    return {
+        row['id']: {
+            'prestizo_taskai': points[row['id']],
+            'prestizas_id': tier_for_points(points[row['id']]) or row['prestizas_id'],
+        }
+        for row in rows
+    }
+
+
+def _write(model, totals, fields, **extra):
+    model.objects.bulk_update(
+        [model(id=pk, **values, **extra) for pk, values in totals.items()], [*fields, *extra],
+    )
+    return len(totals)
+
+
+def recompute_recipe_aggregates(recipe_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    recompute_recipe_aggregates() perskaičiuoja reitingų kiekį, sumą, vidurkį ir favoritų kiekį
+    nurodytiems (arba visiems) receptams. Gražina atnaujintų receptų skaičių.
+    """
+    recipes = Receptas.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+
+    updated = 0
+    for rows in _chunks(recipes, (), chunk_size):
+        updated += _write(Receptas, recipe_totals(rows), RECIPE_FIELDS, atnaujinta=timezone.now())
+
+    return updated
+
+
+def recompute_prestige(profile_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    recompute_prestige() perskaičiuoja prestižo taškus ir lygį nurodytiems (arba visiems) profiliams.
+    Gražina atnaujintų profilių skaičių.
+    """
+    profiles = Profilis.objects.all()
+    if profile_ids is not None:
+        profiles = profiles.filter(id__in=profile_ids)
+
+    updated = 0
+    for rows in _chunks(profiles, ('prestizas_id',), chunk_size):
+        updated += _write(Profilis, prestige_totals(rows), PROFILE_FIELDS)
+
+    return updated
+
+
+class Drift:
+    """
+    Drift kaupia reconcile_*() statistiką: patikrintų ir neteisingų įrašų skaičių, kiek kartų neteisingas buvo
+    kiekvienas laukas ir didžiausią skirtumą.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.rows = 0
+        self.skipped = 0
+        self.fields = Counter()
+        self.max_difference = Counter()
+
+    def compare(self, stored, actual):
+        """
+        compare() palygina saugomas ir tikrąsias reikšmes (laukas: reikšmė) ir gražina neteisingų laukų sąrašą.
+        """
+        self.checked += 1
+        wrong = [
+            field for field, value in actual.items()
+            if not math.isclose(stored[field] or 0, value or 0, abs_tol=1e-9)
+        ]
+
+        if wrong:
+            self.rows += 1
+            for field in wrong:
+                self.fields[field] += 1
+                if field != 'prestizas_id':
+                    difference = abs((stored[field] or 0) - (actual[field] or 0))
+                    self.max_difference[field] = max(self.max_difference[field], difference)
+
+        return wrong
+
+    def settled(self, ids, pending):
+        """
+        settled() gražina ids be tų, kurių užduotys dar laukia (pending), ir juos suskaičiuoja kaip praleistus.
+        """
+        self.skipped += len(pending)
+        return [pk for pk in ids if pk not in pending]
+
+
+def _offsets(row, actual):
+    """
+    _offsets() gražina skaitiklių skirtumus (tikra - saugoma). Lygis seka taškus, todėl į skirtumus neįeina.
+    """
+    return tuple(
+        round((value or 0) - (row[field] or 0), 9) for field, value in actual.items() if field != 'prestizas_id'
+    )
+
+
+def _queued(job_name, ids):
+    keys = Uzduotis.objects.filter(pavadinimas=job_name, raktas__in=[str(pk) for pk in ids]).values_list('raktas')
+    return {int(key) for key, in keys}
+
+
+def _reconcile(queryset, fields, totals, recent, job_name, fix, chunk_size, dry_run, settle_seconds):
+    """
+    _reconcile() palygina queryset įrašus su totals() reikšmėmis ir neteisingus pataiso fix(ids) vienoje
+    transakcijoje su patikrinimu, ar jų užduotys nelaukia Uzduotis lentelėje (SQLite transakcija pradedama
+    IMMEDIATE, settings.py, todėl tarp patikrinimo ir pataisymo naujas balsas su savo užduotimi neįrašomas).
+    Įrašai, kuriems recent(ids, since) rado naujų balsų, patikrinami dar kartą praėjus settle_seconds.
+    """
+    drift = Drift()
+    deferred = {}
+    recheck_at = 0
+
+    def apply(ids):
+        with transaction.atomic():
+            ids = drift.settled(ids, _queued(job_name, ids))
+            if ids:
+                fix(ids)
+
+    for rows in _chunks(queryset, fields, chunk_size):
+        actual = totals(rows)
+        wrong = {row['id']: _offsets(row, actual[row['id']]) for row in rows if drift.compare(row, actual[row['id']])}
+
+        if wrong and not dry_run:
+            for pk in recent(wrong, timezone.now() - timedelta(seconds=settle_seconds)):
+                deferred[pk] = wrong.pop(pk)
+                recheck_at = time.monotonic() + settle_seconds
+            if wrong:
+                apply(list(wrong))
+
+    if deferred:
+        time.sleep(max(recheck_at - time.monotonic(), 0))
+
+        for rows in _chunks(queryset.filter(id__in=deferred), fields, chunk_size):
+            actual = totals(rows)
+            stable = [row['id'] for row in rows if _offsets(row, actual[row['id']]) == deferred[row['id']]]
+            drift.skipped += len(rows) - len(stable)
+            if stable:
+                apply(stable)
+
+    return drift
+
+
+def _recently_rated_recipes(recipe_ids, since):
+    return set(
+        Reitingas.objects.filter(receptas_id__in=recipe_ids, data__gte=since).values_list('receptas_id', flat=True)
+    )
+
+
+def _recently_rated_authors(profile_ids, since):
+    return set(
+        Reitingas.objects.filter(receptas__profilis_id__in=profile_ids, data__gte=since).values_list(
+            'receptas__profilis_id', flat=True,
+        )
+    )
+
+
+def _fix_recipes(recipe_ids):
+    recompute_recipe_aggregates(recipe_ids)
+    recompute_bayes(recipe_ids)
+
+    author_ids = set(
+        Receptas.objects.filter(id__in=recipe_ids, profilis__isnull=False).values_list('profilis_id', flat=True)
+    )
+    transaction.on_commit(lambda: [invalidate_profile(author_id) for author_id in author_ids])
+
+
+def reconcile_recipes(chunk_size=CHUNK_SIZE, dry_run=False, settle_seconds=SETTLE_SECONDS):
+    """
+    reconcile_recipes() palygina receptų reitingų skaitiklius su recipe_totals() reikšmėmis ir neteisingus
+    perskaičiuoja recompute_recipe_aggregates() (kartu atnaujina jų Bajeso reitingą). Gražina Drift.
+    """
+    drift = _reconcile(
+        Receptas.objects.all(), RECIPE_FIELDS, recipe_totals, _recently_rated_recipes, 'recipe_ratings',
+        _fix_recipes, chunk_size, dry_run, settle_seconds,
+    )
+
+    if drift.rows and not dry_run:
+        invalidate_listing()
+
+    return drift
+
+
+def _prestige(profile_ids):
+    rows = Profilis.objects.select_for_update().filter(id__in=profile_ids)
+    return {profile_id: (points, level_id) for profile_id, points, level_id in
+            rows.values_list('id', 'prestizo_taskai', 'prestizas_id')}
+
+
+def refresh_prestige(profile_ids):
+    """
+    refresh_prestige() perskaičiuoja profilių prestižą (recompute_prestige) ir perkelia juos lyderių lentelėje iš
+    taškų, kurie buvo perrašyti. Taškai perskaitomi ir įrašomi vienoje transakcijoje: SQLite ją pradeda IMMEDIATE
+    (settings.py), kitos bazės užrakina eilutes (select_for_update), todėl lygiagretūs vykdytojai nemato senų taškų.
+    Receptai, kuriuose komentavo lygį pakeitę profiliai, paliečiami (Receptas.touch_commented).
+    """
+    with transaction.atomic():
+        old = _prestige(profile_ids)
+        recompute_prestige(profile_ids)
+        new = _prestige(profile_ids)
+        leaderboard.apply_changes([(old[profile_id][0], new[profile_id][0]) for profile_id in old])
+        changed_levels = [profile_id for profile_id in old if old[profile_id][1] != new[profile_id][1]]
+        enqueue_prerender(Receptas.touch_commented(changed_levels))
+
+    transaction.on_commit(lambda: [invalidate_profile(profile_id) for profile_id in old])
+
+
+def reconcile_prestige(chunk_size=CHUNK_SIZE, dry_run=False, settle_seconds=SETTLE_SECONDS):
+    """
+    reconcile_prestige() palygina profilių prestižo taškus ir lygį su prestige_totals() reikšmėmis ir neteisingus
+    perskaičiuoja refresh_prestige() (kartu perkelia juos lyderių lentelėje). Gražina Drift.
+    """
+    return _reconcile(
+        Profilis.objects.all(), PROFILE_FIELDS, prestige_totals, _recently_rated_authors, 'author_prestige',
+        refresh_prestige, chunk_size, dry_run, settle_seconds,
+    )
@@ -0,0 +1,214 @@
+"""
+caching modulis laiko receptų sąrašo puslapius ir jų skaitiklius (facets.py) podėlyje (django cache).
+
+Raktai yra versijuojami: į kiekvieną raktą įeina sąrašo versija (ir, naudojant favoritų filtrą, to profilio
+favoritų versija). Viešo profilio puslapio fragmentai ({% cache %} žyma) naudoja to profilio versiją.
+Pasikeitus receptams, reitingams ar raktažodžiams signalai padidina versiją, todėl seni įrašai
+tiesiog nebenaudojami ir išnyksta pasibaigus galiojimui. Veikia su locmem ir file podėlio realizacijomis
+(keliems procesams reikia bendro podėlio, pvz. file).
+
+Skaitant iš skaitymo kopijos (Diplominis/routers.py) į raktus įeina ir kopijos versija, nes kopija gali dar
+neturėti pakeitimo, dėl kurio padidinta versija. Kitaip pasenę duomenys liktų podėlyje su nauja versija.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from Diplominis.routers import replica_generation
+
+LISTING_VERSION_KEY = 'vyrtuve:listing:version'
+FAVORITES_VERSION_KEY = 'vyrtuve:favorites:{}:version'
+PROFILES_VERSION_KEY = 'vyrtuve:profiles:version'
+PROFILE_VERSION_KEY = 'vyrtuve:profile:{}:version'
+RANKINGS_VERSION_KEY = 'vyrtuve:rankings:version'
+REFERENCE_VERSION_KEY = 'vyrtuve:reference:version'
+HITS_KEY = 'vyrtuve:listing:hits'
+MISSES_KEY = 'vyrtuve:listing:misses'
+
+
+def cache_alias():
+    return getattr(settings, 'VYRTUVE_LISTING_CACHE', 'default')
+
+
+def get_cache():
+    return caches[cache_alias()]
+
+
+def cache_timeout():
+    return getattr(settings, 'VYRTUVE_LISTING_CACHE_TIMEOUT', 300)
+
+
+def get_version(key):
+    """
+    get_version() gražina versiją pagal raktą. Dingusi versija pradedama nuo dabartinio laiko,
+    kad niekada nesutaptų su ankstesne versija.
+    """
+    cache = get_cache()
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(key):
+    cache = get_cache()
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _increment(key):
+    cache = get_cache()
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_listing():
+    """
+    invalidate_listing() padaro visus receptų sąrašo puslapius nebegaliojančiais.
+    """
+    bump_version(LISTING_VERSION_KEY)
+
+
+def invalidate_favorites(profile_id):
+    """
+    invalidate_favorites() padaro nebegaliojančiais tik to profilio favoritų filtro puslapius.
+    """
+    if profile_id is not None:
+        bump_version(FAVORITES_VERSION_KEY.format(profile_id))
+
+
+def invalidate_profile(profile_id):
+    """
+    invalidate_profile() padaro nebegaliojančiais viešo profilio puslapio fragmentus
+    (pasikeitus profiliui, jo receptams, favoritams ar prestižui).
+    """
+    if profile_id is not None:
+        bump_version(PROFILE_VERSION_KEY.format(profile_id))
+
+
+def invalidate_profiles():
+    """
+    invalidate_profiles() padaro nebegaliojančiais visų profilių fragmentus (pvz. pasikeitus prestižo lygiams).
+    """
+    bump_version(PROFILES_VERSION_KEY)
+
+
+def profile_version(profile_id):
+    """
+    profile_version() gražina profilio fragmentų versiją, naudojamą {% cache %} žymoje.
+    """
+    version = f'{get_version(PROFILES_VERSION_KEY)}.{get_version(PROFILE_VERSION_KEY.format(profile_id))}'
+
+    generation = replica_generation()
+    if generation is not None:
+        version += f'.{generation}'
+
+    return version
+
+
+def invalidate_rankings():
+    """
+    invalidate_rankings() pažymi, kad perskaičiuoti visų receptų rūšiavimo balai (rankings.update_rankings),
+    todėl pasikeičia sąrašų pagal juos ETag.
+    """
+    bump_version(RANKINGS_VERSION_KEY)
+
+
+def rankings_version():
+    return get_version(RANKINGS_VERSION_KEY)
+
+
+def invalidate_reference():
+    """
+    invalidate_reference() pažymi, kad pasikeitė prestižo lygiai, šablonai ar raktažodžiai, todėl visi procesai
+    iš naujo užkrauna savo reference.py kopiją.
+    """
+    bump_version(REFERENCE_VERSION_KEY)
+
+
+def reference_version():
+    return get_version(REFERENCE_VERSION_KEY)
+
+
+def _listing_versions(filters, profile_id=None):
+    versions = [get_version(LISTING_VERSION_KEY), replica_generation()]
+
+    if filters.favoritas is not None:
+        versions += [profile_id, get_version(FAVORITES_VERSION_KEY.format(profile_id))]
+
+    return versions
+
+
+def listing_cache_key(filters, cursor, profile_id=None):
+    raw = repr((tuple(filters), cursor or '', _listing_versions(filters, profile_id)))
+    return 'vyrtuve:listing:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def facets_cache_key(filters, profile_id=None):
+    raw = repr((tuple(filters), _listing_versions(filters, profile_id)))
+    return 'vyrtuve:facets:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def validators_cache_key(filters, profile_id=None):
+    raw = repr((tuple(filters), _listing_versions(filters, profile_id)))
+    return 'vyrtuve:validators:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cached(key, build):
+    cache = get_cache()
+
+    value = cache.get(key)
+    if value is not None:
+        _increment(HITS_KEY)
+        return value
+
+    _increment(MISSES_KEY)
+    value = build()
+    cache.set(key, value, cache_timeout())
+
+    return value
+
+
+def cached_listing_page(filters, cursor, profile_id, build):
+    """
+    cached_listing_page() gražina puslapį iš podėlio arba jį sukuria su build() ir išsaugo.
+    """
+    return _cached(listing_cache_key(filters, cursor, profile_id), build)
+
+
+def cached_facets(filters, profile_id, build):
+    """
+    cached_facets() gražina šoninės juostos skaitiklius iš podėlio arba juos suskaičiuoja su build().
+    """
+    return _cached(facets_cache_key(filters, profile_id), build)
+
+
+def cached_listing_validators(filters, profile_id, build):
+    """
+    cached_listing_validators() gražina sąrašo puslapio ETag/Last-Modified duomenis (conditional.py) iš podėlio
+    arba juos suskaičiuoja su build().
+    """
+    return _cached(validators_cache_key(filters, profile_id), build)
+
+
+def listing_cache_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+    }
@@ -0,0 +1,41 @@
+"""
+concurrency modulis leidžia async view (views.py) vienu metu vykdyti kelias nepriklausomas ORM užklausas.
+
+Django async ORM (aget, afirst ir t.t.) visas užklausas vykdo vienoje bendroje gijoje (thread_sensitive=True),
+todėl asyncio.gather su jomis nieko nepagreitina. gather() kiekvieną funkciją paleidžia atskiroje gijoje
+(thread_sensitive=False), kuri turi savo duomenų bazės prisijungimą, o po jos prisijungimas uždaromas pagal
+CONN_MAX_AGE, kaip ir pasibaigus įprastai užklausai. ContextVar būsena (routers.py, profiling.py) kopijuojama
+į gijas, todėl skaitymo kopija ir profiliavimas veikia kaip įprastai.
+
+Gijos nemato neįvykdytos (atomic) transakcijos pakeitimų, todėl gather() tinka tik skaitymui.
+Nuoseklūs žingsniai (validatoriai, vieta lyderių lentelėje ir pan.) vykdomi įprastu sync_to_async bendroje gijoje,
+nes atskira gija jiems nieko nepagreitina, o kiekviena atidaro ir uždaro naują prisijungimą.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _run(func):
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def run_in_thread(func):
+    """
+    run_in_thread() įvykdo sinchroninę funkciją (be argumentų) atskiroje gijoje ir gražina jos rezultatą.
+    Naudojama gather(), kad kelios užklausos būtų vykdomos vienu metu.
+    """
+    return await sync_to_async(_run, thread_sensitive=False)(func)
+
+
+async def gather(**queries):
+    """
+    gather() lygiagrečiai įvykdo nepriklausomas funkcijas ir gražina {vardas: rezultatas} žodyną.
+    """
+    names = list(queries)
+    results = await asyncio.gather(*(run_in_thread(queries[name]) for name in names))
+    return dict(zip(names, results))
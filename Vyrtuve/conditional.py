@@ -0,0 +1,148 @@
+"""
+conditional modulis atsako į pakartotines GET užklausas 304 Not Modified, jei puslapis nepasikeitė
+(If-None-Match / If-Modified-Since), dar prieš užklausiant puslapio duomenis ir atvaizduojant šabloną.
+
+Validatoriai skaičiuojami iš Receptas.atnaujinta laiko:
+    - recepto puslapis - didžiausias recepto ir jo rodomų rekomendacijų atnaujinta, autoriaus profilio versija.
+      Komentatorių vardo ar prestižo lygio pokyčiai paliečia receptą (Receptas.touch_commented),
+    - receptų sąrašas - didžiausias atnaujinta ir kiekis aibėje, iš kurios skaičiuojamas puslapis ir šoninė juosta
+      (filtrai be raktažodžio ir dietos). Kiekis pasikeičia ištrynus receptą. Rezultatas laikomas podėlyje
+      su sąrašo versija, todėl dažniausiai nereikia nė vienos užklausos.
+      Rūšiuojant pagal iš anksto suskaičiuotus balus pridedama ir jų versija (rankings.update_rankings),
+    - viešas profilis - profilio fragmentų versija (caching.profile_version) ir vieta lyderių lentelėje.
+
+Puslapiai rodo prisijungusio vartotojo duomenis ir formas su CSRF žetonu, todėl į ETag įeina vartotojo id ir
+CSRF paslaptis (viewer). ETag yra svarbesnis už
+Last-Modified (naršyklės siunčia abu), o Last-Modified naudingas robotams, siunčiantiems tik If-Modified-Since.
+"""
+import hashlib
+
+from django.db.models import Count, Max, Q, Subquery
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .caching import cached_listing_validators, profile_version, rankings_version
+from .listing import filter_recipes
+from .models import Receptas, Reitingas, Rekomendacija
+from .recommendations import SHOWN
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value is not None else None
+
+
+def viewer(request):
+    """
+    viewer() gražina, kam atvaizduotas puslapis: anonimui None, prisijungusiam - (vartotojo id, CSRF paslaptis).
+    Prisijungusio vartotojo puslapiuose yra formos su {% csrf_token %}, o paslaptis pakeičiama kiekvieną kartą
+    prisijungus (rotate_token), todėl kopija su nebegaliojančiu žetonu nebeatitinka ETag ir nėra atsakoma 304.
+    Jei paslapties dar nėra (pirma užklausa po prisijungimo), ji sukuriama čia (get_token), kad ETag atitiktų
+    puslapyje įrašytą žetoną.
+    """
+    if not request.user.is_authenticated:
+        return None
+
+    get_token(request)
+    return request.user.pk, request.META.get('CSRF_COOKIE')
+
+
+def recipe_validators(recipe_id, request):
+    """
+    recipe_validators() gražina recepto puslapio (etag, last_modified) viena užklausa arba None, jei recepto nėra.
+    Prisijungusiam vartotojui pridedamas jo paskutinio balsavimo laikas, nes puslapis rodo jo reitingą, o recepto
+    atnaujinta pasikeičia tik įvykdžius recipe_ratings užduotį.
+    """
+    neighbours = Rekomendacija.objects.filter(receptas_id=recipe_id, eile__lt=SHOWN).values('rekomenduojamas_id')
+    aggregates = {
+        'atnaujinta': Max('atnaujinta'),
+        'yra': Count('id', filter=Q(pk=recipe_id)),
+        'autorius': Max('profilis_id', filter=Q(pk=recipe_id)),
+    }
+    if request.user.is_authenticated:
+        voted = Reitingas.objects.filter(receptas_id=recipe_id, profilis__profilis_id=request.user.pk)
+        aggregates['balsuota'] = Max(Subquery(voted.values('data')[:1]))
+
+    row = Receptas.objects.filter(Q(pk=recipe_id) | Q(pk__in=neighbours)).aggregate(**aggregates)
+
+    if not row['yra']:
+        return None
+
+    author_version = profile_version(row['autorius']) if row['autorius'] is not None else None
+    etag = make_etag('recipe', recipe_id, row['atnaujinta'], author_version, viewer(request), row.get('balsuota'))
+
+    return etag, _timestamp(row['atnaujinta'])
+
+
+def listing_validators(filters, request):
+    """
+    listing_validators() gražina receptų sąrašo puslapio (etag, last_modified).
+    """
+    profile = request.user.profilis if filters.favoritas is not None else None
+    ranked = filters.rusiavimas in ('bajeso', 'populiarus')
+    filters = filters._replace(rusiavimas=None)
+
+    def build():
+        recipes, _ = filter_recipes(filters._replace(raktazodis=None, vegetarian=None, vegan=None), profile)
+
+        if recipes.query.annotations:
+            recipes = Receptas.objects.filter(id__in=recipes.values('id'))
+
+        return recipes.order_by().aggregate(atnaujinta=Max('atnaujinta'), kiekis=Count('id'))
+
+    row = cached_listing_validators(filters, profile.id if profile else None, build)
+    etag = make_etag(
+        'listing', request.get_full_path(), row['atnaujinta'], row['kiekis'], rankings_version() if ranked else None,
+        viewer(request),
+    )
+
+    return etag, _timestamp(row['atnaujinta'])
+
+
+def profile_validators(profile, request, rank=None):
+    """
+    profile_validators() gražina viešo profilio puslapio (etag, None) - profilio versija nėra laikas.
+    Vieta lyderių lentelėje (leaderboard.py) keičiasi ir pasikeitus kitų profilių taškams, todėl įeina atskirai.
+    """
+    return make_etag('profile', request.get_full_path(), profile_version(profile.id), rank, viewer(request)), None
+
+
+def not_modified(request, validators):
+    """
+    not_modified() gražina 304 (ar 412) atsakymą, jei kliento kopija dar galioja, kitaip None.
+    """
+    if validators is None or request.method not in ('GET', 'HEAD'):
+        return None
+
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is not None:
+        set_validators(response, validators, request.user)
+
+    return response
+
+
+def set_validators(response, validators, user):
+    """
+    set_validators() prideda ETag, Last-Modified ir Cache-Control antraštes. Naršyklė kopiją laiko,
+    bet kiekvieną kartą ją patikrina (no-cache), o prisijungusio vartotojo puslapiai nelaikomi bendruose podėliuose.
+    """
+    if validators is None:
+        return response
+
+    etag, last_modified = validators
+    response.headers.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+
+    if user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+
+    return response
@@ -0,0 +1,87 @@
+"""
+facets modulis skaičiuoja receptų sąrašo šoninės juostos skaitiklius (facets): kiek receptų atitinka kiekvieną
+raktažodį, kiek yra vegetariškų ir veganiškų esant dabartiniams filtrams.
+
+Visi raktažodžių skaitikliai gaunami viena sugrupuota užklausa (GROUP BY raktazodis), o vegetariškų ir veganiškų
+kiekiai - viena sąlygine agregacija, todėl kaina nepriklauso nuo raktažodžių kiekio. Kiekvienas skaitiklis
+skaičiuojamas be savo paties filtro (pvz. raktažodžių skaitikliai - be pasirinkto raktažodžio), kad rodytų,
+kiek receptų būtų pasirinkus kitą reikšmę. Rezultatai laikomi podėlyje su tomis pačiomis versijomis kaip sąrašas.
+"""
+from django.db.models import Count, Q
+
+from . import reference
+from .caching import cached_facets
+from .listing import filter_recipes
+from .models import Receptas, ReceptoRaktazodis
+
+# kiek daugiausiai raktažodžių rodoma šoninėje juostoje
+KEYWORD_LIMIT = 30
+
+
+def keyword_counts(filters, profile=None, limit=KEYWORD_LIMIT):
+    """
+    keyword_counts() gražina populiariausius raktažodžius su atitinkančių receptų kiekiu.
+    """
+    recipes, _ = filter_recipes(filters._replace(raktazodis=None), profile)
+
+    links = ReceptoRaktazodis.objects.all()
+    if recipes.query.has_filters():
+        links = links.filter(receptas__in=recipes.values('id'))
+
+    # pavadinimai imami iš reference.py kopijos, todėl grupuojama tik ryšių lentelė (be JOIN su Raktazodis)
+    counts = links.values('raktazodis_id').annotate(kiekis=Count('id')).order_by('-kiekis', 'raktazodis_id')
+
+    keywords_by_id = reference.get_reference().raktazodziai_by_id
+    keywords = []
+    for row in counts[:limit]:
+        keyword = keywords_by_id.get(row['raktazodis_id'])
+        if keyword is not None:
+            keywords.append({'id': keyword.id, 'pavadinimas': keyword.raktazodis, 'kiekis': row['kiekis']})
+
+    return sorted(keywords, key=lambda keyword: (-keyword['kiekis'], keyword['pavadinimas']))
+
+
+def diet_counts(filters, profile=None):
+    """
+    diet_counts() gražina (ne)vegetariškų ir (ne)veganiškų receptų kiekius viena užklausa.
+    Vegetariškų kiekiai skaičiuojami su pasirinktu veganišku filtru, o veganiškų - su vegetarišku, todėl kiekvienas
+    kiekis sutampa su receptų kiekiu pasirinkus tą reikšmę.
+    """
+    recipes, _ = filter_recipes(filters._replace(vegetarian=None, vegan=None), profile)
+
+    if recipes.query.annotations:
+        # paieškos rangas skaitikliams nereikalingas
+        recipes = Receptas.objects.filter(id__in=recipes.values('id'))
+
+    vegetarian = Q() if filters.vegetarian is None else Q(ar_vegetariskas=filters.vegetarian)
+    vegan = Q() if filters.vegan is None else Q(ar_veganiskas=filters.vegan)
+
+    return recipes.order_by().aggregate(
+        viso=Count('id'),
+        vegetariski=Count('id', filter=Q(ar_vegetariskas=True) & vegan),
+        nevegetariski=Count('id', filter=Q(ar_vegetariskas=False) & vegan),
+        veganiski=Count('id', filter=Q(ar_veganiskas=True) & vegetarian),
+        neveganiski=Count('id', filter=Q(ar_veganiskas=False) & vegetarian),
+    )
+
+
+def get_facets(filters, user=None):
+    """
+    get_facets() gražina visus šoninės juostos skaitiklius, jei įmanoma - iš podėlio.
+    Raktažodžių ir dietų skaitikliai skaičiuojami skirtingose aibėse (kiekvienas be savo filtro), todėl tai dvi
+    užklausos: raktažodžių GROUP BY per ryšius ir dietų agregacija per receptus.
+    """
+    # rūšiavimas skaitiklių nekeičia
+    filters = filters._replace(rusiavimas=None)
+
+    profile = None
+    if filters.favoritas is not None:
+        profile = user.profilis
+
+    def build():
+        return {
+            'raktazodziai': keyword_counts(filters, profile),
+            **diet_counts(filters, profile),
+        }
+
+    return cached_facets(filters, profile.id if profile else None, build)
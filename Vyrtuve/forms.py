@@ -1,6 +1,65 @@
 from django import forms
 from django.contrib.auth.models import User
+from django.forms.models import ModelChoiceIterator
 from .models import Profilis, Receptas, Sablonas, Raktazodis, Reitingas, Komentaras
+from . import reference
+
+
+class CachedChoiceIterator(ModelChoiceIterator):
+    """
+    CachedChoiceIterator pateikia pasirinkimus iš reference.py kopijos, o ne iš queryset.
+    """
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.objects():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.objects()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.objects())
+
+
+class CachedModelChoiceMixin:
+    """
+    CachedModelChoiceMixin leidžia ModelChoiceField ir ModelMultipleChoiceField pasirinkimus atvaizduoti ir tikrinti
+    pagal reference.py kopiją (objects - funkcija, gražinanti objektų sąrašą), be užklausų į duomenų bazę.
+    """
+    iterator = CachedChoiceIterator
+
+    def __init__(self, objects, **kwargs):
+        self.objects = objects
+        super().__init__(**kwargs)
+
+    def objects_by_pk(self):
+        return {obj.pk: obj for obj in self.objects()}
+
+    def lookup(self, value, objects_by_pk):
+        try:
+            return objects_by_pk[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+
+
+class CachedModelChoiceField(CachedModelChoiceMixin, forms.ModelChoiceField):
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        return self.lookup(value, self.objects_by_pk())
+
+
+class CachedModelMultipleChoiceField(CachedModelChoiceMixin, forms.ModelMultipleChoiceField):
+    def _check_values(self, value):
+        if not isinstance(value, (list, tuple)):
+            raise forms.ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+
+        objects_by_pk = self.objects_by_pk()
+        return [self.lookup(pk, objects_by_pk) for pk in dict.fromkeys(value)]
 
 
 class UserUpdateForm(forms.ModelForm):
@@ -21,17 +80,22 @@ class RecipeForm(forms.ModelForm):
         fields = ['titulas', 'aprasas', 'ingridientai', 'instrukcijos', 'nuotrauka', 'gaminimo_laikas', 'ar_veganiskas',
                   'ar_vegetariskas', 'sablonas']
 
-    sablonas = forms.ModelChoiceField(queryset=Sablonas.objects.all(), empty_label=None)
+    sablonas = CachedModelChoiceField(reference.templates, queryset=Sablonas.objects.all(), empty_label=None)
 
     ar_veganiskas = forms.BooleanField(required=False)
     ar_vegetariskas = forms.BooleanField(required=False)
 
-    raktazodziai = forms.ModelMultipleChoiceField(
+    raktazodziai = CachedModelMultipleChoiceField(
+        reference.keywords,
         queryset=Raktazodis.objects.all(),
         widget=forms.CheckboxSelectMultiple,
         required=False
     )
 
+    def _get_validation_exclusions(self):
+        # šablonas jau patikrintas pagal reference.py kopiją, todėl modelio ForeignKey patikrinimo užklausa nereikalinga
+        return {*super()._get_validation_exclusions(), 'sablonas'}
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
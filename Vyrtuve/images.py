@@ -0,0 +1,175 @@
+"""
+images modulis kuria sumažintas ir iš naujo suspaustas įkeltų nuotraukų versijas (variantus).
+
+Kiekvienam variantui sukuriamas WebP failas ir atsarginis JPEG (ikonoms - PNG, kad išliktų permatomumas).
+Variantai saugomi šalia originalų "variantai/" kataloge, pvz. receptai/sriuba.jpg ->
+variantai/receptai/sriuba_card.webp ir variantai/receptai/sriuba_card.jpg.
+Jei varianto dar nėra, naudojamas originalus failas.
+
+Ar variantas yra, šablonams atsakoma iš podėlio (variant_exists), o ne tikrinant saugyklą kiekvieną kartą
+atvaizduojant puslapį. Esantys variantai įsimenami neribotam laikui (generate_variants juos pažymi pats),
+o trūkstami - tik podėlio galiojimo laikui, kad kitaip sukurti variantai būtų pastebėti.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .caching import cache_timeout, get_cache
+
+VARIANTS_DIR = 'variantai'
+VARIANT_EXISTS_KEY = 'vyrtuve:variant:{}'
+
+# variantas: (plotis, aukštis, ar apkirpti iki tikslaus dydžio, atsarginis formatas)
+VARIANTS = {
+    'card': (400, 300, False, 'jpg'),
+    'detail': (1200, 900, False, 'jpg'),
+    'avatar': (128, 128, True, 'jpg'),
+    'icon': (50, 50, False, 'png'),
+}
+
+# (modelis, laukas): variantai, kurie sukuriami įkėlus nuotrauką
+FIELD_VARIANTS = {
+    ('receptas', 'nuotrauka'): ['card', 'detail'],
+    ('profilis', 'nuotrauka'): ['avatar'],
+    ('prestizas', 'ikona'): ['icon'],
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', {'optimize': True}),
+}
+
+MIME_TYPES = {
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+
+def variant_name(name, variant, extension):
+    """
+    variant_name() gražina varianto failo kelią saugykloje pagal originalo kelią.
+    """
+    base, _ = os.path.splitext(name)
+    return f'{VARIANTS_DIR}/{base}_{variant}.{extension}'
+
+
+def variant_extensions(variant):
+    return ['webp', VARIANTS[variant][3]]
+
+
+def _exists_key(name):
+    return VARIANT_EXISTS_KEY.format(hashlib.sha256(name.encode()).hexdigest())
+
+
+def variant_exists(storage, name):
+    """
+    variant_exists() gražina, ar varianto failas yra saugykloje, ir atsakymą įsimena podėlyje.
+    """
+    exists = get_cache().get(_exists_key(name))
+
+    if exists is None:
+        exists = storage.exists(name)
+        get_cache().set(_exists_key(name), exists, None if exists else cache_timeout())
+
+    return exists
+
+
+def _resize(image, variant):
+    width, height, crop, _ = VARIANTS[variant]
+    image = ImageOps.exif_transpose(image)
+
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def _encode(image, extension):
+    image_format, options = FORMATS[extension]
+
+    if extension == 'jpg' and image.mode != 'RGB':
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def has_variants(field_file, variants):
+    storage = field_file.storage
+    return all(
+        storage.exists(variant_name(field_file.name, variant, extension))
+        for variant in variants
+        for extension in variant_extensions(variant)
+    )
+
+
+def generate_variants(field_file, variants, force=False):
+    """
+    generate_variants() sukuria nurodytus variantus iš field_file. Gražina sukurtų failų skaičių.
+    """
+    if not field_file or (not force and has_variants(field_file, variants)):
+        return 0
+
+    storage = field_file.storage
+    created = 0
+
+    with storage.open(field_file.name, 'rb') as original:
+        source = Image.open(original)
+        source.load()
+
+    for variant in variants:
+        resized = _resize(source, variant)
+
+        for extension in variant_extensions(variant):
+            name = variant_name(field_file.name, variant, extension)
+
+            if storage.exists(name):
+                storage.delete(name)
+
+            storage.save(name, ContentFile(_encode(resized, extension)))
+            get_cache().set(_exists_key(name), True, None)
+            created += 1
+
+    return created
+
+
+def generate_instance_variants(instance, force=False):
+    """
+    generate_instance_variants() sukuria visus modelio objekto nuotraukų variantus pagal FIELD_VARIANTS.
+    """
+    created = 0
+
+    for (model_name, field_name), variants in FIELD_VARIANTS.items():
+        if instance._meta.model_name == model_name:
+            created += generate_variants(getattr(instance, field_name), variants, force=force)
+
+    return created
+
+
+def variant_url(field_file, variant, extension=None):
+    """
+    variant_url() gražina varianto URL. Be extension gražinamas atsarginis (JPEG/PNG) formatas.
+    Jei varianto nėra - gražinamas originalo URL.
+    """
+    if not field_file:
+        return ''
+
+    name = variant_name(field_file.name, variant, extension or VARIANTS[variant][3])
+
+    if variant_exists(field_file.storage, name):
+        return field_file.storage.url(name)
+
+    return field_file.url
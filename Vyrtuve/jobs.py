@@ -0,0 +1,403 @@
+"""
+jobs modulis yra paprasta užduočių eilė šalutiniams darbams, kurie neturi būti atliekami užklausos metu
+(pvz. recepto reitingų ir autoriaus prestižo perskaičiavimas po balsavimo).
+
+Užduotis nusako pavadinimas, raktas (pvz. recepto id) ir skaitiniai duomenys (pokyčiai). Užduotys su tuo pačiu
+pavadinimu ir raktu sujungiamos sudedant jų duomenis, todėl daug balsų už tą patį receptą virsta vienu atnaujinimu.
+
+Eilės realizacija pasirenkama nustatymu VYRTUVE_JOBS['BACKEND']:
+    - ImmediateBackend - užduotis įvykdoma iškart (testams ir skriptams),
+    - LocalBackend - užduotys kaupiamos atmintyje ir vykdomos fono gijoje tame pačiame procese,
+    - DatabaseBackend - užduotys įrašomos į Uzduotis lentelę ir vykdomos `manage.py run_jobs` procese.
+
+Nepavykusios užduotys neišmetamos: ImmediateBackend ir LocalBackend (po MAX_ATTEMPTS bandymų) jas įrašo į
+Uzduotis lentelę (persist_jobs), iš kurios jas įvykdo `manage.py run_jobs`.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .caching import invalidate_listing, invalidate_profile, invalidate_profiles
+from .images import generate_instance_variants
+from .models import Prestizas, Profilis, Receptas, Reitingas, Uzduotis
+from .prerender import prerender_enabled, prerender_index, prerender_recipes
+from .prestige import apply_prestige_change, prestige_delta
+from .rankings import RATING_WEIGHT, apply_recipe_activity
+from .recommendations import refresh_recommendations
+from .retry import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def job(name):
+    """
+    job() dekoratorius užregistruoja funkciją kaip užduoties vykdytoją.
+    Vykdytojas gauna užduoties raktą ir sujungtus užduoties duomenis.
+    """
+    def register(handler):
+        JOB_HANDLERS[name] = handler
+        return handler
+    return register
+
+
+def merge_payloads(payload, other):
+    """
+    merge_payloads() sujungia dviejų tos pačios užduoties duomenis sudedant reikšmes.
+    """
+    merged = dict(payload)
+    for field, value in other.items():
+        merged[field] = merged.get(field, 0) + value
+    return merged
+
+
+def coalesce(jobs):
+    """
+    coalesce() sugrupuoja (pavadinimas, raktas, duomenys) užduotis pagal pavadinimą ir raktą.
+    """
+    grouped = {}
+    for name, key, payload in jobs:
+        if (name, key) in grouped:
+            grouped[(name, key)] = merge_payloads(grouped[(name, key)], payload)
+        else:
+            grouped[(name, key)] = dict(payload)
+    return grouped
+
+
+@retry_on_locked()
+def run_job(name, key, payload, on_success=None):
+    """
+    run_job() įvykdo vieną sujungtą užduotį savo transakcijoje. Jei bazė užrakinta, visa transakcija kartojama
+    (retry.py): ji atšaukiama visa, todėl pokyčiai nepritaikomi du kartus.
+    """
+    with transaction.atomic():
+        JOB_HANDLERS[name](key, **payload)
+        if on_success is not None:
+            on_success(name, key)
+
+
+def run_jobs(jobs, on_success=None):
+    """
+    run_jobs() sujungia ir įvykdo užduotis. Kiekviena sujungta užduotis vykdoma savo transakcijoje (run_job), todėl
+    nepavykusi (ji užregistruojama žurnale) atšaukia tik savo pakeitimus ir netrukdo likusioms.
+    on_success(pavadinimas, raktas) iškviečiama toje pačioje transakcijoje po sėkmingo įvykdymo.
+    Gražina (įvykdytų užduočių skaičius, nepavykusių (pavadinimas, raktas) aibė).
+    """
+    grouped = coalesce(jobs)
+    failed = set()
+
+    for (name, key), payload in grouped.items():
+        try:
+            run_job(name, key, payload, on_success)
+        except Exception:
+            logger.exception('Užduotis %s(%s) nepavyko', name, key)
+            failed.add((name, key))
+
+    return len(grouped) - len(failed), failed
+
+
+@retry_on_locked()
+def persist_jobs(jobs):
+    """
+    persist_jobs() įrašo nepavykusias ({(pavadinimas, raktas): duomenys}) užduotis į Uzduotis lentelę,
+    kad jas vėliau įvykdytų `manage.py run_jobs`.
+    """
+    Uzduotis.objects.bulk_create([
+        Uzduotis(pavadinimas=name, raktas=str(key), duomenys=payload) for (name, key), payload in jobs.items()
+    ])
+
+
+class ImmediateBackend:
+    """
+    ImmediateBackend įvykdo užduotį iškart ją pridėjus. Nepavykusi užduotis įrašoma į Uzduotis lentelę.
+    """
+
+    def __init__(self, **options):
+        pass
+
+    def enqueue(self, name, key, payload):
+        _, failed = run_jobs([(name, key, payload)])
+
+        if failed:
+            persist_jobs({(name, key): payload})
+
+
+class LocalBackend:
+    """
+    LocalBackend kaupia užduotis proceso atmintyje ir jas vykdo fono gijoje.
+
+    Gija palaukia DELAY sekundžių nuo pirmos naujos užduoties, todėl per tą laiką atėję balsai sujungiami.
+    Užduotis pridedama tik įrašius transakciją, kurioje ji sukurta, todėl atšaukto (ar kartojamo) balso pokytis
+    nepritaikomas. Nepavykusi užduotis bandoma vėl su kitu paketu, o po MAX_ATTEMPTS bandymų ar išeinant iš proceso
+    įrašoma į Uzduotis lentelę (persist_jobs). Neįvykdytos užduotys prarandamos tik jei procesas nutraukiamas
+    netvarkingai.
+    """
+
+    def __init__(self, DELAY=0.5, MAX_ATTEMPTS=3, **options):
+        self.delay = DELAY
+        self.max_attempts = MAX_ATTEMPTS
+        self._pending = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def enqueue(self, name, key, payload):
+        transaction.on_commit(lambda: self._add(name, key, payload))
+
+    def _add(self, name, key, payload):
+        with self._lock:
+            if (name, key) in self._pending:
+                self._pending[(name, key)] = merge_payloads(self._pending[(name, key)], payload)
+            else:
+                self._pending[(name, key)] = dict(payload)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='vyrtuve-jobs', daemon=True)
+                self._thread.start()
+
+        self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+
+        _, failed = run_jobs((name, key, payload) for (name, key), payload in pending.items())
+        exhausted = {}
+
+        for job in pending.keys() - failed:
+            self._attempts.pop(job, None)
+
+        for job in failed:
+            self._attempts[job] = self._attempts.get(job, 0) + 1
+            if self._attempts[job] >= self.max_attempts:
+                del self._attempts[job]
+                exhausted[job] = pending[job]
+            else:
+                self._add(*job, pending[job])
+
+        if exhausted:
+            persist_jobs(exhausted)
+
+    def close(self):
+        """
+        close() išeinant iš proceso įvykdo likusias užduotis, o nepavykusias įrašo į Uzduotis lentelę.
+        """
+        self.flush()
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if pending:
+            persist_jobs(pending)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Nepavyko įrašyti nepavykusių užduočių')
+            finally:
+                connections.close_all()
+
+
+class DatabaseBackend:
+    """
+    DatabaseBackend įrašo užduotis į Uzduotis lentelę. Jas vykdo vienas `manage.py run_jobs` procesas,
+    kuris paima seniausių užduočių paketą, jas sujungia ir įvykdo.
+
+    Įvykdytos užduoties eilutės ištrinamos toje pačioje transakcijoje, todėl pokytis pritaikomas lygiai vieną kartą.
+    Nepavykusios užduotys lieka lentelėje ir bandomos vėl, kol bandymų skaičius pasiekia MAX_ATTEMPTS.
+    """
+
+    def __init__(self, MAX_ATTEMPTS=5, **options):
+        self.max_attempts = MAX_ATTEMPTS
+
+    @retry_on_locked()
+    def enqueue(self, name, key, payload):
+        Uzduotis.objects.create(pavadinimas=name, raktas=str(key), duomenys=payload)
+
+    def drain(self, batch_size=1000):
+        """
+        drain() įvykdo seniausių užduočių paketą. Gražina (įvykdytų, nepavykusių) sujungtų užduočių skaičius.
+        """
+        batch = list(Uzduotis.objects.filter(bandymai__lt=self.max_attempts).order_by('id')[:batch_size])
+        task_ids = defaultdict(list)
+
+        for task in batch:
+            task_ids[(task.pavadinimas, task.raktas)].append(task.id)
+
+        def delete_tasks(name, key):
+            Uzduotis.objects.filter(id__in=task_ids[(name, key)]).delete()
+
+        executed, failed = run_jobs(
+            ((task.pavadinimas, task.raktas, task.duomenys) for task in batch), on_success=delete_tasks,
+        )
+
+        if failed:
+            Uzduotis.objects.filter(id__in=[task_id for job in failed for task_id in task_ids[job]]).update(
+                bandymai=F('bandymai') + 1,
+            )
+
+        return executed, len(failed)
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    """
+    reset_backend() leidžia pakeisti eilės realizaciją su override_settings(VYRTUVE_JOBS=...).
+    Ankstesnės realizacijos likusios užduotys įvykdomos dabar, kol DATABASES dar rodo į tą pačią bazę.
+    """
+    global _backend
+
+    if setting == 'VYRTUVE_JOBS':
+        with _backend_lock:
+            backend, _backend = _backend, None
+        if hasattr(backend, 'close'):
+            backend.close()
+
+
+@atexit.register
+def close_backend():
+    """
+    close_backend() išeinant iš proceso uždaro dabartinę eilės realizaciją (LocalBackend.close).
+    Registruojama vieną kartą moduliui, o ne kiekvienai realizacijai.
+    """
+    if hasattr(_backend, 'close'):
+        _backend.close()
+
+
+def get_backend():
+    """
+    get_backend() gražina nustatymuose nurodytą eilės realizaciją (sukuriama vieną kartą procesui).
+    """
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'VYRTUVE_JOBS', {})
+                backend_class = import_string(config.get('BACKEND', 'Vyrtuve.jobs.LocalBackend'))
+                _backend = backend_class(**config.get('OPTIONS', {}))
+
+    return _backend
+
+
+def enqueue(name, key, **payload):
+    """
+    enqueue() prideda užduotį į eilę.
+    """
+    get_backend().enqueue(name, key, payload)
+
+
+def enqueue_rating_change(recipe, old_rating, new_rating):
+    """
+    enqueue_rating_change() suplanuoja recepto reitingų ir jo autoriaus prestižo atnaujinimą
+    pakeitus reitingą iš old_rating į new_rating.
+    """
+    suma, kiekis, favoritai = Reitingas.aggregate_delta(old_rating, new_rating)
+    if suma or kiekis or favoritai:
+        enqueue('recipe_ratings', recipe.pk, suma=suma, kiekis=kiekis, favoritai=favoritai, veikla=RATING_WEIGHT)
+
+    taskai = prestige_delta(old_rating, new_rating)
+    if taskai and recipe.profilis_id is not None:
+        enqueue('author_prestige', recipe.profilis_id, taskai=taskai)
+
+
+def enqueue_prerender(recipe_ids=(), index=False):
+    """
+    enqueue_prerender() suplanuoja statinių receptų (ir sąrašo, jei index) puslapių atnaujinimą (prerender.py).
+    """
+    if not prerender_enabled():
+        return
+
+    for recipe_id in recipe_ids:
+        enqueue('prerender_recipe', recipe_id)
+
+    if index:
+        enqueue('prerender_index', 'index')
+
+
+@job('recipe_ratings')
+def update_recipe_ratings(recipe_id, suma=0, kiekis=0, favoritai=0, veikla=0):
+    Receptas.apply_rating_delta(int(recipe_id), suma=suma, kiekis=kiekis, favoritai=favoritai)
+    apply_recipe_activity(int(recipe_id), veikla)
+    invalidate_listing()
+    invalidate_profile(Receptas.objects.filter(pk=recipe_id).values_list('profilis_id', flat=True).first())
+    # statinis puslapis perrašomas tik pritaikius naujus skaitiklius
+    enqueue_prerender([recipe_id], index=True)
+
+
+@job('recipe_activity')
+def update_recipe_activity(recipe_id, veikla=0):
+    apply_recipe_activity(int(recipe_id), veikla)
+    invalidate_listing()
+
+
+@job('author_prestige')
+def update_author_prestige(profile_id, taskai=0):
+    touched = apply_prestige_change(int(profile_id), taskai)
+    invalidate_profile(profile_id)
+    # komentaruose rodoma naujo lygio ikona
+    enqueue_prerender(touched)
+
+
+IMAGE_MODELS = {
+    'receptas': Receptas,
+    'profilis': Profilis,
+    'prestizas': Prestizas,
+}
+
+
+@job('image_variants')
+def create_image_variants(key):
+    model_name, pk = key.split(':')
+    instance = IMAGE_MODELS[model_name].objects.filter(pk=pk).first()
+
+    if instance is None or not generate_instance_variants(instance):
+        return
+
+    # šablonai rodo naujus variantus (srcset), todėl puslapiai pasikeičia
+    if model_name == 'profilis':
+        invalidate_profile(instance.pk)
+    elif model_name == 'prestizas':
+        invalidate_profiles()
+        enqueue_prerender(Receptas.touch_commented(Profilis.objects.filter(prestizas=instance).values('id')))
+    elif model_name == 'receptas':
+        Receptas.touch([instance.pk])
+        invalidate_listing()
+        enqueue_prerender([instance.pk], index=True)
+
+
+@job('recommendations')
+def update_recommendations(recipe_id):
+    enqueue_prerender(refresh_recommendations(int(recipe_id)))
+
+
+@job('prerender_recipe')
+def update_prerendered_recipe(recipe_id):
+    prerender_recipes([int(recipe_id)])
+
+
+@job('prerender_index')
+def update_prerendered_index(key):
+    prerender_index()
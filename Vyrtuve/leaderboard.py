@@ -0,0 +1,189 @@
+"""
+leaderboard modulis palaiko prestižo lyderių lentelę: geriausius kiekvieno prestižo lygio autorius ir kiekvieno
+profilio vietą pagal prestizo_taskai.
+
+Vieta yra 1 + profilių, turinčių daugiau taškų, skaičius. Kad jo nereikėtų skaičiuoti COUNT per visus profilius,
+profilių kiekiai pagal taškus laikomi Fenwick medyje (PrestizoMedis lentelėje, vienas mazgas - viena eilutė).
+Taškai išdėstomi mažėjančia tvarka (pozicija = CAPACITY - taškai), todėl "kiek profilių turi daugiau taškų" yra
+prefikso suma. Ir vietos užklausa, ir pakeitimas paliečia tik log2(CAPACITY) mazgų (pagal pirminį raktą),
+nesvarbu, kiek yra profilių. Geriausi lygio autoriai skaitomi iš (prestizo_taskai, id) indekso.
+
+Medis atnaujinamas kartu su taškais (prestige.apply_prestige_change, Profilis signalai). Po masinių pakeitimų,
+kurie signalų nesiunčia (generate_data, import_recipes), ar jei medis išsiderino, jį iš naujo sukuria
+`manage.py rebuild_leaderboard`.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import PrestizoMedis, Profilis
+from .reference import attach_prestige, get_reference
+
+# didžiausi atskirai skaičiuojami taškai; profiliai su daugiau taškų laikomi turinčiais CAPACITY - 1
+CAPACITY = 2 ** 24
+
+TOP_N = 10
+
+BATCH_SIZE = 2000
+
+
+def position(points):
+    return CAPACITY - min(max(points, 0), CAPACITY - 1)
+
+
+def update_nodes(index):
+    while index <= CAPACITY:
+        yield index
+        index += index & -index
+
+
+def prefix_nodes(index):
+    while index > 0:
+        yield index
+        index -= index & -index
+
+
+def apply_changes(changes):
+    """
+    apply_changes() pritaiko (seni taškai, nauji taškai) pakeitimus medžiui. None reiškia, kad profilio nebuvo
+    (sukurtas) arba nebeliko (ištrintas). Trūkstami mazgai sukuriami, o kiekiai keičiami atomiškai (F()).
+    """
+    deltas = defaultdict(int)
+
+    for old, new in changes:
+        if old == new:
+            continue
+        if old is not None:
+            for node in update_nodes(position(old)):
+                deltas[node] -= 1
+        if new is not None:
+            for node in update_nodes(position(new)):
+                deltas[node] += 1
+
+    nodes_by_delta = defaultdict(list)
+    for node, delta in deltas.items():
+        if delta:
+            nodes_by_delta[delta].append(node)
+
+    if not nodes_by_delta:
+        return
+
+    with transaction.atomic():
+        PrestizoMedis.objects.bulk_create(
+            [PrestizoMedis(mazgas=node) for nodes in nodes_by_delta.values() for node in nodes],
+            ignore_conflicts=True,
+        )
+        for delta, nodes in nodes_by_delta.items():
+            PrestizoMedis.objects.filter(mazgas__in=nodes).update(kiekis=F('kiekis') + delta)
+
+
+def move(old, new):
+    """
+    move() perkelia vieną profilį iš old į new taškų (None - profilis sukurtas ar ištrintas).
+    """
+    apply_changes([(old, new)])
+
+
+def ranks(points_list):
+    """
+    ranks() viena užklausa gražina (vietų sąrašas, profilių skaičius) nurodytiems taškams.
+    """
+    sums = {'viso': Sum('kiekis', filter=Q(mazgas=CAPACITY))}
+    all_nodes = {CAPACITY}
+
+    for number, points in enumerate(points_list):
+        nodes = list(prefix_nodes(position(points) - 1))
+        if nodes:
+            sums[f'daugiau_{number}'] = Sum('kiekis', filter=Q(mazgas__in=nodes))
+            all_nodes.update(nodes)
+
+    # išorinis filtras, kad būtų skaitomi tik reikalingi mazgai pagal pirminį raktą, o ne visa lentelė
+    row = PrestizoMedis.objects.filter(mazgas__in=all_nodes).aggregate(**sums)
+
+    return [1 + (row.get(f'daugiau_{number}') or 0) for number in range(len(points_list))], row['viso'] or 0
+
+
+def profile_rank(profile):
+    """
+    profile_rank() gražina profilio (vieta, profilių skaičius) porą.
+    """
+    (rank,), total = ranks([profile.prestizo_taskai])
+    return rank, total
+
+
+def top_profiles(limit, min_points=None, max_points=None, data=None):
+    """
+    top_profiles() gražina daugiausiai taškų turinčius profilius [min_points, max_points) intervale.
+    data - jau paimta reference.py kopija prestižo lygiams priskirti.
+    """
+    profiles = Profilis.objects.select_related('profilis')
+    if min_points is not None:
+        profiles = profiles.filter(prestizo_taskai__gte=min_points)
+    if max_points is not None:
+        profiles = profiles.filter(prestizo_taskai__lt=max_points)
+
+    # abi kryptys mažėjančios, kad (prestizo_taskai, id) indeksas būtų skaitomas tik atgal
+    profiles = list(profiles.order_by('-prestizo_taskai', '-id')[:limit])
+    attach_prestige(profiles, data)
+    return profiles
+
+
+def assign_ranks(profiles, first_rank):
+    """
+    assign_ranks() priskiria vieta iš eilės einantiems profiliams, kai žinoma pirmojo vieta.
+    Vienodus taškus turintys profiliai gauna tą pačią vietą.
+    """
+    for number, profile in enumerate(profiles):
+        if number == 0 or profile.prestizo_taskai != profiles[number - 1].prestizo_taskai:
+            rank = first_rank + number
+        profile.vieta = rank
+
+
+def tier_leaders(limit=TOP_N):
+    """
+    tier_leaders() gražina (lygis, geriausi profiliai) poras nuo aukščiausio lygio. Lygis apima taškus nuo jo
+    reikalavimo iki kito lygio reikalavimo (kaip prestige.tier_for_points), žemiausias - ir mažesnius taškus.
+    """
+    data = get_reference()
+    levels = data.prestizai
+    tiers = []
+
+    for number, level in enumerate(levels):
+        min_points = level.tasku_reikalavimas if number > 0 else None
+        max_points = levels[number + 1].tasku_reikalavimas if number + 1 < len(levels) else None
+        tiers.append((level, top_profiles(limit, min_points, max_points, data)))
+
+    leaders = [profiles for _, profiles in tiers if profiles]
+    first_ranks, _ = ranks([profiles[0].prestizo_taskai for profiles in leaders])
+    for profiles, first_rank in zip(leaders, first_ranks):
+        assign_ranks(profiles, first_rank)
+
+    return tiers[::-1]
+
+
+def rebuild_leaderboard():
+    """
+    rebuild_leaderboard() iš naujo sukuria medį iš profilių taškų (viena GROUP BY užklausa).
+    Gražina (profilių skaičius, mazgų, kurių reikšmė buvo neteisinga, skaičius).
+    """
+    tree = defaultdict(int)
+    total = 0
+
+    with transaction.atomic():
+        histogram = Profilis.objects.order_by().values('prestizo_taskai').annotate(kiekis=Count('id'))
+        for row in histogram.iterator():
+            total += row['kiekis']
+            for node in update_nodes(position(row['prestizo_taskai'])):
+                tree[node] += row['kiekis']
+
+        stored = dict(PrestizoMedis.objects.values_list('mazgas', 'kiekis'))
+        drift = sum(1 for node in stored.keys() | tree.keys() if stored.get(node, 0) != tree.get(node, 0))
+
+        PrestizoMedis.objects.all().delete()
+        PrestizoMedis.objects.bulk_create(
+            [PrestizoMedis(mazgas=node, kiekis=count) for node, count in tree.items() if count],
+            batch_size=BATCH_SIZE,
+        )
+
+    return total, drift
@@ -0,0 +1,152 @@
+"""
+listing modulis surenka receptų sąrašo (index.html) filtrus, sudaro jų užklausą ir gražina puslapį.
+
+Filtrai normalizuojami į ListingFilters, kad tas pats filtrų rinkinys visada duotų tą patį podėlio raktą.
+"""
+from collections import namedtuple
+
+from django.db.models import Exists, OuterRef
+
+from .caching import cached_listing_page
+from .models import Receptas, ReceptoRaktazodis, Reitingas
+from .pagination import KeysetPaginator
+from .search import search_recipes
+
+LISTING_ORDERING = [('vidutinis_reitingas', True), ('id', True)]
+SEARCH_ORDERING = [('paieskos_rangas', False), ('vidutinis_reitingas', True), ('id', True)]
+PROFILE_ORDERING = [('id', True)]
+
+# ?rusiavimas= reikšmės; balai iš anksto suskaičiuoti ir indeksuoti (rankings.py), todėl rūšiuojama per indeksą
+RANKING_ORDERINGS = {
+    'reitingas': LISTING_ORDERING,
+    'bajeso': [('bayeso_reitingas', True), ('id', True)],
+    'populiarus': [('populiarumas', True), ('id', True)],
+    'naujausi': [('data', True), ('id', True)],
+}
+
+PER_PAGE = 8
+APPROXIMATE_COUNT_LIMIT = 1000
+
+ListingFilters = namedtuple(
+    'ListingFilters', ['query', 'min_rating', 'vegetarian', 'vegan', 'favoritas', 'raktazodis', 'rusiavimas'],
+    defaults=[None, None],
+)
+
+
+def _parse_bool(value):
+    if value is None:
+        return None
+    return value == 'True'
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_filters(params, user=None):
+    """
+    parse_filters() ištraukia filtrus iš URL parametrų.
+    Neteisingi min_rating, raktazodis ir rusiavimas ignoruojami, o favoritų filtras galimas tik prisijungusiam
+    vartotojui.
+    """
+    min_rating = params.get('min_rating') or None
+    if min_rating is not None:
+        try:
+            float(min_rating)
+        except ValueError:
+            min_rating = None
+
+    favoritas = _parse_bool(params.get('favoritas'))
+    if user is None or not user.is_authenticated:
+        favoritas = None
+
+    return ListingFilters(
+        query=params.get('query', '').strip(),
+        min_rating=min_rating,
+        vegetarian=_parse_bool(params.get('ar_vegetariskas')),
+        vegan=_parse_bool(params.get('ar_veganiskas')),
+        favoritas=favoritas,
+        raktazodis=_parse_id(params.get('raktazodis')),
+        rusiavimas=params.get('rusiavimas') if params.get('rusiavimas') in RANKING_ORDERINGS else None,
+    )
+
+
+def favorite_exists(profile):
+    """
+    favorite_exists() gražina EXISTS išraišką, ar receptas yra profile favoritas.
+    Užklausa remiasi Reitingas(profilis, favoritas, receptas) indeksu, todėl nepriklauso nuo favoritų kiekio.
+    """
+    return Exists(Reitingas.objects.filter(profilis=profile, favoritas=True, receptas=OuterRef('pk')))
+
+
+def favorite_recipe_ids(profile):
+    """
+    favorite_recipe_ids() gražina profile favoritų receptų id subužklausą (id__in). Ji skaito tik
+    Reitingas(profilis, favoritas, receptas) indekso dalį, todėl nereikia skenuoti visų receptų.
+    """
+    return Reitingas.objects.filter(profilis=profile, favoritas=True).values('receptas_id')
+
+
+def filter_recipes(filters, profile=None):
+    """
+    filter_recipes() gražina (queryset, ordering) porą pagal filtrus.
+    profile reikalingas tik kai naudojamas favoritų filtras.
+    """
+    recipes = search_recipes(Receptas.objects.all(), filters.query)
+
+    if filters.rusiavimas is not None:
+        ordering = RANKING_ORDERINGS[filters.rusiavimas]
+    elif 'paieskos_rangas' in recipes.query.annotations:
+        ordering = SEARCH_ORDERING
+    else:
+        ordering = LISTING_ORDERING
+
+    if filters.min_rating:
+        recipes = recipes.filter(vidutinis_reitingas__gte=filters.min_rating)
+
+    if filters.vegetarian is not None:
+        recipes = recipes.filter(ar_vegetariskas=filters.vegetarian)
+
+    if filters.vegan is not None:
+        recipes = recipes.filter(ar_veganiskas=filters.vegan)
+
+    if filters.raktazodis is not None:
+        recipes = recipes.filter(
+            id__in=ReceptoRaktazodis.objects.filter(raktazodis_id=filters.raktazodis).values('receptas_id')
+        )
+
+    if filters.favoritas is not None and profile is not None:
+        if filters.favoritas:
+            recipes = recipes.filter(id__in=favorite_recipe_ids(profile))
+        else:
+            recipes = recipes.filter(~favorite_exists(profile))
+
+    return recipes, ordering
+
+
+def get_listing_page(filters, cursor=None, user=None):
+    """
+    get_listing_page() gražina receptų puslapį (pagination.KeysetPage), jei įmanoma - iš podėlio.
+    """
+    profile = None
+    if filters.favoritas is not None:
+        profile = user.profilis
+
+    def build():
+        recipes, ordering = filter_recipes(filters, profile)
+        paginator = KeysetPaginator(recipes, ordering, per_page=PER_PAGE, count_limit=APPROXIMATE_COUNT_LIMIT)
+        return paginator.get_page(cursor)
+
+    return cached_listing_page(filters, cursor, profile.id if profile else None, build)
+
+
+def get_profile_page(profile, cursor=None):
+    """
+    get_profile_page() gražina profilio įkeltų receptų puslapį (naujausi pirmi).
+    """
+    recipes = Receptas.objects.filter(profilis=profile)
+    paginator = KeysetPaginator(recipes, PROFILE_ORDERING, per_page=PER_PAGE, count_limit=APPROXIMATE_COUNT_LIMIT)
+    return paginator.get_page(cursor)
@@ -0,0 +1,241 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from Vyrtuve.caching import get_cache
+from Vyrtuve.models import Komentaras, Profilis, Raktazodis, Receptas, Reitingas, User
+
+# scenarijų grupės, kurias galima pasirinkti su --scenario
+SCENARIOS = ('index', 'detail', 'rating', 'profile', 'mano_receptai')
+
+
+class QueryCounter:
+    """
+    QueryCounter skaičiuoja įvykdytas SQL užklausas (connection.execute_wrapper).
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {'p50': value, 'p95': value, 'p99': value}
+
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Išmatuoja pagrindinių puslapių (index su filtrais, recepto puslapis, balsavimas, viešas profilis, '
+        'mano_receptai) p50/p95/p99 trukmę, užklausų kiekį ir didžiausią atminties naudojimą. '
+        'Naudoja esamą duomenų bazę (žr. generate_data); balsavimo scenarijus keičia reitingus.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Vykdyti tik nurodytus scenarijus (galima kartoti).')
+        parser.add_argument('--cold', action='store_true', help='Išvalyti podėlį prieš kiekvieną užklausą.')
+        parser.add_argument('--output', help='Įrašyti rezultatus JSON formatu į nurodytą failą.')
+        parser.add_argument('--compare', help='Palyginti su anksčiau įrašytu JSON rezultatu.')
+
+    def handle(self, *args, **options):
+        self.cold = options['cold']
+        self.iterations = options['iterations']
+        self.warmup = options['warmup']
+
+        user = User.objects.filter(profilis__isnull=False).order_by('id').first()
+        recipe = Receptas.objects.order_by('-reitingu_kiekis', 'id').first()
+        if user is None or recipe is None:
+            raise CommandError('Duomenų bazėje nėra vartotojų arba receptų. Paleiskite generate_data.')
+
+        setup_test_environment()
+        try:
+            with override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'}):
+                results = self.run_scenarios(user, recipe, options['scenario'] or SCENARIOS)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'metadata': {
+                'commit': git_commit(),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': self.iterations,
+                'cold_cache': self.cold,
+                'dataset': {
+                    'users': User.objects.count(),
+                    'recipes': Receptas.objects.count(),
+                    'ratings': Reitingas.objects.count(),
+                    'comments': Komentaras.objects.count(),
+                    'keywords': Raktazodis.objects.count(),
+                },
+            },
+            'results': results,
+        }
+
+        self.print_report(results)
+
+        if options['compare']:
+            self.print_comparison(results, options['compare'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Rezultatai įrašyti į {options["output"]}'))
+
+    def scenarios(self, user, recipe):
+        """
+        scenarios() gražina (grupė, pavadinimas, prisijungęs, užklausos funkcija) sąrašą.
+        """
+        keyword = Raktazodis.objects.order_by('id').values_list('raktazodis', flat=True).first() or 'bulvės'
+        word = keyword.split()[0]
+        author = Profilis.objects.filter(receptai__isnull=False).select_related('profilis').order_by('-prestizo_taskai').first()
+
+        ratings = iter(range(10 ** 9))
+
+        def rate(client):
+            number = next(ratings)
+            return client.post(f'/recipe/{recipe.pk}/', {
+                'rating': '1', 'reitingas': number % 5 + 1, 'favoritas': 'on' if number % 2 else '',
+            })
+
+        scenarios = [
+            ('index', 'index', False, lambda client: client.get('/')),
+            ('index', 'index?min_rating', False, lambda client: client.get('/', {'min_rating': 4})),
+            ('index', 'index?vegetarian', False, lambda client: client.get('/', {'ar_vegetariskas': 'True'})),
+            ('index', 'index?vegan', False, lambda client: client.get('/', {'ar_veganiskas': 'True'})),
+            ('index', 'index?query', False, lambda client: client.get('/', {'query': word})),
+            ('index', 'index?favoritas', True, lambda client: client.get('/', {'favoritas': 'True'})),
+            ('detail', 'detail (anonimas)', False, lambda client: client.get(f'/recipe/{recipe.pk}/')),
+            ('detail', 'detail (prisijungęs)', True, lambda client: client.get(f'/recipe/{recipe.pk}/')),
+            ('rating', 'rating POST', True, rate),
+            ('mano_receptai', 'mano_receptai', True, lambda client: client.get('/mano-receptai/')),
+        ]
+
+        if author is not None:
+            scenarios.append((
+                'profile', 'view_other_profile', False,
+                lambda client: client.get(f'/profile/{author.profilis.username}/'),
+            ))
+
+        return scenarios
+
+    def run_scenarios(self, user, recipe, selected):
+        anonymous = Client()
+        authenticated = Client()
+        authenticated.force_login(user)
+
+        results = {}
+
+        for group, name, logged_in, request in self.scenarios(user, recipe):
+            if group not in selected:
+                continue
+
+            client = authenticated if logged_in else anonymous
+            results[name] = self.measure(client, request, name)
+
+        return results
+
+    def call(self, client, request, name):
+        if self.cold:
+            get_cache().clear()
+
+        response = request(client)
+        if response.status_code >= 400:
+            raise CommandError(f'{name}: atsakymo kodas {response.status_code}')
+
+    def measure(self, client, request, name):
+        """
+        measure() įvykdo scenarijų: trukmė ir užklausų kiekis matuojami be tracemalloc,
+        o didžiausias atminties naudojimas - atskiru paleidimu, nes tracemalloc lėtina vykdymą.
+        """
+        for _ in range(self.warmup):
+            self.call(client, request, name)
+
+        durations = []
+        queries = []
+
+        for _ in range(self.iterations):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                self.call(client, request, name)
+                durations.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.count)
+
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            self.call(client, request, name)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'latency_ms': {key: round(value, 3) for key, value in percentiles(durations).items()},
+            'mean_ms': round(statistics.fmean(durations), 3),
+            'queries': {'min': min(queries), 'max': max(queries), 'mean': round(statistics.fmean(queries), 2)},
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def print_report(self, results):
+        self.stdout.write(
+            f'{"scenarijus":24} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"užklausos":>10} {"atmintis KB":>12}'
+        )
+        for name, result in results.items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f'{name:24} {latency["p50"]:9.2f} {latency["p95"]:9.2f} {latency["p99"]:9.2f} '
+                f'{result["queries"]["max"]:10} {result["peak_memory_kb"]:12.1f}'
+            )
+
+    def print_comparison(self, results, path):
+        with open(path, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+        self.stdout.write(f'\nPalyginimas su {path} (commit {baseline["metadata"].get("commit")}):')
+
+        for name, result in results.items():
+            previous = baseline['results'].get(name)
+            if previous is None:
+                continue
+
+            before = previous['latency_ms']['p50']
+            after = result['latency_ms']['p50']
+            change = (after - before) / before if before else 0.0
+
+            self.stdout.write(
+                f'{name:24} p50 {before:8.2f} -> {after:8.2f} ms ({change:+.1%}), '
+                f'užklausos {previous["queries"]["max"]} -> {result["queries"]["max"]}'
+            )
@@ -0,0 +1,122 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from Vyrtuve import reference
+from Vyrtuve.recommendations import rebuild_recommendations
+from Vyrtuve.models import (
+    Komentaras, Prestizas, Raktazodis, Receptas, ReceptoRaktazodis, Reitingas, Sablonas, User,
+)
+
+# šablono pavadinimas: template, kurį turi pasirinkti ReceptasDetail.get_template_names()
+DETAIL_TEMPLATES = {
+    'Paprastas': 'recipe_detail_template_1.html',
+    'Horizontalus': 'recipe_detail_template_2.html',
+    'Dvi nuotraukos': 'recipe_detail_template_3.html',
+    'Nepasirinktas': 'recipe_detail.html',
+}
+
+# ETag/Last-Modified validatorius (conditional.py), recipe, raktažodžiai, komentarai ir rekomendacijos;
+# prestižo lygiai ir šablonas imami iš reference.py kopijos
+ANONYMOUS_BUDGET = 5
+# + sesija, vartotojas ir vartotojo reitingas
+AUTHENTICATED_BUDGET = 8
+
+
+class Command(BaseCommand):
+    help = (
+        'Patikrina, kad recepto puslapis visuose šablonuose neviršija užklausų biudžeto nepriklausomai nuo '
+        'komentarų ir raktažodžių kiekio. Naudoja atskirą testinę duomenų bazę; viršijus biudžetą grąžina klaidą.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=25)
+        parser.add_argument('--tags', type=int, default=10)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+
+        try:
+            with override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'}):
+                failures = self.check_detail_pages(options['comments'], options['tags'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if failures:
+            raise CommandError(f'Užklausų biudžetas viršytas: {failures}')
+
+        self.stdout.write(self.style.SUCCESS('Visi recepto puslapiai telpa į užklausų biudžetą.'))
+
+    def create_recipe(self, sablonas, author, commenters, tags):
+        recipe = Receptas.objects.create(
+            titulas=f'Receptas {sablonas.pavadinimas}', aprasas='Aprašas', ingridientai='Ingridientai',
+            instrukcijos='Instrukcijos', gaminimo_laikas=30, sablonas=sablonas, profilis=author.profilis,
+        )
+
+        ReceptoRaktazodis.objects.bulk_create([ReceptoRaktazodis(receptas=recipe, raktazodis=tag) for tag in tags])
+        Komentaras.objects.bulk_create([
+            Komentaras(receptas=recipe, profilis=commenter.profilis, turinys='Komentaras')
+            for commenter in commenters
+        ])
+
+        return recipe
+
+    def count_queries(self, client, recipe, expected_template):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/recipe/{recipe.pk}/')
+
+        if response.status_code != 200:
+            raise CommandError(f'/recipe/{recipe.pk}/ grąžino {response.status_code}')
+
+        templates = [template.name for template in response.templates]
+        if expected_template not in templates:
+            raise CommandError(f'Tikėtasi {expected_template}, gauta {templates}')
+
+        return len(queries)
+
+    def check_detail_pages(self, comment_count, tag_count):
+        Prestizas.objects.create(lygio_pavadinimas='Prestizo lygis įprastas', tasku_reikalavimas=0)
+
+        author = User.objects.create_user('autorius', 'autorius@vyrtuve.lt', 'slaptazodis')
+        reader = User.objects.create_user('skaitytojas', 'skaitytojas@vyrtuve.lt', 'slaptazodis')
+        commenters = [
+            User.objects.create_user(f'komentatorius{number}', f'k{number}@vyrtuve.lt', 'slaptazodis')
+            for number in range(comment_count)
+        ]
+        tags = Raktazodis.objects.bulk_create([Raktazodis(raktazodis=f'raktazodis{number}') for number in range(tag_count)])
+
+        anonymous = Client()
+        authenticated = Client()
+        authenticated.force_login(reader)
+
+        failures = []
+
+        for pavadinimas, template_name in DETAIL_TEMPLATES.items():
+            sablonas = Sablonas.objects.create(pavadinimas=pavadinimas, aprasas='')
+            small = self.create_recipe(sablonas, author, commenters[:1], tags[:1])
+            large = self.create_recipe(sablonas, author, commenters, tags)
+            Reitingas.objects.create(receptas=large, profilis=reader.profilis, reitingas=4)
+            rebuild_recommendations()
+            # prestižo lygiai ir šablonai (reference.py) užkraunami vieną kartą procesui, o ne kiekvienai užklausai
+            reference.get_reference()
+
+            for label, client, budget in (
+                ('anonimas', anonymous, ANONYMOUS_BUDGET),
+                ('prisijungęs', authenticated, AUTHENTICATED_BUDGET),
+            ):
+                small_count = self.count_queries(client, small, template_name)
+                large_count = self.count_queries(client, large, template_name)
+
+                self.stdout.write(
+                    f'{template_name:32} {label:12} {small_count:3} / {large_count:3} užklausų (biudžetas {budget})'
+                )
+
+                if large_count > budget or large_count != small_count:
+                    failures.append(f'{template_name} ({label}): {small_count}/{large_count} > {budget}')
+
+        return failures
@@ -0,0 +1,231 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from Diplominis.profiling import fingerprint
+from Vyrtuve import reference
+from Vyrtuve.caching import get_cache
+from Vyrtuve.models import Profilis, Raktazodis, Receptas, User
+
+# plano eilutės, kurios reiškia trūkstamą indeksą
+FULL_SCAN = 'SCAN'
+TEMP_BTREE = 'USE TEMP B-TREE'
+
+# mažos žinyno lentelės, kurių skenavimas nėra problema
+SMALL_TABLES = ('Vyrtuve_prestizas', 'Vyrtuve_sablonas')
+
+# žinomos išimtys: (SQL fragmentas, plano eilutė, priežastis). Jos rodomos su priežastimi, bet nelaikomos problema
+KNOWN_EXCEPTIONS = [
+    (
+        'GROUP BY "Vyrtuve_receptoraktazodis"."raktazodis_id"', 'USE TEMP B-TREE FOR GROUP BY',
+        'filtruotos aibės raktažodžių skaitikliai: ryšiai randami (receptas, raktazodis) indeksu, o grupuojami '
+        'pagal raktažodį. Grupių tiek, kiek raktažodžių, rezultatas laikomas podėlyje (facets.py)',
+    ),
+    (
+        '"paieskos_rangas"', 'USE TEMP B-TREE FOR ORDER BY',
+        'paieškos rezultatai rūšiuojami pagal užklausos metu skaičiuojamą FTS rangą (search.py)',
+    ),
+    (
+        'IN (SELECT U0."receptas_id" FROM "Vyrtuve_reitingas"', 'USE TEMP B-TREE FOR ORDER BY',
+        'rūšiuojami tik vartotojo favoritai, surinkti Reitingas(profilis, favoritas, receptas) indeksu',
+    ),
+    (
+        'IN (SELECT U0."receptas_id" FROM "Vyrtuve_receptoraktazodis"', 'USE TEMP B-TREE FOR ORDER BY',
+        'rūšiuojami tik raktažodžio receptai. Ėjimas rūšiavimo indeksu su EXISTS greitesnis tik populiariems '
+        'raktažodžiams, o retiems peržiūri visus receptus (ir skaičiuojant kiekį)',
+    ),
+]
+
+
+class QueryCollector:
+    """
+    QueryCollector surenka vykdomas SELECT užklausas su parametrais (connection.execute_wrapper).
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((self.alias, sql, params))
+        return execute(sql, params, many, context)
+
+
+def problems(plan, sql=''):
+    """
+    problems() gražina plano eilutes su pilnu lentelės skenavimu ar laikinu B-medžiu (rūšiavimu ar grupavimu).
+    Nelaikomi problema: skenavimas per indeksą (SCAN ... USING INDEX, naudojamas rūšiavimui su LIMIT),
+    jau apskaičiuotos subužklausos ir FTS lentelės skenavimas, mažos žinyno lentelės ir agreguotų eilučių
+    rūšiavimas (ORDER BY po GROUP BY negali naudoti indekso).
+    """
+    grouped = any(detail.endswith('FOR GROUP BY') for detail in plan) or 'GROUP BY' in sql
+    tables = {detail.split()[1] for detail in plan if detail.startswith(('SCAN ', 'SEARCH '))}
+    if tables and tables.issubset(SMALL_TABLES):
+        return []
+
+    flagged = []
+
+    for detail in plan:
+        if detail.startswith(FULL_SCAN):
+            target = detail[len(FULL_SCAN):].split()[0]
+            if 'USING' in detail or 'VIRTUAL TABLE' in detail or 'subquery' in target or target in SMALL_TABLES:
+                continue
+            flagged.append(detail)
+        elif detail.startswith(TEMP_BTREE):
+            if grouped and detail.endswith('FOR ORDER BY'):
+                continue
+            flagged.append(detail)
+
+    return flagged
+
+
+def known_exception(detail, sql):
+    """
+    known_exception() gražina priežastį, jei plano eilutė yra žinoma išimtis (KNOWN_EXCEPTIONS), kitaip None.
+    """
+    for fragment, plan_detail, reason in KNOWN_EXCEPTIONS:
+        if detail == plan_detail and fragment in sql:
+            return reason
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Paleidžia pagrindinius puslapius per testinį klientą, surenka jų SQL užklausas ir kiekvienai įvykdo '
+        'EXPLAIN QUERY PLAN. Pažymi pilnus lentelių skenavimus ir laikinus B-medžius (trūkstamus indeksus), '
+        'išskyrus žinomas išimtis (KNOWN_EXCEPTIONS). '
+        'Naudoja esamą duomenų bazę, visi pakeitimai atšaukiami.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Rodyti visų užklausų planus.')
+        parser.add_argument('--strict', action='store_true', help='Grąžinti klaidą, jei rasta problemų.')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('explain_hotpaths palaiko tik SQLite (EXPLAIN QUERY PLAN).')
+
+        user = User.objects.filter(profilis__receptai__isnull=False).order_by('id').first()
+        recipe = Receptas.objects.order_by('-reitingu_kiekis', 'id').first()
+        if user is None or recipe is None:
+            raise CommandError('Duomenų bazėje nėra vartotojų arba receptų. Paleiskite generate_data.')
+
+        setup_test_environment()
+        try:
+            with override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'}):
+                collected = self.collect(user, recipe)
+        finally:
+            teardown_test_environment()
+
+        flagged_total = 0
+        known_total = 0
+
+        for name, queries in collected:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({len(queries)} skirtingų užklausų)'))
+
+            for alias, sql, params in queries:
+                plan = self.explain(alias, sql, params)
+                known = {}
+                flagged = []
+                for detail in problems(plan, sql):
+                    reason = known_exception(detail, sql)
+                    if reason is None:
+                        flagged.append(detail)
+                    else:
+                        known[detail] = reason
+                flagged_total += bool(flagged)
+                known_total += bool(known) and not flagged
+
+                if flagged or known or options['verbose_plans']:
+                    style = self.style.WARNING if flagged else self.style.SUCCESS
+                    self.stdout.write(style(f'  {fingerprint(sql)[:300]}'))
+                    for detail in plan:
+                        marker = '!!' if detail in flagged else '~~' if detail in known else '  '
+                        self.stdout.write(f'    {marker} {detail}')
+                    for reason in known.values():
+                        self.stdout.write(f'       žinoma išimtis: {reason}')
+
+        if known_total:
+            self.stdout.write(f'Užklausų su žinomomis išimtimis: {known_total}')
+
+        if flagged_total:
+            message = f'Užklausų su pilnu skenavimu ar laikinu B-medžiu: {flagged_total}'
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Visos užklausos naudoja indeksus.'))
+
+    def scenarios(self, user, recipe):
+        author = Profilis.objects.filter(receptai__isnull=False).select_related('profilis').first()
+        keyword = Raktazodis.objects.order_by('id').first()
+        word = keyword.raktazodis.split()[0] if keyword else 'receptas'
+
+        scenarios = [
+            ('index', False, 'get', '/', {}),
+            ('index?min_rating', False, 'get', '/', {'min_rating': 4}),
+            ('index?ar_vegetariskas', False, 'get', '/', {'ar_vegetariskas': 'True'}),
+            ('index?ar_veganiskas', False, 'get', '/', {'ar_veganiskas': 'True'}),
+            ('index?query', False, 'get', '/', {'query': word}),
+            ('index?favoritas', True, 'get', '/', {'favoritas': 'True'}),
+            ('index?favoritas=False', True, 'get', '/', {'favoritas': 'False'}),
+            ('recipe', False, 'get', f'/recipe/{recipe.pk}/', {}),
+            ('recipe (prisijungęs)', True, 'get', f'/recipe/{recipe.pk}/', {}),
+            ('recipe rating POST', True, 'post', f'/recipe/{recipe.pk}/', {'rating': '1', 'reitingas': 4}),
+            ('recipe comment POST', True, 'post', f'/recipe/{recipe.pk}/', {'comment': '1', 'turinys': 'Skanu'}),
+            ('view_other_profile', False, 'get', f'/profile/{author.profilis.username}/', {}),
+            ('mano_receptai', True, 'get', '/mano-receptai/', {}),
+            ('leaderboard', True, 'get', '/leaderboard/', {}),
+        ]
+
+        if keyword is not None:
+            scenarios.append(('index?raktazodis', False, 'get', '/', {'raktazodis': keyword.id}))
+
+        return scenarios
+
+    def collect(self, user, recipe):
+        """
+        collect() įvykdo kiekvieną scenarijų tuščiu podėliu (išskyrus žinynų kopiją) ir gražina (pavadinimas, užklausos) sąrašą.
+        Pasikartojančios užklausos (pagal atspaudą) paliekamos tik vieną kartą.
+        """
+        anonymous = Client()
+        authenticated = Client()
+        authenticated.force_login(user)
+
+        collected = []
+
+        for name, logged_in, method, url, data in self.scenarios(user, recipe):
+            client = authenticated if logged_in else anonymous
+            collectors = [QueryCollector(alias) for alias in connections]
+            get_cache().clear()
+            # žinynų kopija įkeliama vieną kartą procesui, o ne kiekvienam puslapiui (reference.py)
+            reference.get_reference()
+
+            with transaction.atomic():
+                for collector in collectors:
+                    connections[collector.alias].execute_wrappers.append(collector)
+                try:
+                    response = getattr(client, method)(url, data)
+                finally:
+                    for collector in collectors:
+                        connections[collector.alias].execute_wrappers.remove(collector)
+                transaction.set_rollback(True)
+
+            if response.status_code >= 400:
+                raise CommandError(f'{name}: atsakymo kodas {response.status_code}')
+
+            unique = {}
+            for collector in collectors:
+                for alias, sql, params in collector.queries:
+                    unique.setdefault(fingerprint(sql), (alias, sql, params))
+
+            collected.append((name, list(unique.values())))
+
+        return collected
+
+    def explain(self, alias, sql, params):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
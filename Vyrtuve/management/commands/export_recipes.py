@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.transfer import export_records, write_csv, write_jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        'Eksportuoja receptus su raktažodžiais, reitingais, komentarais ir nuotraukų keliais JSONL arba CSV formatu. '
+        'Be --output rašoma į standartinę išvestį.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Failo formatas (numatytasis - pagal failo plėtinį, kitaip jsonl).')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['output']
+        output_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        write = write_csv if output_format == 'csv' else write_jsonl
+        records = export_records(chunk_size=options['chunk_size'])
+
+        if path == '-':
+            count = write(records, sys.stdout)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as output:
+                count = write(records, output)
+
+        self.stderr.write(self.style.SUCCESS(f'Eksportuota receptų: {count}'))
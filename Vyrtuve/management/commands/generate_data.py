@@ -0,0 +1,224 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Vyrtuve import reference
+from Vyrtuve.aggregates import recompute_prestige, recompute_recipe_aggregates
+from Vyrtuve.caching import invalidate_listing
+from Vyrtuve.leaderboard import rebuild_leaderboard
+from Vyrtuve.models import (
+    Komentaras, Prestizas, Profilis, Raktazodis, Receptas, ReceptoRaktazodis, Reitingas, Sablonas, User,
+)
+from Vyrtuve.rankings import update_rankings
+from Vyrtuve.recommendations import rebuild_recommendations
+from Vyrtuve.search import rebuild_search_index
+
+DEFAULT_PASSWORD = 'vyrtuve123'
+
+WORDS = (
+    'bulvės', 'cepelinai', 'šaltibarščiai', 'kugelis', 'varškė', 'grybai', 'sriuba', 'žuvis', 'vištiena', 'kiauliena',
+    'burokėliai', 'agurkai', 'krapai', 'grietinė', 'sūris', 'obuoliai', 'medus', 'miltai', 'kiaušiniai', 'svogūnai',
+    'morkos', 'kopūstai', 'pupelės', 'ryžiai', 'makaronai', 'pomidorai', 'česnakai', 'riešutai', 'uogos', 'pienas',
+)
+
+TEMPLATES = ('Paprastas', 'Horizontalus', 'Dvi nuotraukos', 'Kitas')
+
+PRESTIGE_LEVELS = (
+    ('Prestizo lygis įprastas', 0),
+    ('Prestizo lygis bronzinis', 50),
+    ('Prestizo lygis sidabrinis', 200),
+    ('Prestizo lygis auksinis', 1000),
+)
+
+
+def zipf_weights(count, skew):
+    """
+    zipf_weights() gražina Zipf pasiskirstymo svorius: pirmi elementai gauna daugiausiai veiklos.
+    """
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Sugeneruoja sintetinius vartotojus, receptus, raktažodžius, reitingus ir komentarus našumo matavimams. '
+        f'Visų sugeneruotų vartotojų slaptažodis yra "{DEFAULT_PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--keywords', type=int, default=100)
+        parser.add_argument('--tags-per-recipe', type=int, default=4)
+        parser.add_argument('--ratings', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf eksponentas: kuo didesnis, tuo labiau veikla susitelkia ties populiariais.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        self.ensure_reference_data()
+
+        profile_ids = self.create_users(options['users'])
+        keyword_ids = self.create_keywords(options['keywords'])
+        recipe_ids = self.create_recipes(options['recipes'], profile_ids, options['skew'])
+        self.create_tags(recipe_ids, keyword_ids, options['tags_per_recipe'], options['skew'])
+        self.create_ratings(options['ratings'], recipe_ids, profile_ids, options['skew'])
+        self.create_comments(options['comments'], recipe_ids, profile_ids, options['skew'])
+
+        self.log('Perskaičiuojami skaitikliai, lyderių lentelė, rūšiavimo balai, paieškos indeksas ir rekomendacijos')
+        recompute_recipe_aggregates(recipe_ids)
+        recompute_prestige()
+        rebuild_leaderboard()
+        update_rankings()
+        rebuild_search_index()
+        rebuild_recommendations()
+        invalidate_listing()
+
+        self.stdout.write(self.style.SUCCESS(f'Baigta per {time.monotonic() - started:.1f} s'))
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def bulk_create(self, model, objects, **kwargs):
+        """
+        bulk_create() įrašo objektus paketais, kiekvieną pakete atskiroje transakcijoje.
+        """
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, **kwargs)
+                batch = []
+
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+
+    def sentence(self, length):
+        return ' '.join(self.random.choice(WORDS) for _ in range(length))
+
+    def ensure_reference_data(self):
+        for pavadinimas in TEMPLATES:
+            Sablonas.objects.get_or_create(pavadinimas=pavadinimas, defaults={'aprasas': pavadinimas})
+
+        if not Prestizas.objects.exists():
+            Prestizas.objects.bulk_create([
+                Prestizas(lygio_pavadinimas=name, tasku_reikalavimas=points) for name, points in PRESTIGE_LEVELS
+            ])
+            # bulk_create signalų nesiunčia
+            reference.invalidate()
+
+    def create_users(self, count):
+        self.log(f'Kuriami vartotojai: {count}')
+
+        password = make_password(DEFAULT_PASSWORD)
+        prefix = f'gen{int(time.time())}'
+        prestizas = Prestizas.objects.order_by('tasku_reikalavimas').first()
+
+        self.bulk_create(User, (
+            User(username=f'{prefix}_{number}', email=f'{prefix}_{number}@vyrtuve.lt', password=password)
+            for number in range(count)
+        ))
+
+        users = User.objects.filter(username__startswith=f'{prefix}_').values_list('id', 'username')
+        self.bulk_create(Profilis, (
+            Profilis(profilis_id=user_id, vardas=username, aprasas=self.sentence(12), prestizas=prestizas)
+            for user_id, username in users.iterator()
+        ))
+
+        return list(Profilis.objects.filter(profilis__username__startswith=f'{prefix}_').values_list('id', flat=True))
+
+    def create_keywords(self, count):
+        self.log(f'Kuriami raktažodžiai: {count}')
+
+        existing = set(Raktazodis.objects.values_list('raktazodis', flat=True))
+        names = [f'{self.random.choice(WORDS)} {number}' for number in range(count)]
+        Raktazodis.objects.bulk_create([Raktazodis(raktazodis=name) for name in names if name not in existing])
+        reference.invalidate()
+
+        return list(Raktazodis.objects.values_list('id', flat=True))
+
+    def create_recipes(self, count, profile_ids, skew):
+        self.log(f'Kuriami receptai: {count}')
+
+        first_id = (Receptas.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        template_ids = list(Sablonas.objects.values_list('id', flat=True))
+        authors = self.random.choices(profile_ids, weights=zipf_weights(len(profile_ids), skew), k=count)
+
+        def recipes():
+            for author_id in authors:
+                vegan = self.random.random() < 0.1
+                yield Receptas(
+                    titulas=self.sentence(3)[:50],
+                    aprasas=self.sentence(30),
+                    ingridientai=self.sentence(15),
+                    instrukcijos=self.sentence(60),
+                    gaminimo_laikas=self.random.randint(5, 240),
+                    ar_veganiskas=vegan,
+                    ar_vegetariskas=vegan or self.random.random() < 0.25,
+                    sablonas_id=self.random.choice(template_ids),
+                    profilis_id=author_id,
+                )
+
+        self.bulk_create(Receptas, recipes())
+
+        return list(Receptas.objects.filter(id__gte=first_id).values_list('id', flat=True))
+
+    def create_tags(self, recipe_ids, keyword_ids, per_recipe, skew):
+        self.log(f'Kuriami receptų raktažodžiai: ~{len(recipe_ids) * per_recipe}')
+
+        weights = zipf_weights(len(keyword_ids), skew)
+
+        def links():
+            for recipe_id in recipe_ids:
+                chosen = set(self.random.choices(keyword_ids, weights=weights, k=per_recipe))
+                for keyword_id in chosen:
+                    yield ReceptoRaktazodis(receptas_id=recipe_id, raktazodis_id=keyword_id)
+
+        self.bulk_create(ReceptoRaktazodis, links())
+
+    def create_ratings(self, count, recipe_ids, profile_ids, skew):
+        """
+        create_ratings() kuria reitingus populiariems receptams dažniau. Pasikartojančios (receptas, profilis)
+        poros praleidžiamos unikalumo apribojimu, todėl galutinis kiekis gali būti šiek tiek mažesnis.
+        """
+        self.log(f'Kuriami reitingai: ~{count}')
+
+        recipe_weights = zipf_weights(len(recipe_ids), skew)
+        cumulative = []
+        total = 0
+        for weight in recipe_weights:
+            total += weight
+            cumulative.append(total)
+
+        def ratings():
+            for _ in range(count):
+                rating = min(5, max(1, round(self.random.gauss(3.8, 1.1))))
+                yield Reitingas(
+                    receptas_id=self.random.choices(recipe_ids, cum_weights=cumulative)[0],
+                    profilis_id=self.random.choice(profile_ids),
+                    reitingas=rating,
+                    favoritas=rating >= 4 and self.random.random() < 0.3,
+                )
+
+        self.bulk_create(Reitingas, ratings(), ignore_conflicts=True)
+
+    def create_comments(self, count, recipe_ids, profile_ids, skew):
+        self.log(f'Kuriami komentarai: {count}')
+
+        weights = zipf_weights(len(recipe_ids), skew)
+        targets = self.random.choices(recipe_ids, weights=weights, k=count)
+
+        self.bulk_create(Komentaras, (
+            Komentaras(receptas_id=recipe_id, profilis_id=self.random.choice(profile_ids), turinys=self.sentence(20))
+            for recipe_id in targets
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.images import generate_instance_variants
+from Vyrtuve.models import Prestizas, Profilis, Receptas
+
+
+class Command(BaseCommand):
+    help = 'Sukuria trūkstamus receptų, profilių ir prestižo ikonų nuotraukų variantus (WebP ir JPEG/PNG).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Perkurti ir jau esamus variantus.')
+
+    def handle(self, *args, **options):
+        created = 0
+        failed = 0
+
+        for model in (Receptas, Profilis, Prestizas):
+            for instance in model.objects.iterator():
+                try:
+                    created += generate_instance_variants(instance, force=options['force'])
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {instance.pk}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(f'Sukurta failų: {created}, nepavyko: {failed}'))
@@ -0,0 +1,63 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from Vyrtuve import reference
+from Vyrtuve.caching import invalidate_listing, invalidate_profiles
+from Vyrtuve.leaderboard import rebuild_leaderboard
+from Vyrtuve.rankings import update_rankings
+from Vyrtuve.recommendations import rebuild_recommendations
+from Vyrtuve.transfer import Importer, batches, read_csv, read_jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        'Importuoja receptus iš export_recipes sukurto JSONL arba CSV failo ("-" - standartinė įvestis). '
+        'Receptai įrašomi paketais; nežinomi vartotojai ir raktažodžiai sukuriami.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Failo formatas (numatytasis - pagal failo plėtinį, kitaip jsonl).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--skip-recommendations', action='store_true',
+                            help='Neperskaičiuoti rekomendacijų (vėliau paleiskite rebuild_recommendations).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        read = read_csv if input_format == 'csv' else read_jsonl
+
+        if path == '-':
+            imported = self.import_records(read(sys.stdin), options['batch_size'])
+        else:
+            with open(path, encoding='utf-8', newline='') as source:
+                imported = self.import_records(read(source), options['batch_size'])
+
+        if imported and not options['skip_recommendations']:
+            self.stdout.write('Perskaičiuojamos rekomendacijos')
+            rebuild_recommendations()
+
+        if imported:
+            update_rankings()
+            rebuild_leaderboard()
+
+        invalidate_listing()
+        invalidate_profiles()
+        # nauji raktažodžiai įrašyti bulk_create, kuris signalų nesiunčia
+        reference.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(f'Importuota receptų: {imported}'))
+
+    def import_records(self, records, batch_size):
+        importer = Importer()
+        imported = 0
+        started = time.monotonic()
+
+        for batch in batches(records, batch_size):
+            imported += len(importer.import_batch(batch))
+            self.stdout.write(f'{imported} receptų ({imported / (time.monotonic() - started):.0f}/s)')
+
+        return imported
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.caching import listing_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Parodo receptų sąrašo podėlio pataikymų ir nepataikymų skaičių.'
+
+    def handle(self, *args, **options):
+        stats = listing_cache_stats()
+
+        self.stdout.write(f"Pataikymai: {stats['hits']}")
+        self.stdout.write(f"Nepataikymai: {stats['misses']}")
+        self.stdout.write(f"Pataikymų dalis: {stats['hit_ratio']:.1%}")
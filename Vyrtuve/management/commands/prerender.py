@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Vyrtuve.prerender import get_config, prerender_all, prerender_enabled, prerender_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Iš naujo sugeneruoja statinius recepto ir pirmų sąrašo puslapių HTML failus anoniminiams lankytojams '
+        '(VYRTUVE_PRERENDER[\'ROOT\'] kataloge).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index-only', action='store_true', help='Generuoti tik sąrašo puslapius.')
+
+    def handle(self, *args, **options):
+        if not prerender_enabled():
+            raise CommandError('Nenurodytas VYRTUVE_PRERENDER[\'ROOT\'] (VYRTUVE_PRERENDER_ROOT).')
+
+        if options['index_only']:
+            pages = prerender_index()
+            self.stdout.write(self.style.SUCCESS(f'Sugeneruota sąrašo puslapių: {pages}.'))
+            return
+
+        count = prerender_all()
+
+        self.stdout.write(self.style.SUCCESS(f'Sugeneruota receptų puslapių: {count} ({get_config()["ROOT"]}).'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = (
+        'Iš naujo sukuria prestižo lyderių lentelės medį (leaderboard.py) iš profilių taškų. '
+        'Paleiskite po masinių taškų pakeitimų ar jei profilių vietos rodomos neteisingai.'
+    )
+
+    def handle(self, *args, **options):
+        profiles, drift = rebuild_leaderboard()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Lyderių lentelė sukurta {profiles} profiliams, pataisyta neteisingų mazgų: {drift}.'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Iš naujo suskaičiuoja visų receptų rekomendacijas pagal raktažodžių panašumą.'
+
+    def handle(self, *args, **options):
+        count = rebuild_recommendations()
+
+        self.stdout.write(self.style.SUCCESS(f'Rekomendacijos perskaičiuotos {count} receptams.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from Vyrtuve import search
+
+
+class Command(BaseCommand):
+    help = 'Iš naujo sukuria receptų pilno teksto paieškos (FTS5) indeksą.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+
+        if not search.is_supported(using):
+            raise CommandError('Duomenų bazė nepalaiko SQLite FTS5.')
+
+        search.create_search_index(using=using)
+        search.rebuild_search_index(using=using)
+
+        self.stdout.write(self.style.SUCCESS('Paieškos indeksas perkurtas.'))
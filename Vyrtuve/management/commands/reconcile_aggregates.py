@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.aggregates import CHUNK_SIZE, SETTLE_SECONDS, reconcile_prestige, reconcile_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Patikrina denormalizuotus skaitiklius (receptų reitingų kiekį, sumą, vidurkį, favoritų kiekį ir profilių '
+        'prestižo taškus bei lygį) pagal reitingus ir pataiso išsiderinusius (aggregates.py). Tikrosios reikšmės '
+        'skaičiuojamos dalimis viena GROUP BY užklausa, neteisingi įrašai perrašomi bulk_update. Įrašai, kurių '
+        'balsų užduotys laukia eilėje, praleidžiami, o neseniai įvertinti patikrinami dar kartą po --settle-seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Įrašų kiekis vienoje dalyje.')
+        parser.add_argument(
+            '--settle-seconds', type=int, default=SETTLE_SECONDS,
+            help='Po kiek sekundžių dar kartą patikrinti išsiderinusius neseniai įvertintus įrašus.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Tik parodyti neatitikimus, nieko neįrašyti.')
+
+    def handle(self, *args, **options):
+        for name, reconcile in (('Receptai', reconcile_recipes), ('Profiliai', reconcile_prestige)):
+            started = time.monotonic()
+            drift = reconcile(
+                chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+                settle_seconds=options['settle_seconds'],
+            )
+            elapsed = time.monotonic() - started
+
+            style = self.style.WARNING if drift.rows else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: patikrinta {drift.checked}, neteisingų {drift.rows}, praleista {drift.skipped} '
+                f'({elapsed:.1f} s)'
+            ))
+            for field, count in drift.fields.most_common():
+                line = f'  {field}: {count}'
+                if field in drift.max_difference:
+                    line += f', didžiausias skirtumas {drift.max_difference[field]:g}'
+                self.stdout.write(line)
+
+        if options['dry_run']:
+            self.stdout.write('Nieko neįrašyta (--dry-run).')
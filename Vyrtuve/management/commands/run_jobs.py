@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.jobs import DatabaseBackend, get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Vykdo Uzduotis lentelėje sukauptas užduotis: visas, kai naudojamas jobs.DatabaseBackend, '
+        'arba kitų eilių nepavykusias (jobs.persist_jobs).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Įvykdyti esamas užduotis ir baigti.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Laukimas sekundėmis kai eilė tuščia.')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+
+        if not isinstance(backend, DatabaseBackend):
+            backend = DatabaseBackend()
+
+        while True:
+            executed, failed = backend.drain(batch_size=options['batch_size'])
+
+            if executed:
+                self.stdout.write(f'Įvykdyta užduočių: {executed}')
+            if failed:
+                self.stdout.write(self.style.WARNING(f'Nepavyko užduočių: {failed} (bus bandomos vėl)'))
+
+            # nepavykusios užduotys bandomos vėl tik po pertraukos
+            if not executed:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from Diplominis.routers import REPLICA_DB_ALIAS, database_path
+
+
+class Command(BaseCommand):
+    help = (
+        'Nukopijuoja pagrindinę SQLite bazę į skaitymo kopiją (replica) su sqlite3 backup API. '
+        'Kopija sukuriama laikiname faile ir pakeičiama atomiškai, todėl skaitytojai nemato pusiau nukopijuotos bazės.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Kartoti kas nurodytą sekundžių skaičių (0 - vieną kartą).')
+
+    def handle(self, *args, **options):
+        if REPLICA_DB_ALIAS not in settings.DATABASES:
+            raise CommandError('Skaitymo kopija nesukonfigūruota (nustatykite VYRTUVE_REPLICA_DB).')
+
+        for alias in (DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS):
+            if settings.DATABASES[alias]['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f'{alias} nėra SQLite bazė.')
+
+        primary = database_path(DEFAULT_DB_ALIAS)
+        replica = database_path(REPLICA_DB_ALIAS)
+
+        while True:
+            started = time.monotonic()
+            self.sync(primary, replica)
+            self.stdout.write(self.style.SUCCESS(
+                f'{primary} -> {replica} nukopijuota per {time.monotonic() - started:.2f} s'
+            ))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, primary, replica):
+        temporary = f'{replica}.tmp'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+        source = sqlite3.connect(primary)
+        target = sqlite3.connect(temporary)
+        try:
+            source.backup(target)
+            # kopija atidaroma tik skaitymui, todėl ji neturi būti WAL režime (WAL reikia -shm failo)
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+            source.close()
+
+        os.replace(temporary, replica)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Vyrtuve.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        'Perskaičiuoja visų receptų Bajeso reitingą ir populiarumą (rankings.py). '
+        'Skirta paleisti periodiškai, pvz. kas valandą per cron.'
+    )
+
+    def handle(self, *args, **options):
+        recipes, active = update_rankings()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rūšiavimo balai perskaičiuoti {recipes} receptams, veiklos turi {active}.'
+        ))
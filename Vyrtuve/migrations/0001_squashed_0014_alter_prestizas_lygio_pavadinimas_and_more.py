@@ -0,0 +1,121 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    replaces = [
+        ('Vyrtuve', '0001_initial'),
+        ('Vyrtuve', '0002_rename_profilis_profilis_user'),
+        ('Vyrtuve', '0003_rename_user_profilis_profilis'),
+        ('Vyrtuve', '0004_alter_profilis_nuotrauka'),
+        ('Vyrtuve', '0005_alter_profilis_nuotrauka'),
+        ('Vyrtuve', '0006_reitingas_favoritas_delete_favoritas'),
+        ('Vyrtuve', '0007_profilis_prestizo_taskai_and_more'),
+        ('Vyrtuve', '0008_alter_prestizas_lygio_pavadinimas_and_more'),
+        ('Vyrtuve', '0009_remove_receptas_vidutinis_reitingas_and_more'),
+        ('Vyrtuve', '0010_receptas_vidutinis_reitingas_and_more'),
+        ('Vyrtuve', '0011_alter_receptas_vidutinis_reitingas_and_more'),
+        ('Vyrtuve', '0012_remove_prestizas_lygio_pavadinimas_and_more'),
+        ('Vyrtuve', '0013_prestizas_lygio_pavadinimas_alter_prestizas_ikona'),
+        ('Vyrtuve', '0014_alter_prestizas_lygio_pavadinimas_and_more'),
+    ]
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prestizas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lygio_pavadinimas', models.CharField(blank=True, choices=[('Prestizo lygis įprastas', 'Įprastas'), ('Prestizo lygis bronzinis', 'Bronzinis'), ('Prestizo lygis sidabrinis', 'Sidabrinis'), ('Prestizo lygis auksinis', 'Auksinis'), ('Prestizo lygis Administratorius', 'Administratorius')], max_length=40, null=True)),
+                ('tasku_reikalavimas', models.IntegerField()),
+                ('ikona', models.ImageField(blank=True, null=True, upload_to='prestizo_ikonai/')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Raktazodis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('raktazodis', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Sablonas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pavadinimas', models.CharField(max_length=50)),
+                ('aprasas', models.TextField(max_length=2000)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Profilis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vardas', models.CharField(max_length=50)),
+                ('aprasas', models.TextField(max_length=2000)),
+                ('nuotrauka', models.ImageField(blank=True, default='default-user.png', upload_to='profiliu_nuotraukos/')),
+                ('prestizo_taskai', models.IntegerField(default=0)),
+                ('prestizas', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Vyrtuve.prestizas')),
+                ('profilis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Receptas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titulas', models.CharField(max_length=50)),
+                ('aprasas', models.TextField(max_length=2000)),
+                ('ingridientai', models.TextField(max_length=2000)),
+                ('instrukcijos', models.TextField(max_length=2000)),
+                ('nuotrauka', models.ImageField(blank=True, null=True, upload_to='receptai/')),
+                ('gaminimo_laikas', models.FloatField()),
+                ('vidutinis_reitingas', models.FloatField(default=0)),
+                ('reitingu_kiekis', models.IntegerField(default=0)),
+                ('favoritu_kiekis', models.IntegerField(default=0)),
+                ('ar_vegetariskas', models.BooleanField(default=False)),
+                ('ar_veganiskas', models.BooleanField(default=False)),
+                ('data', models.DateTimeField(auto_now_add=True)),
+                ('profilis', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='receptai', to='Vyrtuve.profilis')),
+                ('sablonas', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='Vyrtuve.sablonas')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Komentaras',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateTimeField(auto_now_add=True)),
+                ('turinys', models.TextField(max_length=2000)),
+                ('profilis', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='komentarai', to='Vyrtuve.profilis')),
+                ('receptas', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='komentarai', to='Vyrtuve.receptas')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReceptoRaktazodis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('raktazodis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='raktazodziai_recepto', to='Vyrtuve.raktazodis')),
+                ('receptas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='raktazodziai_recepto', to='Vyrtuve.receptas')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Reitingas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('favoritas', models.BooleanField(default=False)),
+                ('reitingas', models.IntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5)], default=1)),
+                ('profilis', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reitingai', to='Vyrtuve.profilis')),
+                ('receptas', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reitingai', to='Vyrtuve.receptas')),
+            ],
+            options={
+                'unique_together': {('receptas', 'profilis')},
+            },
+        ),
+    ]
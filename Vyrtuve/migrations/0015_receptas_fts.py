@@ -0,0 +1,51 @@
+from django.db import migrations
+
+FTS_TABLE = 'Vyrtuve_receptas_fts'
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any('FTS5' in row[0] for row in cursor.fetchall())
+
+
+def create_fts_table(apps, schema_editor):
+    """
+    Sukuria receptų pilno teksto paieškos lentelę (search.py) ir užpildo ją esamais receptais.
+    Be FTS5 paieška naudoja icontains, todėl lentelė nekuriama.
+    """
+    if not has_fts5(schema_editor.connection):
+        return
+
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" USING fts5('
+        'titulas, aprasas, ingridientai, raktazodziai, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO "{FTS_TABLE}" (rowid, titulas, aprasas, ingridientai, raktazodziai) '
+        'SELECT r.id, r.titulas, r.aprasas, r.ingridientai, '
+        "COALESCE((SELECT group_concat(k.raktazodis, ' ') "
+        'FROM "Vyrtuve_receptoraktazodis" rk INNER JOIN "Vyrtuve_raktazodis" k ON k.id = rk.raktazodis_id '
+        "WHERE rk.receptas_id = r.id), '') "
+        'FROM "Vyrtuve_receptas" r'
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if has_fts5(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{FTS_TABLE}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0001_squashed_0014_alter_prestizas_lygio_pavadinimas_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:08
+
+from django.db import migrations, models
+from django.db.models import Case, Count, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import GreaterThan
+
+
+def fill_rating_totals(apps, schema_editor):
+    """
+    Užpildo reitingu_suma ir kartu perskaičiuoja reitingų kiekį, vidurkį ir favoritų kiekį, kad jie sutaptų su suma.
+    Toliau juos palaiko Receptas.apply_rating_delta().
+    """
+    Receptas = apps.get_model('Vyrtuve', 'Receptas')
+    Reitingas = apps.get_model('Vyrtuve', 'Reitingas')
+
+    def rating_subquery(expression):
+        ratings = Reitingas.objects.filter(receptas=OuterRef('pk')).order_by().values('receptas')
+        return Coalesce(Subquery(ratings.annotate(value=expression).values('value')), 0)
+
+    count = rating_subquery(Count('id'))
+    total = rating_subquery(Sum('reitingas'))
+
+    Receptas.objects.update(
+        reitingu_kiekis=count,
+        reitingu_suma=total,
+        favoritu_kiekis=rating_subquery(Count('id', filter=Q(favoritas=True))),
+        vidutinis_reitingas=Case(
+            When(GreaterThan(count, 0), then=Cast(total, FloatField()) / Cast(count, FloatField())),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0015_receptas_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receptas',
+            name='reitingu_suma',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0016_receptas_reitingu_suma'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Uzduotis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pavadinimas', models.CharField(max_length=50)),
+                ('raktas', models.CharField(max_length=100)),
+                ('duomenys', models.JSONField(default=dict)),
+                ('sukurta', models.DateTimeField(auto_now_add=True)),
+                ('bandymai', models.PositiveSmallIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0017_uzduotis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rekomendacija',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('panasumas', models.FloatField()),
+                ('eile', models.PositiveSmallIntegerField()),
+                ('receptas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rekomendacijos', to='Vyrtuve.receptas')),
+                ('rekomenduojamas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Vyrtuve.receptas')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['receptas', 'eile'], name='Vyrtuve_rek_recepta_9b419f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0018_rekomendacija'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reitingas',
+            index=models.Index(fields=['profilis', 'favoritas', 'receptas'], name='Vyrtuve_rei_profili_c8ec84_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0019_reitingas_favoritu_indeksas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='receptoraktazodis',
+            index=models.Index(fields=['receptas', 'raktazodis'], name='Vyrtuve_rec_recepta_c5ef09_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0020_receptoraktazodis_indeksas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='komentaras',
+            index=models.Index(fields=['receptas', '-data'], name='Vyrtuve_kom_recepta_e36a84_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['vidutinis_reitingas', 'id'], name='Vyrtuve_rec_vidutin_614eb7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['ar_vegetariskas', 'vidutinis_reitingas', 'id'], name='Vyrtuve_rec_ar_vege_321e07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['ar_veganiskas', 'vidutinis_reitingas', 'id'], name='Vyrtuve_rec_ar_vega_315954_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['ar_vegetariskas', 'ar_veganiskas'], name='Vyrtuve_rec_ar_vege_4c6b77_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['data', 'id'], name='Vyrtuve_rec_data_2862cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptoraktazodis',
+            index=models.Index(fields=['raktazodis', 'receptas'], name='Vyrtuve_rec_raktazo_6b6248_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:09
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_updated(apps, schema_editor):
+    """
+    Esamų receptų atnaujinta nustatoma į sukūrimo laiką, o ne migracijos laiką.
+    """
+    Receptas = apps.get_model('Vyrtuve', 'Receptas')
+    Receptas.objects.update(atnaujinta=F('data'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0021_karstu_keliu_indeksai'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receptas',
+            name='atnaujinta',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+    ]
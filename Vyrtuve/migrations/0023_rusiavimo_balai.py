@@ -0,0 +1,71 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:09
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast
+
+# rankings.PRIOR_VOTES migracijos metu
+PRIOR_VOTES = 10
+
+
+def fill_rankings(apps, schema_editor):
+    """
+    Esamų reitingų laikas nežinomas, todėl nustatomas į recepto sukūrimo laiką (kitaip visi seni balsai būtų
+    laikomi paskutinių dienų veikla). Bajeso reitingas suskaičiuojamas iš sumos ir kiekio, o populiarumą
+    suskaičiuoja `manage.py update_rankings`.
+    """
+    Receptas = apps.get_model('Vyrtuve', 'Receptas')
+    Reitingas = apps.get_model('Vyrtuve', 'Reitingas')
+
+    Reitingas.objects.filter(receptas__isnull=False).update(
+        data=Subquery(Receptas.objects.filter(pk=OuterRef('receptas_id')).values('data')[:1]),
+    )
+
+    totals = Receptas.objects.aggregate(suma=Sum('reitingu_suma'), kiekis=Sum('reitingu_kiekis'))
+    mean = totals['suma'] / totals['kiekis'] if totals['kiekis'] else 0.0
+
+    Receptas.objects.update(bayeso_reitingas=(
+        Value(PRIOR_VOTES * mean) + Cast(F('reitingu_suma'), FloatField())
+    ) / (Value(float(PRIOR_VOTES)) + Cast(F('reitingu_kiekis'), FloatField())))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0022_receptas_atnaujinta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receptas',
+            name='bayeso_reitingas',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='receptas',
+            name='populiarumas',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reitingas',
+            name='data',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='komentaras',
+            index=models.Index(fields=['data'], name='Vyrtuve_kom_data_5b3a34_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['bayeso_reitingas', 'id'], name='Vyrtuve_rec_bayeso__f7db19_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['populiarumas', 'id'], name='Vyrtuve_rec_populia_726332_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reitingas',
+            index=models.Index(fields=['data'], name='Vyrtuve_rei_data_ed50f2_idx'),
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
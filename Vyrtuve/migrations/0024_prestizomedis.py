@@ -0,0 +1,76 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:09
+
+from django.conf import settings
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# leaderboard.CAPACITY ir prestige taškai migracijos metu
+CAPACITY = 2 ** 24
+FAVORITE_POINTS = 4
+FIVE_STAR_POINTS = 6
+
+
+def fill_leaderboard(apps, schema_editor):
+    """
+    Perskaičiuoja profilių prestižo taškus ir lygį iš reitingų (seni duomenys galėjo būti išsiderinę, o toliau
+    taškai keičiami tik pokyčiais) ir iš jų sukuria lyderių lentelės medį (kaip leaderboard.rebuild_leaderboard()).
+    """
+    Prestizas = apps.get_model('Vyrtuve', 'Prestizas')
+    Profilis = apps.get_model('Vyrtuve', 'Profilis')
+    PrestizoMedis = apps.get_model('Vyrtuve', 'PrestizoMedis')
+    Reitingas = apps.get_model('Vyrtuve', 'Reitingas')
+
+    points = {
+        row['receptas__profilis_id']: row['favoritai'] * FAVORITE_POINTS + row['penketai'] * FIVE_STAR_POINTS
+        for row in Reitingas.objects.filter(receptas__profilis__isnull=False).order_by().values(
+            'receptas__profilis_id',
+        ).annotate(favoritai=Count('id', filter=Q(favoritas=True)), penketai=Count('id', filter=Q(reitingas=5)))
+    }
+    levels = list(Prestizas.objects.order_by('-tasku_reikalavimas', '-id').values_list('tasku_reikalavimas', 'id'))
+
+    changed = []
+    for profile in Profilis.objects.only('id', 'prestizo_taskai', 'prestizas_id'):
+        profile.prestizo_taskai = points.get(profile.id, 0)
+        # aukščiausias lygis, kurio reikalavimą atitinka taškai; jei joks netinka, paliekamas esamas
+        profile.prestizas_id = next(
+            (level_id for threshold, level_id in levels if threshold <= profile.prestizo_taskai), profile.prestizas_id,
+        )
+        changed.append(profile)
+    Profilis.objects.bulk_update(changed, ['prestizo_taskai', 'prestizas'], batch_size=2000)
+
+    tree = defaultdict(int)
+
+    for row in Profilis.objects.order_by().values('prestizo_taskai').annotate(kiekis=Count('id')):
+        index = CAPACITY - min(max(row['prestizo_taskai'], 0), CAPACITY - 1)
+        while index <= CAPACITY:
+            tree[index] += row['kiekis']
+            index += index & -index
+
+    PrestizoMedis.objects.bulk_create(
+        [PrestizoMedis(mazgas=node, kiekis=count) for node, count in tree.items()], batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0023_rusiavimo_balai'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrestizoMedis',
+            fields=[
+                ('mazgas', models.IntegerField(primary_key=True, serialize=False)),
+                ('kiekis', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='profilis',
+            index=models.Index(fields=['prestizo_taskai', 'id'], name='Vyrtuve_pro_prestiz_ae5980_idx'),
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
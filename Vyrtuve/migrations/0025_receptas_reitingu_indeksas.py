@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0024_prestizomedis'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='receptas',
+            index=models.Index(fields=['reitingu_kiekis', 'reitingu_suma'], name='Vyrtuve_rec_reiting_eebe32_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.6 on 2026-10-18 23:40
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+# leaderboard.CAPACITY ir prestige taškai migracijos metu
+CAPACITY = 2 ** 24
+FAVORITE_POINTS = 4
+FIVE_STAR_POINTS = 6
+
+
+def fill_prestige_points(apps, schema_editor):
+    """
+    Perskaičiuoja profilių prestižo taškus ir lygį iš reitingų (kaip aggregates.recompute_prestige()), nes toliau
+    taškai keičiami tik pokyčiais (prestige.apply_prestige_change) ir seni, išsiderinę taškai liktų visam laikui.
+    Tada iš naujų taškų iš naujo sukuria lyderių lentelės medį (kaip leaderboard.rebuild_leaderboard()).
+    """
+    Prestizas = apps.get_model('Vyrtuve', 'Prestizas')
+    Profilis = apps.get_model('Vyrtuve', 'Profilis')
+    PrestizoMedis = apps.get_model('Vyrtuve', 'PrestizoMedis')
+    Reitingas = apps.get_model('Vyrtuve', 'Reitingas')
+
+    ratings = Reitingas.objects.filter(receptas__profilis=OuterRef('pk')).order_by().values('receptas__profilis')
+    points = ratings.annotate(
+        value=Count('id', filter=Q(favoritas=True)) * FAVORITE_POINTS
+        + Count('id', filter=Q(reitingas=5)) * FIVE_STAR_POINTS
+    ).values('value')
+    Profilis.objects.update(prestizo_taskai=Coalesce(Subquery(points), 0))
+
+    # aukščiausias lygis, kurio reikalavimą atitinka taškai; jei joks netinka, paliekamas esamas
+    levels = Prestizas.objects.order_by('-tasku_reikalavimas', '-id').values_list('tasku_reikalavimas', 'id')
+    if levels:
+        Profilis.objects.update(prestizas_id=Case(
+            *[When(prestizo_taskai__gte=threshold, then=Value(level_id)) for threshold, level_id in levels],
+            default=F('prestizas_id'),
+            output_field=IntegerField(),
+        ))
+
+    tree = defaultdict(int)
+
+    for row in Profilis.objects.order_by().values('prestizo_taskai').annotate(kiekis=Count('id')):
+        index = CAPACITY - min(max(row['prestizo_taskai'], 0), CAPACITY - 1)
+        while index <= CAPACITY:
+            tree[index] += row['kiekis']
+            index += index & -index
+
+    PrestizoMedis.objects.all().delete()
+    PrestizoMedis.objects.bulk_create(
+        [PrestizoMedis(mazgas=node, kiekis=count) for node, count in tree.items()], batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0025_receptas_reitingu_indeksas'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_prestige_points, migrations.RunPython.noop),
+    ]
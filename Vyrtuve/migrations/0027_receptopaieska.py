@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-19 00:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0026_profilis_prestizo_taskai'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceptoPaieska',
+            fields=[
+                ('receptas', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='paieska', serialize=False, to='Vyrtuve.receptas')),
+                ('dokumentas', models.TextField(db_column='Vyrtuve_receptas_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'Vyrtuve_receptas_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:12
+
+from django.db import migrations
+
+from Vyrtuve.recommendations import BATCH_SIZE, CANDIDATE_ORDER, neighbour_lists
+
+
+def backfill_recommendations(apps, schema_editor):
+    """
+    Užpildo Rekomendacija lentelę (0018_rekomendacija) esamiems receptams. Vėliau sąrašus palaiko užduotis
+    'recommendations' ir rebuild_recommendations komanda, todėl jau užpildyta lentelė nekeičiama.
+    """
+    Receptas = apps.get_model('Vyrtuve', 'Receptas')
+    ReceptoRaktazodis = apps.get_model('Vyrtuve', 'ReceptoRaktazodis')
+    Rekomendacija = apps.get_model('Vyrtuve', 'Rekomendacija')
+
+    if Rekomendacija.objects.exists():
+        return
+
+    links = ReceptoRaktazodis.objects.order_by(*CANDIDATE_ORDER).values_list('receptas_id', 'raktazodis_id')
+    ratings = dict(Receptas.objects.values_list('id', 'vidutinis_reitingas'))
+
+    rows = (
+        Rekomendacija(receptas_id=recipe_id, rekomenduojamas_id=other_id, panasumas=similarity, eile=position)
+        for recipe_id, neighbours in neighbour_lists(links.iterator(), ratings)
+        for position, (other_id, similarity) in enumerate(neighbours)
+    )
+    Rekomendacija.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Vyrtuve', '0027_receptopaieska'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_recommendations, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import post_save
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .retry import REQUEST_TIMEOUT, retry_on_locked
 
 
 class Prestizas(models.Model):
@@ -33,6 +39,10 @@ class Profilis(models.Model):
     prestizas = models.ForeignKey(Prestizas, on_delete=models.SET_NULL, null=True, blank=True)
     prestizo_taskai = models.IntegerField(default=0)
 
+    class Meta:
+        # lyderių lentelė (leaderboard.py) skaito geriausius profilius pagal taškus
+        indexes = [models.Index(fields=['prestizo_taskai', 'id'])]
+
     def __str__(self):
         return f"{self.vardas} Profilis"
 
@@ -45,48 +55,6 @@ class Profilis(models.Model):
             self.nuotrauka = 'default-user.png'
         super().save(*args, **kwargs)
 
-    def recalculate_prestige(self, recipe_id):
-        """
-        recalculate_prestige() yra iškviečiama vartotojui įvedus favoritą arba reitingą.
-        Šios funkcijos darbas yra perskaičiuoti įvertinto recepto savininko prestižo lygį
-        naudojantis jų visų receptų reitingais ir favoritais.
-        """
-        recipe = Receptas.objects.get(id=recipe_id)
-
-        profile = recipe.profilis
-
-        total_prestige = 0
-
-        ratings = recipe.reitingai.all()
-
-        for rating in ratings:
-            if rating.favoritas:
-                total_prestige += 4
-            if rating.reitingas == 5:
-                total_prestige += 6
-
-        profile.prestizo_taskai = total_prestige
-        profile.save()
-
-        profile.update_prestige_level()
-
-    def update_prestige_level(self):
-        """
-        update_prestige_level() yra iškviečiama vartotojui įvedus favoritą arba reitingą.
-        (nes tai iškviečia recalculate_prestige, kuris iškviečia šią funkciją).
-
-        Šios funkcijos darbas yra paskirti tinkamą prestižo lygį atsižvelgiant į profilio prestižo taškus
-        ir prestižo lygio taškų reikalavimus.
-        """
-        prestige_levels = Prestizas.objects.all()
-
-        for level in prestige_levels.order_by('-tasku_reikalavimas'):
-            if self.prestizo_taskai >= level.tasku_reikalavimas:
-                self.prestizas = level
-                break
-
-        self.save()
-
 
 class Sablonas(models.Model):
     """
@@ -113,42 +81,93 @@ class Receptas(models.Model):
 
     vidutinis_reitingas = models.FloatField(default=0)
     reitingu_kiekis = models.IntegerField(default=0)
+    reitingu_suma = models.IntegerField(default=0)
 
     favoritu_kiekis = models.IntegerField(default=0)
 
+    # iš anksto suskaičiuoti rūšiavimo balai (rankings.py)
+    bayeso_reitingas = models.FloatField(default=0)
+    populiarumas = models.FloatField(default=0)
+
     ar_vegetariskas = models.BooleanField(default=False)
     ar_veganiskas = models.BooleanField(default=False)
 
     data = models.DateTimeField(auto_now_add=True)
+    # paskutinis puslapyje matomų duomenų pakeitimas (redagavimas, reitingai, komentarai, raktažodžiai),
+    # iš jo skaičiuojami ETag ir Last-Modified (conditional.py)
+    atnaujinta = models.DateTimeField(auto_now=True, db_index=True)
 
     sablonas = models.ForeignKey(Sablonas, on_delete=models.SET_NULL, null=True)
     profilis = models.ForeignKey(Profilis, related_name='receptai', on_delete=models.CASCADE, null=True)
 
+    class Meta:
+        # receptų sąrašas rūšiuojamas pagal (vidutinis_reitingas, id) ir dažnai filtruojamas bei skaičiuojamas
+        # pagal dietą (facets.py); indeksus tikrina `manage.py explain_hotpaths`
+        indexes = [
+            models.Index(fields=['vidutinis_reitingas', 'id']),
+            models.Index(fields=['ar_vegetariskas', 'vidutinis_reitingas', 'id']),
+            models.Index(fields=['ar_veganiskas', 'vidutinis_reitingas', 'id']),
+            models.Index(fields=['ar_vegetariskas', 'ar_veganiskas']),
+            models.Index(fields=['data', 'id']),
+            models.Index(fields=['bayeso_reitingas', 'id']),
+            models.Index(fields=['populiarumas', 'id']),
+            # visų reitingų vidurkis (rankings.compute_prior_mean) skaitomas tik iš įvertintų receptų
+            models.Index(fields=['reitingu_kiekis', 'reitingu_suma']),
+        ]
+
     def __str__(self):
         return self.titulas
 
-    def start_counting(self):
+    @classmethod
+    def apply_rating_delta(cls, recipe_id, suma=0, kiekis=0, favoritai=0):
         """
-        Funkcija start_counting() yra iškviečiama pateikus pakeitimus reitinguose ir favorituose.
-        Iškviesta, ši funkcija naujai suskaičiuoja favoritų ir reitingų kiekį, bei vidutinį recepto reitingą.
+        apply_rating_delta() atomiškai prideda pokyčius prie recepto reitingų sumos, kiekio ir favoritų kiekio
+        bei toje pačioje UPDATE užklausoje perskaičiuoja vidutinį reitingą iš sumos ir kiekio.
         """
-        ratings = self.reitingai.all()
-
-        self.reitingu_kiekis = ratings.count()
-
-        total_rating = 0
-
-        for rating in ratings:
-            total_rating += rating.reitingas
+        if not (suma or kiekis or favoritai):
+            return
+
+        new_total = F('reitingu_suma') + suma
+        new_count = F('reitingu_kiekis') + kiekis
+
+        cls.objects.filter(pk=recipe_id).update(
+            reitingu_suma=new_total,
+            reitingu_kiekis=new_count,
+            favoritu_kiekis=F('favoritu_kiekis') + favoritai,
+            vidutinis_reitingas=Case(
+                When(reitingu_kiekis__gt=-kiekis, then=Cast(new_total, FloatField()) / new_count),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+            atnaujinta=timezone.now(),
+        )
+
+    @classmethod
+    def touch(cls, recipe_ids=None):
+        """
+        touch() pažymi nurodytus (arba visus) receptus kaip pasikeitusius, kai pasikeičia jų puslapyje rodomi
+        susiję duomenys (komentarai, raktažodžiai, rekomendacijos), o pats receptas neįrašomas.
+        """
+        recipes = cls.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
 
-        if self.reitingu_kiekis > 0:
-            self.vidutinis_reitingas = total_rating / self.reitingu_kiekis
-        else:
-            self.vidutinis_reitingas = 0
+        recipes.update(atnaujinta=timezone.now())
 
-        self.favoritu_kiekis = ratings.filter(favoritas=True).count()
+    @classmethod
+    def touch_commented(cls, profile_ids):
+        """
+        touch_commented() pažymi pasikeitusiais receptus, kuriuose komentavo nurodyti profiliai: prie komentarų
+        rodomas komentatoriaus vardas ir prestižo lygio ikona. Gražina paliestų receptų id.
+        """
+        recipe_ids = list(
+            Komentaras.objects.filter(profilis_id__in=profile_ids, receptas__isnull=False)
+            .order_by().values_list('receptas_id', flat=True).distinct()
+        )
+        if recipe_ids:
+            cls.touch(recipe_ids)
 
-        self.save()
+        return recipe_ids
 
 
 class Reitingas(models.Model):
@@ -162,12 +181,91 @@ class Reitingas(models.Model):
     favoritas = models.BooleanField(default=False)
     reitingas = models.IntegerField(choices=[(i, i) for i in range(1, 6)], default=1)
 
+    # paskutinio balsavimo laikas, naudojamas populiarumui (rankings.py)
+    data = models.DateTimeField(auto_now=True)
+
     class Meta:
         unique_together = ['receptas', 'profilis']
+        indexes = [
+            models.Index(fields=['profilis', 'favoritas', 'receptas']),
+            models.Index(fields=['data']),
+        ]
 
     def __str__(self):
         return f"Reitingas {self.receptas.titulas} nuo {self.profilis.vardas}"
 
+    @classmethod
+    def upsert(cls, receptas_id, profilis_id, reitingas, favoritas, on_write=None):
+        """
+        upsert() įrašo profilio reitingą receptui arba pakeičia esamą viena INSERT ... ON CONFLICT DO UPDATE
+        užklausa ir gražina ankstesnę (reitingas, favoritas) porą arba None, jei reitingo nebuvo.
+
+        Ankstesnė reikšmė perskaitoma toje pačioje transakcijoje. SQLite transakcijos pradedamos IMMEDIATE
+        (settings.py), todėl lygiagretus to paties vartotojo balsas palaukia ir mato jau įrašytą reitingą,
+        o kitose bazėse esamą eilutę užrakina select_for_update(). Taip skaitiklių pokytis
+        (jobs.enqueue_rating_change) visada skaičiuojamas nuo tikros ankstesnės reikšmės.
+
+        on_write(ankstesnis reitingas) iškviečiama toje pačioje transakcijoje, todėl į jobs.DatabaseBackend eilę
+        įdėtos skaitiklių užduotys įrašomos kartu su balsu: arba abu, arba nė vienas.
+        """
+        rating = cls(receptas_id=receptas_id, profilis_id=profilis_id, reitingas=reitingas, favoritas=favoritas)
+        old_rating = cls._write(rating, on_write)
+
+        # bulk_create signalų nesiunčia, o jų gavėjai (podėlis) turi suveikti kaip po save().
+        # Signalas siunčiamas vieną kartą po įrašymo: jei gavėjas nepavyktų, pakartotas įrašymas perskaitytų jau naują
+        # reitingą ir balso pokytis būtų prarastas
+        post_save.send(
+            sender=cls, instance=rating, created=old_rating is None, update_fields=None, raw=False,
+            using=router.db_for_write(cls, instance=rating),
+        )
+
+        return old_rating
+
+    @classmethod
+    @retry_on_locked(timeout=REQUEST_TIMEOUT)
+    def _write(cls, rating, on_write=None):
+        """
+        _write() yra upsert() transakcija: perskaito ankstesnį reitingą, įrašo naują ir iškviečia on_write.
+        Tik ji kartojama, jei bazė užrakinta (retry.py).
+        """
+        with transaction.atomic():
+            old_rating = (
+                cls.objects.select_for_update()
+                .filter(receptas_id=rating.receptas_id, profilis_id=rating.profilis_id)
+                .values_list('reitingas', 'favoritas')
+                .first()
+            )
+            cls.objects.bulk_create(
+                [rating],
+                update_conflicts=True,
+                unique_fields=['receptas', 'profilis'],
+                update_fields=['reitingas', 'favoritas', 'data'],
+            )
+            if on_write is not None:
+                on_write(old_rating)
+
+        return old_rating
+
+    @staticmethod
+    def aggregate_delta(old_rating, new_rating):
+        """
+        aggregate_delta() gražina (reitingų sumos, reitingų kiekio, favoritų kiekio) pokytį
+        pakeitus reitingą iš old_rating į new_rating. Abu yra (reitingas, favoritas) poros arba None.
+        """
+        suma = kiekis = favoritai = 0
+
+        if old_rating is not None:
+            suma -= old_rating[0]
+            kiekis -= 1
+            favoritai -= int(bool(old_rating[1]))
+
+        if new_rating is not None:
+            suma += new_rating[0]
+            kiekis += 1
+            favoritai += int(bool(new_rating[1]))
+
+        return suma, kiekis, favoritai
+
 
 class Komentaras(models.Model):
     """
@@ -181,6 +279,12 @@ class Komentaras(models.Model):
 
     turinys = models.TextField(max_length=2000)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['receptas', '-data']),
+            models.Index(fields=['data']),
+        ]
+
     def __str__(self):
         return f"Komentaras {self.receptas.titulas} nuo {self.profilis.vardas}"
 
@@ -202,5 +306,73 @@ class ReceptoRaktazodis(models.Model):
     receptas = models.ForeignKey(Receptas, related_name='raktazodziai_recepto', on_delete=models.CASCADE)
     raktazodis = models.ForeignKey(Raktazodis, related_name='raktazodziai_recepto', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['receptas', 'raktazodis']),
+            models.Index(fields=['raktazodis', 'receptas']),
+        ]
+
     def __str__(self):
         return f"Keyword {self.raktazodis.raktazodis} for {self.receptas.titulas}"
+
+
+class ReceptoPaieska(models.Model):
+    """
+    Modelis ReceptoPaieska aprašo FTS5 paieškos lentelę (search.py, migracija 0015_receptas_fts), kad paieška
+    galėtų ją prijungti prie receptų (JOIN per rowid). Lentelę kuria ir pildo search.py, todėl ji nevaldoma.
+    dokumentas yra paslėptas stulpelis lentelės vardu, su kuriuo naudojamas MATCH, o rank - bm25 rangas.
+    """
+    receptas = models.OneToOneField(
+        Receptas, primary_key=True, db_column='rowid', related_name='paieska',
+        on_delete=models.DO_NOTHING, db_constraint=False,
+    )
+    dokumentas = models.TextField(db_column='Vyrtuve_receptas_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'Vyrtuve_receptas_fts'
+
+
+class Uzduotis(models.Model):
+    """
+    Modelis Uzduotis saugo foninių užduočių eilę, kai naudojama jobs.DatabaseBackend realizacija.
+    """
+    pavadinimas = models.CharField(max_length=50)
+    raktas = models.CharField(max_length=100)
+    duomenys = models.JSONField(default=dict)
+    sukurta = models.DateTimeField(auto_now_add=True)
+    # nepavykusių vykdymų skaičius (jobs.DatabaseBackend.drain)
+    bandymai = models.PositiveSmallIntegerField(default=0)
+
+    def __str__(self):
+        return f"Uzduotis {self.pavadinimas}({self.raktas})"
+
+
+class PrestizoMedis(models.Model):
+    """
+    Modelis PrestizoMedis saugo Fenwick medžio mazgus, iš kurių lyderių lentelė (leaderboard.py) skaičiuoja
+    profilio vietą pagal prestižo taškus. Trūkstamas mazgas reiškia 0.
+    """
+    mazgas = models.IntegerField(primary_key=True)
+    kiekis = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"PrestizoMedis {self.mazgas}: {self.kiekis}"
+
+
+class Rekomendacija(models.Model):
+    """
+    Modelis Rekomendacija saugo iš anksto suskaičiuotus panašiausius receptus (pagal raktažodžių Jaccard panašumą).
+    Kiekvienam receptui laikoma iki recommendations.TOP_K įrašų, surūšiuotų pagal eile.
+    """
+    receptas = models.ForeignKey(Receptas, related_name='rekomendacijos', on_delete=models.CASCADE)
+    rekomenduojamas = models.ForeignKey(Receptas, related_name='+', on_delete=models.CASCADE)
+    panasumas = models.FloatField()
+    eile = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['receptas', 'eile'])]
+
+    def __str__(self):
+        return f"Rekomendacija {self.rekomenduojamas_id} receptui {self.receptas_id}"
@@ -0,0 +1,205 @@
+"""
+pagination modulis realizuoja puslapiavimą pagal žymeklį (keyset / cursor pagination).
+
+Vietoj OFFSET kiekvienas puslapis prasideda po paskutinio ankstesnio puslapio įrašo rūšiavimo reikšmių,
+todėl bet kurio puslapio užklausa kainuoja tiek pat ir nereikia COUNT per visą rezultatų aibę.
+Žymeklis yra pasirašytas (django.core.signing), todėl jo negalima suklastoti, bet jis neužšifruotas: tai base64 JSON,
+kurį gali perskaityti bet kas, todėl į jį dedamos tik rūšiavimo reikšmės, kurias vartotojas ir taip mato.
+Į jį įeina ir rūšiavimas, kuriam jis sukurtas, todėl kito rūšiavimo žymeklis laikomas neteisingu (pirmas puslapis).
+"""
+import datetime
+import json
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+CURSOR_SALT = 'Vyrtuve.pagination.cursor'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    CursorEncoder saugo datas visu tikslumu. DjangoJSONEncoder jas sutrumpina iki milisekundžių, o tada
+    lyginant su paskutiniu puslapio įrašu (data, id) praleidžiami ar pakartojami įrašai.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+    """
+    CursorSerializer leidžia žymeklyje saugoti datas (CursorEncoder jas paverčia ISO tekstu).
+    """
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=CursorEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+def encode_cursor(direction, ordering, values):
+    return signing.dumps(
+        [direction, ordering, values], salt=CURSOR_SALT, serializer=CursorSerializer, compress=True,
+    )
+
+
+def decode_cursor(cursor, ordering):
+    """
+    decode_cursor() gražina (kryptis, reikšmės) arba None jei žymeklis neteisingas ar sukurtas kitam rūšiavimui.
+    """
+    try:
+        direction, cursor_ordering, values = signing.loads(cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+    if direction not in ('next', 'prev') or cursor_ordering != ordering or not isinstance(values, list):
+        return None
+
+    return direction, values
+
+
+def cursor_key(cursor, ordering):
+    """
+    cursor_key() gražina žymeklio raktą podėliui (pvz. {% cache %} fragmentui): kryptį ir reikšmes be parašo
+    arba '', jei žymeklio nėra ar jis neteisingas (rodomas pirmas puslapis). Tas pats puslapis turi daug žymeklių
+    (parašas su laiku), o suklastoti rodo pirmą puslapį, todėl podėlio įrašų lieka ne daugiau nei puslapių.
+    """
+    order_by = [('-' if descending else '') + field for field, descending in ordering]
+    decoded = decode_cursor(cursor, order_by) if cursor else None
+
+    if decoded is None or len(decoded[1]) != len(ordering):
+        return ''
+
+    return json.dumps(decoded, separators=(',', ':'), cls=CursorEncoder)
+
+
+class KeysetPage:
+    """
+    KeysetPage yra vienas puslapis. Jį galima iteruoti kaip django Page objektą.
+    """
+
+    def __init__(self, object_list, next_cursor, prev_cursor, count=None, count_is_exact=True):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.count = count
+        self.count_is_exact = count_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    KeysetPaginator puslapiuoja querysetą pagal ordering - (laukas, ar_mažėjančiai) porų sąrašą.
+    Paskutinis ordering laukas turi būti unikalus (pvz. id), kad rūšiavimas būtų vienareikšmis.
+
+    count_limit nurodo iki kiek įrašų skaičiuoti apytikslį rezultatų kiekį (None - neskaičiuoti).
+    """
+
+    def __init__(self, queryset, ordering, per_page, count_limit=None):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.count_limit = count_limit
+
+    def _order_by(self, reverse=False):
+        return [
+            ('-' if descending != reverse else '') + field
+            for field, descending in self.ordering
+        ]
+
+    def _after(self, values, reverse=False):
+        """
+        _after() sudaro sąlygą "įrašas eina po values" duota rūšiavimo kryptimi:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+
+        return condition
+
+    def _values(self, obj):
+        return [getattr(obj, field) for field, descending in self.ordering]
+
+    def approximate_count(self):
+        """
+        approximate_count() suskaičiuoja rezultatus, bet ne daugiau nei count_limit + 1,
+        todėl kaina nepriklauso nuo visos rezultatų aibės dydžio.
+        """
+        if self.count_limit is None:
+            return None, True
+
+        count = self.queryset.order_by()[:self.count_limit + 1].count()
+
+        if count > self.count_limit:
+            return self.count_limit, False
+
+        return count, True
+
+    def _filter(self, cursor):
+        """
+        _filter() gražina (queryset, kryptis, ar_yra_žymeklis). Neteisingas žymeklis (ir reikšmės, netinkančios
+        laukų tipams) ignoruojamas - rodomas pirmas puslapis.
+        """
+        decoded = decode_cursor(cursor, self._order_by()) if cursor else None
+
+        if decoded is not None and len(decoded[1]) == len(self.ordering):
+            reverse = decoded[0] == 'prev'
+            try:
+                queryset = self.queryset.filter(self._after(decoded[1], reverse))
+            except (ValidationError, ValueError, TypeError):
+                pass
+            else:
+                return queryset.order_by(*self._order_by(reverse)), reverse, True
+
+        return self.queryset.order_by(*self._order_by()), False, False
+
+    def get_page(self, cursor=None):
+        queryset, reverse, has_cursor = self._filter(cursor)
+
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if reverse:
+            object_list.reverse()
+            has_next = True
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = has_cursor
+
+        next_cursor = None
+        prev_cursor = None
+
+        if object_list and has_next:
+            next_cursor = encode_cursor('next', self._order_by(), self._values(object_list[-1]))
+        if object_list and has_previous:
+            prev_cursor = encode_cursor('prev', self._order_by(), self._values(object_list[0]))
+
+        count, count_is_exact = self.approximate_count()
+
+        return KeysetPage(object_list, next_cursor, prev_cursor, count, count_is_exact)
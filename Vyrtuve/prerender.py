@@ -0,0 +1,167 @@
+"""
+prerender modulis iš anksto sugeneruoja anoniminiams lankytojams skirtas recepto puslapių ir pirmų receptų sąrašo
+puslapių HTML kopijas, kurias priekinis serveris (pvz. nginx) pateikia tiesiai iš disko, nekviesdamas Django.
+
+Failai rašomi į VYRTUVE_PRERENDER['ROOT'] katalogą (jei jis nenurodytas, modulis išjungtas):
+    - recipe/<pk>/index.html - recepto puslapis,
+    - index.html - pirmas sąrašo puslapis be filtrų,
+    - index/<cursor>.html - kiti INDEX_PAGES puslapiai; vardas yra URL užkoduotas žymeklis iš "Kitas" nuorodos.
+
+Puslapiai atnaujinami užduočių eilėje (jobs.enqueue_prerender) pasikeitus receptui, jo reitingams, komentarams,
+raktažodžiams ar rekomendacijoms. Visus puslapius iš naujo sugeneruoja `manage.py prerender`.
+
+Prisijungę vartotojai turi gauti dinaminį puslapį, todėl priekinis serveris statinį failą naudoja tik GET
+užklausoms be sesijos slapuko, pvz.:
+
+    location ~ ^/recipe/(\\d+)/$ {
+        if ($cookie_sessionid) { proxy_pass http://django; }
+        root /kelias/iki/ROOT;
+        try_files /recipe/$1/index.html @django;
+    }
+
+Sąrašui analogiškai: /index.html, kai užklausa neturi parametrų, ir /index/$arg_cursor.html, kai turi tik cursor.
+"""
+import os
+import tempfile
+from pathlib import Path
+from urllib.parse import quote_plus
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import reverse
+
+from .facets import get_facets
+from .listing import get_listing_page, parse_filters
+from .models import Receptas
+
+DEFAULTS = {
+    'ROOT': None,
+    'INDEX_PAGES': 3,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'VYRTUVE_PRERENDER', {})}
+
+
+def prerender_enabled():
+    return bool(get_config()['ROOT'])
+
+
+def anonymous_request(path):
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    return request
+
+
+def write_page(relative_path, content):
+    """
+    write_page() atomiškai įrašo puslapį (os.replace), kad priekinis serveris niekada nematytų pusiau įrašyto failo.
+    """
+    path = Path(get_config()['ROOT']) / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as output:
+        output.write(content)
+
+    os.chmod(output.name, 0o644)
+    os.replace(output.name, path)
+
+
+def remove_page(relative_path):
+    (Path(get_config()['ROOT']) / relative_path).unlink(missing_ok=True)
+
+
+def recipe_path(recipe_id):
+    return f'recipe/{recipe_id}/index.html'
+
+
+def render_recipe(recipe_id):
+    """
+    render_recipe() gražina recepto puslapio HTML, kokį matytų anoniminis lankytojas, arba None, jei recepto nėra.
+    """
+    # views importuoja jobs, o jobs - šį modulį
+    from .views import ReceptasDetail
+
+    request = anonymous_request(reverse('recipe', args=[recipe_id]))
+
+    try:
+        response = ReceptasDetail.as_view()(request, pk=recipe_id)
+    except Http404:
+        return None
+
+    return response.render().content
+
+
+def prerender_recipes(recipe_ids):
+    """
+    prerender_recipes() perrašo nurodytų receptų puslapius, o ištrintų receptų puslapius pašalina.
+    """
+    for recipe_id in recipe_ids:
+        content = render_recipe(recipe_id)
+
+        if content is None:
+            remove_page(recipe_path(recipe_id))
+        else:
+            write_page(recipe_path(recipe_id), content)
+
+
+def prerender_index():
+    """
+    prerender_index() perrašo pirmus INDEX_PAGES sąrašo puslapius ir pašalina ankstesnės kartos puslapius.
+    Gražina sugeneruotų puslapių skaičių.
+    """
+    from .views import index_context
+
+    filters = parse_filters({})
+    request = anonymous_request(reverse('index'))
+    facets = get_facets(filters)
+
+    cursor = None
+    written = set()
+
+    for _ in range(get_config()['INDEX_PAGES']):
+        page = get_listing_page(filters, cursor)
+        content = render_to_string('index.html', index_context(filters, page, facets), request)
+
+        name = 'index.html' if cursor is None else f'index/{quote_plus(cursor)}.html'
+        write_page(name, content.encode())
+        written.add(name)
+
+        if not page.has_next():
+            break
+        cursor = page.next_cursor
+
+    # žymekliai kiekvieną kartą pasirašomi iš naujo, todėl seni puslapiai nebepasiekiami iš naujų nuorodų
+    index_dir = Path(get_config()['ROOT']) / 'index'
+    if index_dir.is_dir():
+        for path in index_dir.glob('*.html'):
+            if f'index/{path.name}' not in written:
+                path.unlink(missing_ok=True)
+
+    return len(written)
+
+
+def prerender_all(chunk_size=500):
+    """
+    prerender_all() sugeneruoja visų receptų ir sąrašo puslapius ir pašalina nebeegzistuojančių receptų puslapius.
+    Gražina sugeneruotų receptų puslapių skaičių.
+    """
+    recipe_ids = set()
+
+    for recipe_id in Receptas.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size):
+        prerender_recipes([recipe_id])
+        recipe_ids.add(recipe_id)
+
+    recipe_dir = Path(get_config()['ROOT']) / 'recipe'
+    if recipe_dir.is_dir():
+        for path in recipe_dir.glob('*/index.html'):
+            if not path.parent.name.isdigit() or int(path.parent.name) not in recipe_ids:
+                path.unlink(missing_ok=True)
+
+    prerender_index()
+
+    return len(recipe_ids)
@@ -0,0 +1,88 @@
+"""
+prestige modulis skaičiuoja profilių prestižo taškų pokyčius ir parenka prestižo lygį.
+
+Profilio prestizo_taskai yra visų jo receptų taškų suma: +4 už kiekvieną favoritą ir +6 už kiekvieną 5 žvaigždučių
+reitingą. Pakeitus reitingą pritaikomas tik pokytis, todėl nereikia perskaičiuoti visų autoriaus receptų.
+"""
+from bisect import bisect_right
+
+from django.db import transaction
+
+from . import leaderboard
+from .models import Profilis, Receptas
+from .reference import get_tiers
+
+FAVORITE_POINTS = 4
+FIVE_STAR_POINTS = 6
+
+
+def rating_points(rating):
+    """
+    rating_points() gražina kiek prestižo taškų duoda (reitingas, favoritas) pora arba None.
+    """
+    if rating is None:
+        return 0
+
+    points = 0
+    if rating[1]:
+        points += FAVORITE_POINTS
+    if rating[0] == 5:
+        points += FIVE_STAR_POINTS
+    return points
+
+
+def prestige_delta(old_rating, new_rating):
+    """
+    prestige_delta() gražina recepto autoriaus prestižo taškų pokytį pakeitus reitingą iš old_rating į new_rating.
+    """
+    return rating_points(new_rating) - rating_points(old_rating)
+
+
+def tier_for_points(points):
+    """
+    tier_for_points() dvejetaine paieška suranda aukščiausio lygio, kurio reikalavimą atitinka taškai, id.
+    Jei joks lygis netinka - gražina None.
+    """
+    thresholds, level_ids = get_tiers()
+    position = bisect_right(thresholds, points)
+
+    if position == 0:
+        return None
+
+    return level_ids[position - 1]
+
+
+def apply_prestige_change(profile_id, delta):
+    """
+    apply_prestige_change() prideda delta taškų prie profilio ir parenka naują prestižo lygį.
+    Taškai perskaitomi ir įrašomi vienoje transakcijoje: SQLite ją pradeda IMMEDIATE (settings.py), kitos bazės
+    užrakina eilutę (select_for_update), todėl lygiagretūs vykdytojai nemato senų taškų, o lyderių lentelė
+    perkeliama iš tikrai buvusių taškų. Pasikeitus lygiui paliečiami receptai, kuriuose profilis komentavo
+    (Receptas.touch_commented), ir gražinami jų id.
+    """
+    if not delta or profile_id is None:
+        return []
+
+    with transaction.atomic():
+        row = (
+            Profilis.objects.select_for_update().filter(pk=profile_id).values_list('prestizo_taskai', 'prestizas_id')
+            .first()
+        )
+
+        if row is None:
+            return []
+
+        points, old_level_id = row
+        changes = {'prestizo_taskai': points + delta}
+
+        level_id = tier_for_points(points + delta)
+        if level_id is not None:
+            changes['prestizas_id'] = level_id
+
+        Profilis.objects.filter(pk=profile_id).update(**changes)
+        leaderboard.move(points, points + delta)
+
+        if level_id is None or level_id == old_level_id:
+            return []
+
+        return Receptas.touch_commented([profile_id])
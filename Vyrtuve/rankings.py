@@ -0,0 +1,163 @@
+"""
+rankings modulis skaičiuoja receptų sąrašo rūšiavimo balus, laikomus indeksuotuose Receptas stulpeliuose,
+kad rūšiavimas būtų indekso perėjimas, o ne išraiškos skaičiavimas kiekvienai eilutei.
+
+Bajeso reitingas (bayeso_reitingas) = (PRIOR_VOTES * m + reitingų suma) / (PRIOR_VOTES + reitingų kiekis), kur m yra
+visų reitingų vidurkis. Receptas su vienu 5 balu nebeaplenkia recepto su šimtais 4.8 balų.
+
+Populiarumas (populiarumas) yra su laiku blėstanti veiklos (reitingų ir komentarų) suma: kiekvienas įvykis
+t metu prideda svoris * 2^((t - EPOCH) / HALF_LIFE). Visų receptų sumos dabar yra padaugintos iš to paties
+daugiklio, todėl rūšiavimas sutampa su "tikru" blėstančiu balu, o naują įvykį galima pridėti viena UPDATE
+užklausa neperskaičiuojant kitų receptų. Kad skaičius neperpildytų float, saugomas sumos log2 (0 - veiklos nėra),
+o įvykis pridedamas kaip log2(2^a + 2^b).
+
+Naujus įvykius prideda užduotys (jobs.py), o `manage.py update_rankings` periodiškai viską perskaičiuoja tiksliai:
+atnaujina m, o populiarumą skaičiuoja tik iš paskutinių WINDOW_DAYS dienų veiklos.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Greatest, Least, Log, Power
+from django.utils import timezone
+
+from .caching import get_cache, invalidate_listing, invalidate_rankings
+from .models import Komentaras, Receptas, Reitingas
+
+PRIOR_VOTES = 10
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE = timedelta(days=3)
+WINDOW_DAYS = 30
+
+RATING_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+PRIOR_MEAN_KEY = 'vyrtuve:rankings:prior_mean'
+
+BATCH_SIZE = 2000
+
+
+def activity_score(weight, when=None):
+    """
+    activity_score() gražina when metu (numatytai - dabar) įvykusios weight svorio veiklos balą (log2 skalėje).
+    """
+    when = when or timezone.now()
+    return math.log2(weight) + (when - EPOCH) / HALF_LIFE
+
+
+def log_add(a, b):
+    """
+    log_add() gražina log2(2^a + 2^b) neperpildant float.
+    """
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def log_add_expression(field, score):
+    """
+    log_add_expression() yra log_add() SQL išraiška: lauko reikšmei prideda score.
+    """
+    high = Greatest(F(field), Value(score))
+    low = Least(F(field), Value(score))
+    return high + Log(Value(2.0), Value(1.0) + Power(Value(2.0), low - high))
+
+
+def compute_prior_mean():
+    # receptai be reitingų sumai nieko neprideda, o (reitingu_kiekis, reitingu_suma) indeksas jų neskaito
+    totals = Receptas.objects.filter(reitingu_kiekis__gt=0).aggregate(
+        suma=Sum('reitingu_suma'), kiekis=Sum('reitingu_kiekis'),
+    )
+    if not totals['kiekis']:
+        return 0.0
+    return totals['suma'] / totals['kiekis']
+
+
+def prior_mean():
+    """
+    prior_mean() gražina visų reitingų vidurkį, kurį paskutinį kartą suskaičiavo update_rankings().
+    """
+    mean = get_cache().get(PRIOR_MEAN_KEY)
+
+    if mean is None:
+        mean = compute_prior_mean()
+        get_cache().set(PRIOR_MEAN_KEY, mean, None)
+
+    return mean
+
+
+def bayes_expression(mean):
+    """
+    bayes_expression() gražina bayeso_reitingas SQL išraišką iš recepto reitingų sumos ir kiekio.
+    """
+    return (
+        Value(PRIOR_VOTES * mean) + Cast(F('reitingu_suma'), FloatField())
+    ) / (Value(float(PRIOR_VOTES)) + Cast(F('reitingu_kiekis'), FloatField()))
+
+
+def apply_recipe_activity(recipe_id, veikla=0.0):
+    """
+    apply_recipe_activity() po reitingų pokyčio ar komentaro perskaičiuoja recepto Bajeso reitingą ir prideda
+    veikla svorio įvykį (užduotys sudeda kelių įvykių svorius) prie populiarumo viena UPDATE užklausa.
+    """
+    fields = {'bayeso_reitingas': bayes_expression(prior_mean()), 'atnaujinta': timezone.now()}
+
+    if veikla > 0:
+        fields['populiarumas'] = log_add_expression('populiarumas', activity_score(veikla))
+
+    Receptas.objects.filter(pk=recipe_id).update(**fields)
+
+
+def recompute_bayes(recipe_ids=None):
+    """
+    recompute_bayes() perskaičiuoja nurodytų (arba visų) receptų Bajeso reitingą. Gražina atnaujintų receptų skaičių.
+    """
+    recipes = Receptas.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+
+    return recipes.update(bayeso_reitingas=bayes_expression(prior_mean()))
+
+
+def recompute_trending(now=None):
+    """
+    recompute_trending() iš naujo suskaičiuoja visų receptų populiarumą iš paskutinių WINDOW_DAYS dienų reitingų ir
+    komentarų. Receptams be veiklos populiarumas nustatomas į 0. Gražina receptų su veikla skaičių.
+    """
+    since = (now or timezone.now()) - timedelta(days=WINDOW_DAYS)
+    scores = {}
+
+    events = [
+        (Reitingas.objects.filter(data__gte=since), RATING_WEIGHT),
+        (Komentaras.objects.filter(data__gte=since), COMMENT_WEIGHT),
+    ]
+    for queryset, weight in events:
+        for recipe_id, when in queryset.values_list('receptas_id', 'data').iterator():
+            if recipe_id is None:
+                continue
+            score = activity_score(weight, when)
+            scores[recipe_id] = log_add(scores[recipe_id], score) if recipe_id in scores else score
+
+    recipes = [Receptas(id=recipe_id, populiarumas=score) for recipe_id, score in scores.items()]
+
+    with transaction.atomic():
+        Receptas.objects.exclude(populiarumas=0).update(populiarumas=0)
+        Receptas.objects.bulk_update(recipes, ['populiarumas'], batch_size=BATCH_SIZE)
+
+    return len(scores)
+
+
+def update_rankings():
+    """
+    update_rankings() atnaujina reitingų vidurkį ir perskaičiuoja visų receptų Bajeso reitingą bei populiarumą.
+    Gražina (receptų, receptų su veikla) skaičių porą.
+    """
+    get_cache().set(PRIOR_MEAN_KEY, compute_prior_mean(), None)
+
+    counts = recompute_bayes(), recompute_trending()
+
+    invalidate_listing()
+    invalidate_rankings()
+
+    return counts
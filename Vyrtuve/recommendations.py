@@ -0,0 +1,304 @@
+"""
+recommendations modulis iš anksto suskaičiuoja panašius receptus pagal bendrus raktažodžius.
+
+Panašumas yra Jaccard koeficientas |A ∩ B| / |A ∪ B| tarp receptų raktažodžių aibių. Kandidatai renkami per
+atvirkštinį indeksą (raktažodis -> receptai), todėl lyginami tik receptai turintys bent vieną bendrą raktažodį.
+Populiarų raktažodį turi didelė dalis receptų, o porų kiekis auga kvadratu, todėl iš kiekvieno raktažodžio imama
+ne daugiau MAX_TAG_RECIPES geriausiai įvertintų receptų (CANDIDATE_ORDER). Panašumas kandidatams skaičiuojamas
+tiksliai, su visais raktažodžiais. Kiekvienam receptui išsaugoma TOP_K panašiausių receptų Rekomendacija lentelėje.
+
+Apriboti sąrašai priklauso nuo reitingų, o refresh_recommendations neperskaičiuoja kitų receptų sąrašų, kai receptas
+išstumia kitą receptą iš populiaraus raktažodžio apriboto sąrašo (ar jame atlaisvina vietą), todėl
+rebuild_recommendations komandą verta paleisti periodiškai. Ji perrašo tik pasikeitusius sąrašus.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Receptas, ReceptoRaktazodis, Rekomendacija
+
+TOP_K = 8
+
+# kiek rekomendacijų rodoma recepto puslapyje
+SHOWN = 4
+
+# iš kiek geriausiai įvertintų kiekvieno raktažodžio receptų renkami kandidatai
+MAX_TAG_RECIPES = 200
+CANDIDATE_ORDER = ('-receptas__vidutinis_reitingas', '-receptas_id')
+
+BATCH_SIZE = 2000
+
+# kiek receptų įrašoma vienoje transakcijoje ir kiek id dedama į vieną IN sąrašą
+CHUNK_SIZE = 500
+
+
+def jaccard(common, size, other_size):
+    return common / (size + other_size - common)
+
+
+def _rank(recipe_id, similarity, rating):
+    return -similarity, -(rating or 0), -recipe_id
+
+
+def top_neighbours(similarities, ratings):
+    """
+    top_neighbours() gražina TOP_K geriausių (recepto id, panašumas) porų.
+    Vienodo panašumo receptai rūšiuojami pagal vidutinį reitingą, tada pagal id.
+    """
+    ranked = sorted(similarities.items(), key=lambda item: _rank(*item, ratings.get(item[0])))
+    return ranked[:TOP_K]
+
+
+def _chunked(ids, size=CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _rows(recipe_id, neighbours):
+    return [
+        Rekomendacija(receptas_id=recipe_id, rekomenduojamas_id=other_id, panasumas=similarity, eile=position)
+        for position, (other_id, similarity) in enumerate(neighbours)
+    ]
+
+
+def neighbour_lists(links, ratings):
+    """
+    neighbour_lists() iš (recepto id, raktažodžio id) porų, surūšiuotų pagal CANDIDATE_ORDER, ir receptų reitingų
+    gražina (recepto id, TOP_K panašiausių) poras kiekvienam receptui su raktažodžiais.
+    """
+    tags_by_recipe = defaultdict(set)
+    recipes_by_tag = defaultdict(list)
+
+    for recipe_id, tag_id in links:
+        if tag_id not in tags_by_recipe[recipe_id]:
+            tags_by_recipe[recipe_id].add(tag_id)
+            recipes_by_tag[tag_id].append(recipe_id)
+
+    capped = {tag_id: recipe_ids[:MAX_TAG_RECIPES] for tag_id, recipe_ids in recipes_by_tag.items()}
+
+    for recipe_id, tags in tags_by_recipe.items():
+        candidates = set()
+        for tag_id in tags:
+            candidates.update(capped[tag_id])
+        candidates.discard(recipe_id)
+
+        similarities = {
+            other_id: jaccard(len(tags & tags_by_recipe[other_id]), len(tags), len(tags_by_recipe[other_id]))
+            for other_id in candidates
+        }
+        yield recipe_id, top_neighbours(similarities, ratings)
+
+
+def _save_lists(lists):
+    """
+    _save_lists() įrašo rekomendacijų sąrašus ({recepto id: [(id, panašumas), ...]}) dalimis po CHUNK_SIZE receptų,
+    kiekvieną dalį savo transakcijoje. Perrašomi ir pažymimi pasikeitusiais (Receptas.touch) tik tie sąrašai,
+    kurie skiriasi nuo išsaugotų. Gražina perrašytų sąrašų receptų id.
+    """
+    changed = []
+
+    for chunk in _chunked(lists):
+        stored = defaultdict(list)
+        rows = (
+            Rekomendacija.objects.filter(receptas_id__in=chunk)
+            .order_by('receptas_id', 'eile')
+            .values_list('receptas_id', 'rekomenduojamas_id', 'panasumas')
+        )
+        for recipe_id, other_id, similarity in rows:
+            stored[recipe_id].append((other_id, similarity))
+
+        rewrite = [recipe_id for recipe_id in chunk if stored[recipe_id] != list(lists[recipe_id])]
+        if not rewrite:
+            continue
+
+        with transaction.atomic():
+            Rekomendacija.objects.filter(receptas_id__in=rewrite).delete()
+            Rekomendacija.objects.bulk_create(
+                [row for recipe_id in rewrite for row in _rows(recipe_id, lists[recipe_id])], batch_size=BATCH_SIZE,
+            )
+            Receptas.touch(rewrite)
+
+        changed += rewrite
+
+    return changed
+
+
+def rebuild_recommendations():
+    """
+    rebuild_recommendations() perskaičiuoja visų receptų rekomendacijas iš naujo.
+    Gražina receptų su rekomendacijomis skaičių.
+    """
+    links = ReceptoRaktazodis.objects.order_by(*CANDIDATE_ORDER).values_list('receptas_id', 'raktazodis_id')
+    ratings = dict(Receptas.objects.values_list('id', 'vidutinis_reitingas'))
+
+    lists = dict(neighbour_lists(links.iterator(), ratings))
+    count = len(lists)
+
+    # receptai, kurie nebeturi raktažodžių, nebeturi ir rekomendacijų
+    stale = (
+        Rekomendacija.objects.exclude(receptas_id__in=ReceptoRaktazodis.objects.values('receptas_id'))
+        .values_list('receptas_id', flat=True)
+        .distinct()
+    )
+    lists.update(dict.fromkeys(stale, []))
+
+    _save_lists(lists)
+
+    return count
+
+
+def _tags(recipe_id):
+    return set(ReceptoRaktazodis.objects.filter(receptas_id=recipe_id).values_list('raktazodis_id', flat=True))
+
+
+def _capped(tag_id):
+    """
+    _capped() gražina receptus, iš kurių raktažodis duoda kandidatus (ne daugiau MAX_TAG_RECIPES geriausių).
+    """
+    recipe_ids = (
+        ReceptoRaktazodis.objects.filter(raktazodis_id=tag_id)
+        .order_by(*CANDIDATE_ORDER)
+        .values_list('receptas_id', flat=True)
+        .distinct()[:MAX_TAG_RECIPES]
+    )
+    return set(recipe_ids)
+
+
+def _similarities(tag_ids, recipe_ids):
+    """
+    _similarities() suskaičiuoja recepto su raktažodžiais tag_ids panašumą su nurodytais receptais.
+    Gražina ({recepto id: panašumas}, {recepto id: vidutinis reitingas}).
+    """
+    similarities = {}
+    ratings = {}
+
+    for chunk in _chunked(recipe_ids):
+        rows = (
+            Receptas.objects.filter(id__in=chunk)
+            .annotate(
+                kiekis=Count('raktazodziai_recepto__raktazodis_id', distinct=True),
+                bendri=Count(
+                    'raktazodziai_recepto__raktazodis_id', distinct=True,
+                    filter=Q(raktazodziai_recepto__raktazodis_id__in=tag_ids),
+                ),
+            )
+            .values_list('id', 'kiekis', 'bendri', 'vidutinis_reitingas')
+        )
+        for other_id, other_size, common, rating in rows:
+            similarities[other_id] = jaccard(common, len(tag_ids), other_size)
+            ratings[other_id] = rating
+
+    return similarities, ratings
+
+
+def similarities_for(recipe_id):
+    """
+    similarities_for() suskaičiuoja recepto panašumą su jo kandidatais.
+    Gražina ({recepto id: panašumas}, {recepto id: vidutinis reitingas}).
+    """
+    tag_ids = _tags(recipe_id)
+    candidates = set().union(*(_capped(tag_id) for tag_id in tag_ids)) - {recipe_id}
+
+    return _similarities(tag_ids, candidates)
+
+
+def _entering(recipe_id, rating, similarities):
+    """
+    _entering() gražina receptus, kurių sąraše receptas su nauju panašumu patektų į TOP_K: sąrašas dar neužpildytas
+    arba receptas būtų aukščiau už paskutinį sąrašo įrašą.
+    """
+    entering = set()
+
+    for chunk in _chunked(similarities):
+        last = {
+            other_id: row for other_id, *row in
+            Rekomendacija.objects.filter(receptas_id__in=chunk, eile=TOP_K - 1).values_list(
+                'receptas_id', 'rekomenduojamas_id', 'panasumas', 'rekomenduojamas__vidutinis_reitingas')
+        }
+        for other_id in chunk:
+            if other_id not in last or _rank(recipe_id, similarities[other_id], rating) < _rank(*last[other_id]):
+                entering.add(other_id)
+
+    return entering
+
+
+def _stored(recipe_ids):
+    """
+    _stored() gražina išsaugotus sąrašus ({recepto id: {id: panašumas}}, {id: vidutinis reitingas}).
+    """
+    lists = defaultdict(dict)
+    ratings = {}
+
+    for chunk in _chunked(recipe_ids):
+        rows = Rekomendacija.objects.filter(receptas_id__in=chunk).values_list(
+            'receptas_id', 'rekomenduojamas_id', 'panasumas', 'rekomenduojamas__vidutinis_reitingas')
+        for recipe_id, other_id, similarity, rating in rows:
+            lists[recipe_id][other_id] = similarity
+            ratings[other_id] = rating
+
+    return lists, ratings
+
+
+def refresh_recommendations(recipe_id):
+    """
+    refresh_recommendations() atnaujina rekomendacijas pasikeitus recepto raktažodžiams.
+    Gražina receptų, kurių rekomendacijų sąrašas perrašytas, id sąrašą.
+
+    Perskaičiuojamas paties recepto sąrašas. Kito recepto sąrašas perrašomas tik tada, kai receptas jame jau buvo
+    arba naujas panašumas jį įkelia į TOP_K, o kiti sąrašai ir jų atnaujinta nekeičiami. Jei receptas jau buvo
+    sąraše ir jo panašumas sumažėjo, sąrašas perskaičiuojamas pilnai, nes į atsilaisvinusią vietą gali patekti
+    kitas receptas.
+    """
+    rating = Receptas.objects.filter(id=recipe_id).values_list('vidutinis_reitingas', flat=True).first()
+    tag_ids = _tags(recipe_id)
+    capped = {tag_id: _capped(tag_id) for tag_id in tag_ids}
+    candidates = set().union(*capped.values()) - {recipe_id}
+
+    # receptai, kurių kandidatų aibėje yra šis receptas: turi raktažodį, kurio apribotame sąraše jis yra
+    reverse_tags = [tag_id for tag_id, recipe_ids in capped.items() if recipe_id in recipe_ids]
+    reverse = set(
+        ReceptoRaktazodis.objects.filter(raktazodis_id__in=reverse_tags).values_list('receptas_id', flat=True)
+    ) - {recipe_id}
+
+    similarities, ratings = _similarities(tag_ids, candidates | reverse)
+    if rating is not None:
+        ratings[recipe_id] = rating
+
+    lists = {}
+    if rating is not None:
+        lists[recipe_id] = top_neighbours({other_id: similarities[other_id] for other_id in candidates}, ratings)
+
+    listed_by = set(Rekomendacija.objects.filter(rekomenduojamas_id=recipe_id).values_list('receptas_id', flat=True))
+    entering = _entering(recipe_id, rating, {other_id: similarities[other_id] for other_id in reverse - listed_by})
+
+    stored, stored_ratings = _stored(listed_by | entering)
+    ratings.update(stored_ratings)
+
+    for other_id in listed_by | entering:
+        neighbours = stored[other_id]
+        old_similarity = neighbours.pop(recipe_id, None)
+        new_similarity = similarities[other_id] if other_id in reverse else None
+
+        if old_similarity is not None and (new_similarity is None or new_similarity < old_similarity):
+            neighbours, other_ratings = similarities_for(other_id)
+            ratings.update(other_ratings)
+        elif new_similarity is not None:
+            neighbours[recipe_id] = new_similarity
+
+        lists[other_id] = top_neighbours(neighbours, ratings)
+
+    return _save_lists(lists)
+
+
+def recommended_recipes(recipe, limit=SHOWN):
+    """
+    recommended_recipes() gražina rekomenduojamus receptus viena indeksuota užklausa.
+    """
+    rows = (
+        Rekomendacija.objects.filter(receptas=recipe)
+        .select_related('rekomenduojamas')
+        .order_by('eile')[:limit]
+    )
+    return [row.rekomenduojamas for row in rows]
@@ -0,0 +1,119 @@
+"""
+reference modulis laiko mažų, retai besikeičiančių lentelių (Prestizas, Sablonas, Raktazodis) kopiją proceso
+atmintyje, kad jos nebūtų užklausiamos kiekvienai užklausai (prestižo lygiai, formų pasirinkimai, recepto šablonas).
+
+Kopija užkraunama vieną kartą (trimis užklausomis) ir naudojama tol, kol nepasikeičia bendro podėlio versija
+(caching.reference_version). Ją padidina signalai įrašius ar ištrynus šių modelių objektą, o masiniai įrašymai
+(generate_data, import_recipes) - patys, todėl kiti procesai kopiją atnaujina kitos užklausos metu. Versijos
+patikrinimas yra vienas podėlio skaitymas, ne duomenų bazės užklausa. Kopija visada skaitoma iš pagrindinės bazės,
+nes skaitymo kopija (Diplominis/routers.py) gali dar neturėti pakeitimo, dėl kurio padidinta versija.
+
+Kopijos objektai yra bendri visoms gijoms, todėl jų keisti negalima - tik skaityti ar priskirti ryšiams.
+Kiekvienas get_reference() iškvietimas tikrina versiją podėlyje, todėl keliems objektams kopija paimama
+vieną kartą ir perduodama toliau (pvz. attach_prestige(profiles, data)), o ne ieškoma po vieną.
+"""
+import threading
+from typing import NamedTuple
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .caching import invalidate_reference, reference_version
+from .models import Prestizas, Raktazodis, Sablonas
+
+_data = None
+_lock = threading.Lock()
+
+
+class ReferenceData(NamedTuple):
+    version: int
+    # prestižo lygiai surūšiuoti pagal (tasku_reikalavimas, id)
+    prestizai: list
+    prestizai_by_id: dict
+    # (reikalavimų, lygių id) pora dvejetainei paieškai (prestige.tier_for_points)
+    tiers: tuple
+    sablonai: list
+    sablonai_by_id: dict
+    raktazodziai: list
+    raktazodziai_by_id: dict
+
+
+def load(version):
+    prestizai = list(Prestizas.objects.using(DEFAULT_DB_ALIAS).order_by('tasku_reikalavimas', 'id'))
+    sablonai = list(Sablonas.objects.using(DEFAULT_DB_ALIAS).order_by('id'))
+    raktazodziai = list(Raktazodis.objects.using(DEFAULT_DB_ALIAS).order_by('id'))
+
+    return ReferenceData(
+        version=version,
+        prestizai=prestizai,
+        prestizai_by_id={level.id: level for level in prestizai},
+        tiers=([level.tasku_reikalavimas for level in prestizai], [level.id for level in prestizai]),
+        sablonai=sablonai,
+        sablonai_by_id={template.id: template for template in sablonai},
+        raktazodziai=raktazodziai,
+        raktazodziai_by_id={keyword.id: keyword for keyword in raktazodziai},
+    )
+
+
+def get_reference():
+    """
+    get_reference() gražina atmintyje laikomą kopiją ir ją užkrauna iš naujo, jei pasikeitė versija.
+    """
+    global _data
+
+    version = reference_version()
+    data = _data
+
+    if data is None or data.version != version:
+        with _lock:
+            if _data is None or _data.version != version:
+                _data = load(version)
+            data = _data
+
+    return data
+
+
+def invalidate():
+    """
+    invalidate() padaro kopiją nebegaliojančia visuose procesuose (iškviečiama pakeitus kurį nors modelį).
+    """
+    global _data
+
+    invalidate_reference()
+    _data = None
+
+
+def default_prestige_level():
+    """
+    default_prestige_level() gražina žemiausią prestižo lygį, skiriamą naujam profiliui, arba None.
+    """
+    levels = get_reference().prestizai
+    return levels[0] if levels else None
+
+
+def get_tiers():
+    """
+    get_tiers() gražina pagal taškų reikalavimą surūšiuotą (reikalavimų, lygių id) porą (prestige.tier_for_points).
+    """
+    return get_reference().tiers
+
+
+def templates():
+    return get_reference().sablonai
+
+
+def keywords():
+    return get_reference().raktazodziai
+
+
+def attach_prestige(profiles, data=None):
+    """
+    attach_prestige() priskiria profiliams prestižo lygį iš kopijos, kad šablonai (prestizas.ikona)
+    nedarytų papildomų užklausų ir nereikėtų select_related('prestizas'). data - jau paimta kopija (get_reference).
+    """
+    levels = (data or get_reference()).prestizai_by_id
+
+    for profile in profiles:
+        if profile is not None and profile.prestizas_id is not None:
+            level = levels.get(profile.prestizas_id)
+            if level is not None:
+                profile.prestizas = level
@@ -0,0 +1,64 @@
+"""
+retry modulis pakartoja trumpas rašymo transakcijas, kai SQLite praneša "database is locked".
+
+Dažniausiai užrakto palaukia busy_timeout (settings.py), tačiau esant dideliam rašytojų kiekiui laukimas gali
+baigtis: SQLite laukiančius rašytojus žadina ne eilės tvarka, todėl kuris nors gali laukti ilgiau nei busy_timeout.
+Tada visa transakcija kartojama po vis ilgesnės pauzės (eksponentinis atidėjimas iki MAX_DELAY su atsitiktinumu,
+kad lygiagretūs rašytojai nesusidurtų vėl tuo pačiu metu), kol praeina timeout sekundžių. Funkcija kartojama tik kai
+ji pati yra visa transakcija - jei ji kviečiama iš kitos atomic() transakcijos, klaida perduodama toliau.
+
+Užklausos metu vykdomi rašymai (Reitingas.upsert) kartojami tik REQUEST_TIMEOUT sekundžių - maždaug vieną
+busy_timeout, kad užrakinta bazė neužlaikytų svetainės proceso ilgiau nei keletą sekundžių. Ilgesnis TIMEOUT
+skirtas užduotims ir valdymo komandoms (jobs.py), kurių niekas nelaukia.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 60
+# maždaug PRAGMA busy_timeout (settings.py)
+REQUEST_TIMEOUT = 5
+DELAY = 0.05
+MAX_DELAY = 1.0
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def is_locked_error(error):
+    return isinstance(error, OperationalError) and any(message in str(error) for message in LOCKED_MESSAGES)
+
+
+def retry_on_locked(timeout=TIMEOUT, delay=DELAY, using=None):
+    """
+    retry_on_locked() dekoratorius kartoja funkciją, jei ji nepavyko dėl užrakintos bazės, kol praeina timeout sekundžių.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            deadline = time.monotonic() + timeout
+            attempt = 0
+
+            while True:
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as error:
+                    pause = min(delay * 2 ** attempt, MAX_DELAY) * (1 + random.random())
+                    if (
+                        not is_locked_error(error)
+                        or time.monotonic() + pause > deadline
+                        or transaction.get_connection(using).in_atomic_block
+                    ):
+                        raise
+
+                    attempt += 1
+                    logger.warning('%s: bazė užrakinta, kartojama po %.2f s', func.__qualname__, pause)
+                    time.sleep(pause)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,172 @@
+"""
+search modulis pasirūpina receptų pilno teksto paieška naudojantis SQLite FTS5 virtualia lentele.
+
+Lentelėje laikomi recepto titulas, aprašas, ingridientai ir visi recepto raktažodžiai.
+Tokenizatorius unicode61 su remove_diacritics 2 leidžia ieškoti nepaisant lietuviškų raidžių
+(pvz. "saltibarsciai" randa "Šaltibarščiai").
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, Lookup, Q
+
+from .models import Receptas, Raktazodis, ReceptoPaieska, ReceptoRaktazodis
+
+
+FTS_TABLE = 'Vyrtuve_receptas_fts'
+
+INDEXED_FIELDS = {'titulas', 'aprasas', 'ingridientai'}
+
+_supported = {}
+
+
+class Match(Lookup):
+    """
+    Match yra FTS5 `lentelė MATCH užklausa` paieška (ReceptoPaieska.dokumentas__match).
+    """
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+ReceptoPaieska._meta.get_field('dokumentas').register_lookup(Match)
+
+
+def is_supported(using=DEFAULT_DB_ALIAS):
+    """
+    is_supported() patikrina ar duomenų bazė yra SQLite su įjungtu FTS5 plėtiniu.
+    Rezultatas įsimenamas kiekvienam duomenų bazės aliasui.
+    """
+    if using not in _supported:
+        connection = connections[using]
+        supported = False
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA compile_options')
+                supported = any('FTS5' in row[0] for row in cursor.fetchall())
+
+        _supported[using] = supported
+
+    return _supported[using]
+
+
+def _document_sql(where=''):
+    """
+    _document_sql() gražina SELECT užklausą kuri surenka recepto tekstą ir raktažodžius
+    tokiu pavidalu, kokiu jie įrašomi į FTS lentelę.
+    """
+    return (
+        'SELECT r.id, r.titulas, r.aprasas, r.ingridientai, '
+        "COALESCE((SELECT group_concat(k.raktazodis, ' ') "
+        'FROM "{link}" rk INNER JOIN "{tag}" k ON k.id = rk.raktazodis_id '
+        "WHERE rk.receptas_id = r.id), '') "
+        'FROM "{recipe}" r {where}'
+    ).format(
+        link=ReceptoRaktazodis._meta.db_table,
+        tag=Raktazodis._meta.db_table,
+        recipe=Receptas._meta.db_table,
+        where=where,
+    )
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS):
+    """
+    create_search_index() sukuria FTS lentelę jei jos dar nėra ir užpildo ją esamais receptais.
+    Lentelę sukuria migracija 0015_receptas_fts, o ši funkcija naudojama `manage.py rebuild_search_index`.
+    """
+    if not is_supported(using):
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" USING fts5('
+            'titulas, aprasas, ingridientai, raktazodziai, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{FTS_TABLE}")')
+        is_empty = not cursor.fetchone()[0]
+
+    if is_empty:
+        rebuild_search_index(using)
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS):
+    """
+    rebuild_search_index() iš naujo perrašo visą FTS lentelę viena INSERT ... SELECT užklausa.
+    """
+    if not is_supported(using):
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{FTS_TABLE}"')
+        cursor.execute(
+            f'INSERT INTO "{FTS_TABLE}" (rowid, titulas, aprasas, ingridientai, raktazodziai) ' + _document_sql()
+        )
+
+
+def index_recipes(recipe_ids, using=DEFAULT_DB_ALIAS):
+    """
+    index_recipes() atnaujina nurodytų receptų įrašus FTS lentelėje.
+    Ištrinti receptai tiesiog pašalinami iš lentelės, nes SELECT jų nebegrąžina.
+    """
+    recipe_ids = [int(recipe_id) for recipe_id in recipe_ids if recipe_id is not None]
+
+    if not recipe_ids or not is_supported(using):
+        return
+
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{FTS_TABLE}" WHERE rowid IN ({placeholders})', recipe_ids)
+        cursor.execute(
+            f'INSERT INTO "{FTS_TABLE}" (rowid, titulas, aprasas, ingridientai, raktazodziai) '
+            + _document_sql(where=f'WHERE r.id IN ({placeholders})'),
+            recipe_ids,
+        )
+
+
+def build_match_query(query):
+    """
+    build_match_query() paverčia vartotojo įvestą tekstą į FTS5 MATCH išraišką.
+    Kiekvienas žodis ieškomas kaip priešdėlis, o visi žodžiai turi būti rasti (AND).
+    """
+    words = re.findall(r'\w+', query or '')
+
+    if not words:
+        return None
+
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(recipes, query):
+    """
+    search_recipes() pritaiko paieškos užklausą receptų querysetui.
+
+    Su FTS5 gražinami tik rasti receptai su paieskos_rangas anotacija (bm25, mažesnis yra geresnis).
+    Jei FTS5 neprieinamas, naudojama sena icontains paieška.
+    """
+    if not query or not query.strip():
+        return recipes
+
+    match = build_match_query(query)
+
+    if match is None:
+        return recipes.none()
+
+    if not is_supported(recipes.db):
+        return recipes.filter(
+            Q(titulas__icontains=query) |
+            Q(aprasas__icontains=query) |
+            Q(ingridientai__icontains=query) |
+            Q(raktazodziai_recepto__raktazodis__raktazodis__icontains=query)
+        ).distinct()
+
+    # FTS lentelė prijungiama vieną kartą (ReceptoPaieska), todėl MATCH vykdomas vieną kartą visai užklausai,
+    # o rangas skaitomas iš prijungtos eilutės, o ne atskira subužklausa kiekvienam receptui
+    return recipes.filter(paieska__dokumentas__match=match).annotate(
+        paieskos_rangas=F('paieska__rank'),
+    )
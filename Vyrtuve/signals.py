@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import Profilis, User
+from .models import (
+    Komentaras, Profilis, User, Prestizas, Receptas, Raktazodis, ReceptoRaktazodis, Reitingas, Sablonas,
+)
+from . import caching, jobs, leaderboard, rankings, reference, search
 
 """
 create_profile klausosi User modelio post_save signalo
@@ -9,4 +12,245 @@ create_profile klausosi User modelio post_save signalo
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
-        Profilis.objects.create(profilis=instance)
\ No newline at end of file
+        Profilis.objects.create(profilis=instance, prestizas=reference.default_prestige_level())
+
+
+"""
+reindex_recipe ir unindex_recipe palaiko paieškos indeksą atnaujintą po recepto pakeitimų
+"""
+@receiver(post_save, sender=Receptas)
+def reindex_recipe(sender, instance, update_fields=None, using=None, **kwargs):
+    if update_fields and not search.INDEXED_FIELDS.intersection(update_fields):
+        return
+    search.index_recipes([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Receptas)
+def unindex_recipe(sender, instance, using=None, **kwargs):
+    search.index_recipes([instance.pk], using=using)
+
+
+"""
+reindex_recipe_keywords atnaujina recepto paieškos įrašą pridėjus ar pašalinus raktažodį
+"""
+@receiver(post_save, sender=ReceptoRaktazodis)
+@receiver(post_delete, sender=ReceptoRaktazodis)
+def reindex_recipe_keywords(sender, instance, using=None, **kwargs):
+    search.index_recipes([instance.receptas_id], using=using)
+
+
+"""
+reindex_keyword atnaujina visus receptus turinčius pervadintą raktažodį
+"""
+@receiver(post_save, sender=Raktazodis)
+def reindex_keyword(sender, instance, created, using=None, **kwargs):
+    if created:
+        return
+    recipe_ids = ReceptoRaktazodis.objects.using(using).filter(raktazodis=instance).values_list('receptas_id', flat=True)
+    search.index_recipes(list(recipe_ids), using=using)
+
+
+"""
+reset_reference_data padaro nebegaliojančia atmintyje laikomą prestižo lygių, šablonų ir raktažodžių kopiją
+(reference.py) visuose procesuose, o pasikeitus prestižo lygiams - ir profilių fragmentus
+"""
+@receiver(post_save, sender=Prestizas)
+@receiver(post_delete, sender=Prestizas)
+@receiver(post_save, sender=Sablonas)
+@receiver(post_delete, sender=Sablonas)
+@receiver(post_save, sender=Raktazodis)
+@receiver(post_delete, sender=Raktazodis)
+def reset_reference_data(sender, **kwargs):
+    reference.invalidate()
+    if sender is Prestizas:
+        caching.invalidate_profiles()
+
+
+"""
+invalidate_listing_cache ir invalidate_favorites_cache padaro nebegaliojančiais receptų sąrašo puslapius podėlyje
+"""
+@receiver(post_save, sender=Receptas)
+@receiver(post_delete, sender=Receptas)
+@receiver(post_save, sender=ReceptoRaktazodis)
+@receiver(post_delete, sender=ReceptoRaktazodis)
+@receiver(post_save, sender=Raktazodis)
+@receiver(post_delete, sender=Raktazodis)
+def invalidate_listing_cache(sender, **kwargs):
+    caching.invalidate_listing()
+
+
+@receiver(post_save, sender=Reitingas)
+@receiver(post_delete, sender=Reitingas)
+def invalidate_favorites_cache(sender, instance, **kwargs):
+    caching.invalidate_favorites(instance.profilis_id)
+    caching.invalidate_profile(instance.profilis_id)
+
+
+"""
+invalidate_profile_cache padaro nebegaliojančiais viešo profilio fragmentus pasikeitus profiliui ar jo receptams
+"""
+@receiver(post_save, sender=Profilis)
+@receiver(post_delete, sender=Profilis)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    caching.invalidate_profile(instance.pk)
+
+
+@receiver(post_save, sender=Receptas)
+@receiver(post_delete, sender=Receptas)
+def invalidate_author_profile_cache(sender, instance, **kwargs):
+    caching.invalidate_profile(instance.profilis_id)
+
+
+"""
+touch_recipe ir touch_keyword_recipes atnaujina recepto atnaujinta laiką (ETag/Last-Modified, conditional.py)
+pasikeitus jo komentarams ar raktažodžiams. Reitingų pokyčius atnaujinta įrašo recipe_ratings užduotis kartu su
+skaitikliais (Receptas.apply_rating_delta), o balsuotojo reitingą į ETag įtraukia recipe_validators
+"""
+@receiver(post_save, sender=Komentaras)
+@receiver(post_delete, sender=Komentaras)
+@receiver(post_save, sender=ReceptoRaktazodis)
+@receiver(post_delete, sender=ReceptoRaktazodis)
+def touch_recipe(sender, instance, **kwargs):
+    if instance.receptas_id is not None:
+        Receptas.touch([instance.receptas_id])
+
+
+@receiver(post_save, sender=Raktazodis)
+def touch_keyword_recipes(sender, instance, created, **kwargs):
+    if not created:
+        Receptas.touch(ReceptoRaktazodis.objects.filter(raktazodis=instance).values('receptas_id'))
+
+
+"""
+touch_commenter_recipes ir touch_prestige_recipes paliečia receptus, kuriuose komentavo profilis, pasikeitus jo
+vardui ar lygiui (admin, profilio forma) arba paties prestižo lygio ikonai - ji rodoma prie komentarų.
+Lygį pagal taškus keičia prestige.apply_prestige_change ir aggregates.refresh_prestige, jie receptus paliečia patys
+"""
+@receiver(post_save, sender=Profilis)
+def touch_commenter_recipes(sender, instance, created, **kwargs):
+    if not created:
+        jobs.enqueue_prerender(Receptas.touch_commented([instance.pk]))
+
+
+@receiver(post_save, sender=Prestizas)
+@receiver(pre_delete, sender=Prestizas)
+def touch_prestige_recipes(sender, instance, **kwargs):
+    jobs.enqueue_prerender(Receptas.touch_commented(Profilis.objects.filter(prestizas=instance).values('id')))
+
+
+"""
+prerender_recipe suplanuoja statinių puslapių (prerender.py) atnaujinimą pasikeitus receptui, jo komentarams
+ar raktažodžiams. Reitingų pokyčiai perrašomi recipe_ratings užduotyje, kai jau atnaujinti skaitikliai.
+"""
+@receiver(post_save, sender=Receptas)
+@receiver(post_delete, sender=Receptas)
+def prerender_recipe(sender, instance, **kwargs):
+    jobs.enqueue_prerender([instance.pk], index=True)
+
+
+@receiver(post_save, sender=Komentaras)
+@receiver(post_delete, sender=Komentaras)
+@receiver(post_save, sender=ReceptoRaktazodis)
+@receiver(post_delete, sender=ReceptoRaktazodis)
+def prerender_related_recipe(sender, instance, **kwargs):
+    if instance.receptas_id is not None:
+        jobs.enqueue_prerender([instance.receptas_id], index=sender is ReceptoRaktazodis)
+
+
+"""
+rank_new_recipe suskaičiuoja naujo recepto Bajeso reitingą (rankings.py). Be balsų jis lygus visų reitingų
+vidurkiui, todėl rūšiuojant pagal bayeso_reitingas naujas receptas nenukrenta už visų įvertintų
+"""
+@receiver(post_save, sender=Receptas)
+def rank_new_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rankings.recompute_bayes([instance.pk])
+
+
+"""
+count_comment_activity prideda naują komentarą prie recepto populiarumo (rankings.py)
+"""
+@receiver(post_save, sender=Komentaras)
+def count_comment_activity(sender, instance, created, **kwargs):
+    if created and instance.receptas_id is not None:
+        jobs.enqueue('recipe_activity', instance.receptas_id, veikla=rankings.COMMENT_WEIGHT)
+
+
+"""
+remember_prestige_points, update_leaderboard ir remove_from_leaderboard atnaujina lyderių lentelę (leaderboard.py)
+sukūrus, ištrynus profilį ar įrašius pakeistus jo taškus (admin).
+prestige.apply_prestige_change taškus keičia UPDATE užklausa, todėl lentelę atnaujina pats.
+"""
+@receiver(pre_save, sender=Profilis)
+def remember_prestige_points(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and 'prestizo_taskai' not in update_fields):
+        return
+    instance._saved_prestige_points = (
+        Profilis.objects.filter(pk=instance.pk).values_list('prestizo_taskai', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Profilis)
+def update_leaderboard(sender, instance, created, **kwargs):
+    if created:
+        leaderboard.move(None, instance.prestizo_taskai)
+    elif hasattr(instance, '_saved_prestige_points'):
+        old_points = instance._saved_prestige_points
+        del instance._saved_prestige_points
+        leaderboard.move(old_points, instance.prestizo_taskai)
+
+
+@receiver(post_delete, sender=Profilis)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    leaderboard.move(instance.prestizo_taskai, None)
+
+
+"""
+remember_image_name ir create_image_variants suplanuoja nuotraukų variantų sukūrimą tik įkėlus naują nuotrauką:
+įrašius objektą su ta pačia nuotrauka ar numatytąja (pvz. default-user.png) užduotis nededama.
+Numatytosios nuotraukos variantus vieną kartą sukuria `manage.py generate_image_variants`.
+"""
+def _image_field_name(sender):
+    return 'ikona' if sender is Prestizas else 'nuotrauka'
+
+
+@receiver(pre_save, sender=Receptas)
+@receiver(pre_save, sender=Profilis)
+@receiver(pre_save, sender=Prestizas)
+def remember_image_name(sender, instance, update_fields=None, **kwargs):
+    field_name = _image_field_name(sender)
+
+    if instance.pk is None or (update_fields is not None and field_name not in update_fields):
+        return
+    instance._saved_image_name = (
+        sender.objects.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Receptas)
+@receiver(post_save, sender=Profilis)
+@receiver(post_save, sender=Prestizas)
+def create_image_variants(sender, instance, update_fields=None, **kwargs):
+    field_name = _image_field_name(sender)
+    old_name = None
+    if hasattr(instance, '_saved_image_name'):
+        old_name = instance._saved_image_name
+        del instance._saved_image_name
+
+    if update_fields and field_name not in update_fields:
+        return
+
+    name = getattr(instance, field_name).name
+    if not name or name == old_name or name == sender._meta.get_field(field_name).default:
+        return
+
+    jobs.enqueue('image_variants', f'{instance._meta.model_name}:{instance.pk}')
+
+
+"""
+refresh_recommendations suplanuoja rekomendacijų atnaujinimą pasikeitus recepto raktažodžiams
+"""
+@receiver(post_save, sender=ReceptoRaktazodis)
+@receiver(post_delete, sender=ReceptoRaktazodis)
+def refresh_recommendations(sender, instance, **kwargs):
+    jobs.enqueue('recommendations', instance.receptas_id)
@@ -0,0 +1,51 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from Vyrtuve.images import MIME_TYPES, VARIANTS, variant_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def variant(field_file, name, extension=None):
+    """
+    {% variant receptas.nuotrauka 'card' %} gražina nuotraukos varianto URL.
+    """
+    return variant_url(field_file, name, extension)
+
+
+@register.simple_tag
+def variant_srcset(field_file, *names, extension=None):
+    """
+    {% variant_srcset receptas.nuotrauka 'card' 'detail' %} gražina srcset reikšmę iš kelių variantų.
+    """
+    return ', '.join(
+        f'{variant_url(field_file, name, extension)} {VARIANTS[name][0]}w'
+        for name in names
+    )
+
+
+@register.simple_tag
+def picture(field_file, name, alt='', **attrs):
+    """
+    {% picture receptas.nuotrauka 'card' alt=receptas.titulas class='card-img-top' %} sugeneruoja <picture>
+    su WebP šaltiniu ir atsarginiu <img>. Jei nuotraukos nėra - nieko negražina.
+    """
+    if not field_file:
+        return ''
+
+    webp_url = variant_url(field_file, name, 'webp')
+    fallback_url = variant_url(field_file, name)
+
+    if webp_url == fallback_url:
+        source = ''
+    else:
+        source = format_html('<source type="{}" srcset="{}">', MIME_TYPES['webp'], webp_url)
+
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}" loading="lazy"{}></picture>',
+        source,
+        fallback_url,
+        alt,
+        format_html_join('', ' {}="{}"', attrs.items()),
+    )
@@ -0,0 +1,978 @@
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from html import unescape
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connections
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_save
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from . import reference
+from .aggregates import (
+    reconcile_prestige, reconcile_recipes, recompute_prestige, recompute_recipe_aggregates, refresh_prestige,
+)
+from .jobs import JOB_HANDLERS, DatabaseBackend, LocalBackend, enqueue, enqueue_rating_change
+from .leaderboard import profile_rank, rebuild_leaderboard, tier_leaders
+from .facets import KEYWORD_LIMIT, get_facets
+from .images import variant_name
+from .listing import PER_PAGE, parse_filters
+from .management.commands.check_query_budget import ANONYMOUS_BUDGET, AUTHENTICATED_BUDGET
+from .models import (
+    Komentaras, Prestizas, Profilis, Raktazodis, Receptas, ReceptoRaktazodis, Reitingas, Rekomendacija, User,
+    Uzduotis,
+)
+from .pagination import decode_cursor, encode_cursor
+from .prestige import FAVORITE_POINTS, FIVE_STAR_POINTS, apply_prestige_change
+from .rankings import prior_mean, update_rankings
+from .recommendations import CANDIDATE_ORDER, neighbour_lists, rebuild_recommendations, refresh_recommendations
+from .retry import retry_on_locked
+from .search import search_recipes
+
+
+def create_recipe(profile, title='Receptas'):
+    return Receptas.objects.create(
+        titulas=title, aprasas='', ingridientai='', instrukcijos='', gaminimo_laikas=1, profilis=profile,
+    )
+
+
+def create_profiles(count, prefix='vartotojas'):
+    # Profilis sukuriamas create_profile signale (signals.py)
+    return [User.objects.create(username=f'{prefix}{number}').profilis for number in range(count)]
+
+
+def create_image(name='nuotrauka.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (200, 200), (200, 80, 40)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+# testai įkeltas nuotraukas ir jų variantus rašo į laikiną katalogą, o ne į media/
+MEDIA_ROOT = tempfile.mkdtemp(prefix='vyrtuve-media-')
+_media_root = override_settings(MEDIA_ROOT=MEDIA_ROOT)
+
+
+def setUpModule():
+    _media_root.enable()
+
+
+def tearDownModule():
+    _media_root.disable()
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class JobQueueTests(TestCase):
+
+    @override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.DatabaseBackend'})
+    def test_vote_and_jobs_commit_together(self):
+        """
+        Balsas ir jo skaitiklių užduotys įrašomi vienoje transakcijoje: nepavykus įdėti užduočių
+        atšaukiamas ir balsas.
+        """
+        author, voter = create_profiles(2)
+        recipe = create_recipe(author)
+
+        self.client.force_login(voter.profilis)
+        response = self.client.post(f'/recipe/{recipe.id}/', {'rating': '1', 'reitingas': 5, 'favoritas': 'on'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertCountEqual(
+            Uzduotis.objects.values_list('pavadinimas', flat=True), ['recipe_ratings', 'author_prestige'],
+        )
+
+        def fail(old_rating):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            Reitingas.upsert(recipe.id, voter.id, 1, False, on_write=fail)
+
+        self.assertEqual(Reitingas.objects.get(receptas=recipe).reitingas, 5)
+        self.assertEqual(Uzduotis.objects.count(), 2)
+
+    def test_failed_local_job_is_retried_then_persisted(self):
+        """
+        LocalBackend nepavykusią užduotį bando dar kartą, o po MAX_ATTEMPTS bandymų įrašo į Uzduotis lentelę,
+        iš kurios ją įvykdo DatabaseBackend (manage.py run_jobs).
+        """
+        calls = []
+
+        def handler(key, **payload):
+            calls.append(payload)
+            if len(calls) <= 2:
+                raise RuntimeError
+
+        JOB_HANDLERS['test'] = handler
+        self.addCleanup(JOB_HANDLERS.pop, 'test')
+        backend = LocalBackend(DELAY=60, MAX_ATTEMPTS=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            backend.enqueue('test', 1, {'kiekis': 2})
+
+        with self.assertLogs('Vyrtuve.jobs', 'ERROR'):
+            backend.flush()
+            self.assertFalse(Uzduotis.objects.exists())
+            backend.flush()
+
+        self.assertEqual(list(Uzduotis.objects.values_list('pavadinimas', 'raktas')), [('test', '1')])
+        self.assertEqual(DatabaseBackend().drain(), (1, 0))
+        self.assertEqual(calls, [{'kiekis': 2}] * 3)
+        self.assertFalse(Uzduotis.objects.exists())
+
+    def test_replaced_local_backend_runs_its_jobs(self):
+        """
+        Pakeitus eilės realizaciją (override_settings) LocalBackend likusios užduotys įvykdomos iškart,
+        o ne išeinant iš proceso, kai DATABASES jau gali rodyti į kitą bazę.
+        """
+        calls = []
+        JOB_HANDLERS['test'] = lambda key, **payload: calls.append(key)
+        self.addCleanup(JOB_HANDLERS.pop, 'test')
+
+        with override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.LocalBackend', 'OPTIONS': {'DELAY': 60}}):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue('test', 1)
+            self.assertEqual(calls, [])
+
+        self.assertEqual(calls, [1])
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class RecommendationTests(TestCase):
+
+    def stored_lists(self):
+        lists = {}
+        rows = Rekomendacija.objects.order_by('receptas_id', 'eile').values_list(
+            'receptas_id', 'rekomenduojamas_id', 'panasumas')
+        for recipe_id, other_id, similarity in rows:
+            lists.setdefault(recipe_id, []).append((other_id, similarity))
+        return lists
+
+    def rebuilt_lists(self):
+        links = ReceptoRaktazodis.objects.order_by(*CANDIDATE_ORDER).values_list('receptas_id', 'raktazodis_id')
+        ratings = dict(Receptas.objects.values_list('id', 'vidutinis_reitingas'))
+        return {recipe_id: neighbours for recipe_id, neighbours in neighbour_lists(links, ratings) if neighbours}
+
+    def test_refresh_rewrites_only_affected_lists(self):
+        """
+        Pridėjus raktažodį perrašomas recepto sąrašas ir sąrašai, kuriuose jis jau buvo. Pilni sąrašai, į kurių
+        TOP_K jis nepatenka, ir jų atnaujinta nekeičiami, o rezultatas sutampa su perskaičiavimu iš naujo.
+        """
+        author, = create_profiles(1)
+        pasta, sauce, soup = Raktazodis.objects.bulk_create(
+            [Raktazodis(raktazodis=name) for name in ('pasta', 'padazas', 'sriuba')])
+
+        full = [create_recipe(author, f'Makaronai {number}') for number in range(12)]
+        soups = [create_recipe(author, f'Sriuba {number}') for number in range(4)]
+        ReceptoRaktazodis.objects.bulk_create(
+            [ReceptoRaktazodis(receptas=recipe, raktazodis=tag) for recipe in full for tag in (pasta, sauce)]
+            + [ReceptoRaktazodis(receptas=recipe, raktazodis=soup) for recipe in soups]
+        )
+        rebuild_recommendations()
+        full_ids = [recipe.pk for recipe in full]
+        untouched = dict(Receptas.objects.filter(pk__in=full_ids).values_list('id', 'atnaujinta'))
+
+        changed = soups[0]
+        ReceptoRaktazodis.objects.bulk_create([ReceptoRaktazodis(receptas=changed, raktazodis=pasta)])
+
+        self.assertCountEqual(refresh_recommendations(changed.pk), [recipe.pk for recipe in soups])
+        self.assertEqual(self.stored_lists(), self.rebuilt_lists())
+        self.assertEqual(
+            dict(Receptas.objects.filter(pk__in=full_ids).values_list('id', 'atnaujinta')), untouched,
+        )
+        self.assertEqual(refresh_recommendations(changed.pk), [])
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.DatabaseBackend'})
+class ImageVariantTests(TestCase):
+
+    def image_jobs(self):
+        return Uzduotis.objects.filter(pavadinimas='image_variants').count()
+
+    def test_variants_only_for_new_uploads(self):
+        """
+        Variantų užduotis dedama tik įkėlus naują nuotrauką: ne sukūrus profilį su numatytąja nuotrauka
+        ir ne įrašius objektą su ta pačia nuotrauka.
+        """
+        profile, = create_profiles(1)
+        self.assertEqual(self.image_jobs(), 0)
+
+        profile.nuotrauka = create_image()
+        profile.save()
+        profile.aprasas = 'Naujas aprašas'
+        profile.save()
+        self.assertEqual(self.image_jobs(), 1)
+
+        self.assertEqual(DatabaseBackend().drain(), (1, 0))
+        storage = profile.nuotrauka.storage
+        self.assertTrue(storage.exists(variant_name(profile.nuotrauka.name, 'avatar', 'webp')))
+        self.assertTrue(storage.path(profile.nuotrauka.name).startswith(MEDIA_ROOT))
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class QueryCountTests(TestCase):
+    """
+    Recepto puslapis ir receptų sąrašas turi užklausti pastovų užklausų kiekį, nepriklausomai nuo komentarų
+    ir raktažodžių kiekio (žr. ir `manage.py check_query_budget`).
+    """
+
+    # validatoriai, puslapis, kiekis ir šoninės juostos skaitikliai
+    LISTING_QUERIES = 5
+
+    def setUp(self):
+        cache.clear()
+        self.author, self.reader, *commenters = create_profiles(12)
+        keywords = Raktazodis.objects.bulk_create([Raktazodis(raktazodis=f'raktazodis{number}') for number in range(10)])
+
+        self.recipes = []
+        for size in (1, 10):
+            recipe = create_recipe(self.author, f'Receptas {size}')
+            ReceptoRaktazodis.objects.bulk_create([
+                ReceptoRaktazodis(receptas=recipe, raktazodis=keyword) for keyword in keywords[:size]
+            ])
+            Komentaras.objects.bulk_create([
+                Komentaras(receptas=recipe, profilis=commenter, turinys='Komentaras') for commenter in commenters[:size]
+            ])
+            self.recipes.append(recipe)
+
+        rebuild_recommendations()
+        # prestižo lygiai ir šablonai (reference.py) užkraunami vieną kartą procesui, o ne kiekvienai užklausai
+        reference.get_reference()
+
+    def test_recipe_detail(self):
+        for recipe in self.recipes:
+            with self.assertNumQueries(ANONYMOUS_BUDGET):
+                self.assertEqual(self.client.get(f'/recipe/{recipe.id}/').status_code, 200)
+
+        self.client.force_login(self.reader.profilis)
+        for recipe in self.recipes:
+            with self.assertNumQueries(AUTHENTICATED_BUDGET):
+                self.assertEqual(self.client.get(f'/recipe/{recipe.id}/').status_code, 200)
+
+    def test_listing(self):
+        with self.assertNumQueries(self.LISTING_QUERIES):
+            self.assertEqual(self.client.get('/').status_code, 200)
+
+        # puslapis, skaitikliai ir validatoriai imami iš podėlio (caching.py)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/').status_code, 200)
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class FacetTests(TestCase):
+
+    def test_diet_links_keep_filters_and_match_counts(self):
+        """
+        Dietos mygtukų nuorodos išlaiko kitus filtrus, o paspaudus mygtuką receptų gaunama tiek, kiek rodo jo skaičius.
+        """
+        author, = create_profiles(1)
+        for vegetarian, vegan in ((True, True), (True, False), (False, False), (False, False)):
+            recipe = create_recipe(author)
+            Receptas.objects.filter(pk=recipe.pk).update(ar_vegetariskas=vegetarian, ar_veganiskas=vegan)
+
+        response = self.client.get('/?ar_veganiskas=False&min_rating=0')
+        html = response.content.decode()
+
+        for link, count in (
+            ('ar_vegetariskas=True', response.context['facets']['vegetariski']),
+            ('ar_vegetariskas=False', response.context['facets']['nevegetariski']),
+        ):
+            href = unescape(re.search(f'href="([^"]*{link}[^"]*)"', html).group(1))
+            self.assertIn('ar_veganiskas=False', href)
+            self.assertEqual(len(self.client.get(f'/{href}').context['receptai']), count)
+
+        self.assertEqual(
+            (response.context['facets']['vegetariski'], response.context['facets']['nevegetariski']), (1, 2),
+        )
+
+    def test_facets_take_two_queries_for_any_number_of_keywords(self):
+        """
+        Šoninės juostos skaitikliai: viena GROUP BY užklausa raktažodžiams ir viena sąlyginė agregacija dietoms,
+        nepriklausomai nuo raktažodžių kiekio. Pakartotinai jie imami iš podėlio.
+        """
+        author, = create_profiles(1)
+        for size in (2, 12):
+            keywords = Raktazodis.objects.bulk_create(
+                [Raktazodis(raktazodis=f'raktazodis{size}-{number}') for number in range(size)]
+            )
+            recipe = create_recipe(author)
+            ReceptoRaktazodis.objects.bulk_create(
+                [ReceptoRaktazodis(receptas=recipe, raktazodis=keyword) for keyword in keywords]
+            )
+            cache.clear()
+            reference.get_reference()
+
+            for params in ({}, {'query': 'Receptas', 'ar_veganiskas': 'False'}):
+                filters = parse_filters(params)
+                with self.assertNumQueries(2):
+                    facets = get_facets(filters)
+                self.assertEqual(len(facets['raktazodziai']), min(Raktazodis.objects.count(), KEYWORD_LIMIT))
+                with self.assertNumQueries(0):
+                    get_facets(filters)
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class PaginationTests(TestCase):
+    """
+    Puslapiavimas pagal žymeklį (pagination.py): nuorodos Kitas/Ankstesnis pereina visą sąrašą be pasikartojimų
+    ir praleidimų net kai rūšiavimo reikšmės sutampa, o suklastotas ar kitam rūšiavimui sukurtas žymeklis
+    ignoruojamas.
+    """
+
+    def setUp(self):
+        cache.clear()
+        author, = create_profiles(1)
+        recipes = [create_recipe(author, f'Receptas {number}') for number in range(PER_PAGE * 2 + 3)]
+        # trys vienodų reitingų grupės ir viena bendra sukūrimo data, kad lygiąsias skirtų tik id
+        created = recipes[0].data
+        for number, recipe in enumerate(recipes):
+            Receptas.objects.filter(pk=recipe.pk).update(vidutinis_reitingas=number % 3, data=created)
+
+    def page_link(self, response, title):
+        match = re.search(f'class="page-link" href="([^"]+)">{title}<', response.content.decode())
+        return unescape(match.group(1)) if match else None
+
+    def ids(self, response):
+        return [recipe.id for recipe in response.context['receptai']]
+
+    def test_next_and_previous_walk_ties_without_gaps(self):
+        for params, order_by in (('', ('-vidutinis_reitingas', '-id')), ('?rusiavimas=naujausi', ('-data', '-id'))):
+            with self.subTest(params=params):
+                expected = list(Receptas.objects.order_by(*order_by).values_list('id', flat=True))
+
+                pages = []
+                response = self.client.get(f'/{params}')
+                while True:
+                    pages.append(self.ids(response))
+                    link = self.page_link(response, 'Kitas')
+                    if link is None:
+                        break
+                    self.assertIn('cursor=', link)
+                    response = self.client.get(f'/{link}')
+
+                self.assertEqual([recipe_id for page in pages for recipe_id in page], expected)
+                self.assertEqual([len(page) for page in pages], [PER_PAGE, PER_PAGE, 3])
+
+                for page in reversed(pages[:-1]):
+                    response = self.client.get(f'/{self.page_link(response, "Ankstesnis")}')
+                    self.assertEqual(self.ids(response), page)
+                self.assertIsNone(self.page_link(response, 'Ankstesnis'))
+
+    def test_tampered_cursor_shows_first_page(self):
+        first_page = self.client.get('/')
+        cursor = first_page.context['receptai'].next_cursor
+        second_page = self.ids(self.client.get('/', {'cursor': cursor}))
+        self.assertNotEqual(second_page, self.ids(first_page))
+
+        payload, signature = cursor.rsplit(':', 1)
+        forged_payload = encode_cursor('next', ['-vidutinis_reitingas', '-id'], [0, 1]).rsplit(':', 1)[0]
+        for tampered in (f'{payload}:{signature[::-1]}', f'{forged_payload}:{signature}', 'neteisingas'):
+            with self.subTest(cursor=tampered):
+                response = self.client.get('/', {'cursor': tampered})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.ids(response), self.ids(first_page))
+                self.assertFalse(response.context['receptai'].has_previous())
+
+    def test_filter_change_resets_cursor(self):
+        cursor = self.client.get('/').context['receptai'].next_cursor
+        response = self.client.get('/', {'cursor': cursor})
+        html = response.content.decode()
+
+        links = [unescape(href) for href in re.findall(r'href="(\?[^"]*)"', html)]
+        filter_links = [link for link in links if 'min_rating=' in link or 'rusiavimas=' in link or 'ar_' in link]
+        self.assertTrue(filter_links)
+        for link in filter_links:
+            self.assertNotIn('cursor=', link)
+
+        # kito rūšiavimo žymeklis netinka - rodomas pirmas puslapis
+        response = self.client.get('/', {'cursor': cursor, 'rusiavimas': 'naujausi'})
+        self.assertEqual(self.ids(response), self.ids(self.client.get('/', {'rusiavimas': 'naujausi'})))
+        self.assertFalse(response.context['receptai'].has_previous())
+
+    def test_profile_fragment_cache_is_keyed_by_decoded_cursor(self):
+        author = Receptas.objects.first().profilis
+        url = f'/profile/{author.profilis.username}/'
+
+        def fragments():
+            return {key for key in cache._cache if 'profile_uploaded' in key}
+
+        cursor = self.client.get(url).context['uploaded_recipes'].next_cursor
+        self.client.get(url, {'cursor': cursor})
+        self.assertEqual(len(fragments()), 2)
+
+        # suklastoti žymekliai rodo pirmą puslapį, o iš naujo pasirašytas - tą patį antrą
+        direction, values = decode_cursor(cursor, ['-id'])
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 60):
+            resigned = encode_cursor(direction, ['-id'], values)
+        self.assertNotEqual(resigned, cursor)
+        for other in ('neteisingas', f'{cursor[:-1]}x', resigned):
+            with self.subTest(cursor=other):
+                response = self.client.get(url, {'cursor': other})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(fragments()), 2)
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class SearchTests(TestCase):
+    """
+    Paieška (search.py) prijungia FTS lentelę vieną kartą: MATCH vykdomas vieną kartą užklausai, rezultatai
+    rūšiuojami pagal rangą ir puslapiuojami pagal žymeklį.
+    """
+
+    def setUp(self):
+        cache.clear()
+        author, = create_profiles(1)
+        self.best = create_recipe(author, 'Šaltibarščiai šaltibarščiai')
+        self.others = [create_recipe(author, f'Šaltibarščiai {number}') for number in range(PER_PAGE + 2)]
+        keyword = Raktazodis.objects.create(raktazodis='šaltibarščiai')
+        self.tagged = create_recipe(author, 'Burokėlių sriuba')
+        ReceptoRaktazodis.objects.create(receptas=self.tagged, raktazodis=keyword)
+        create_recipe(author, 'Cepelinai')
+
+    def test_match_runs_once_and_orders_by_rank(self):
+        recipes = search_recipes(Receptas.objects.all(), 'saltibarsciai')
+        with CaptureQueriesContext(connections['default']) as queries:
+            found = list(recipes.order_by('paieskos_rangas', '-id'))
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(queries[0]['sql'].count('MATCH'), 1)
+        self.assertEqual(found[0], self.best)
+        self.assertEqual(
+            {recipe.id for recipe in found}, {self.best.id, self.tagged.id, *(recipe.id for recipe in self.others)},
+        )
+        ranks = [recipe.paieskos_rangas for recipe in found]
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_search_pages_have_no_gaps(self):
+        expected = list(
+            search_recipes(Receptas.objects.all(), 'saltibarsciai')
+            .order_by('paieskos_rangas', '-vidutinis_reitingas', '-id').values_list('id', flat=True)
+        )
+
+        found = []
+        cursor = None
+        while True:
+            page = self.client.get('/', {'query': 'saltibarsciai', **({'cursor': cursor} if cursor else {})})
+            found += [recipe.id for recipe in page.context['receptai']]
+            cursor = page.context['receptai'].next_cursor
+            if cursor is None:
+                break
+
+        self.assertEqual(found, expected)
+        self.assertEqual(page.context['receptai'].count, len(expected))
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class ConditionalGetTests(TestCase):
+    """
+    Nepasikeitę puslapiai atsakomi 304 Not Modified (conditional.py), o ETag pasikeičia pasikeitus tam,
+    ką puslapis rodo, ir skiriasi kiekvienam žiūrinčiajam.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author, self.voter, self.other = create_profiles(3)
+        self.recipe = create_recipe(self.author)
+        self.keyword = Raktazodis.objects.create(raktazodis='sriuba')
+        ReceptoRaktazodis.objects.create(receptas=self.recipe, raktazodis=self.keyword)
+
+    def etag(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_pages_return_304(self):
+        for path in (f'/recipe/{self.recipe.id}/', '/', f'/profile/{self.author.profilis.username}/'):
+            with self.subTest(path=path):
+                etag = self.etag(path)
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_votes_comments_and_keywords(self):
+        path = f'/recipe/{self.recipe.id}/'
+        etags = [self.etag(path)]
+        listing_etag = self.etag('/')
+
+        self.client.force_login(self.voter.profilis)
+        self.assertEqual(
+            self.client.post(path, {'rating': '1', 'reitingas': 5, 'favoritas': 'on'}).status_code, 302,
+        )
+        self.client.logout()
+        etags.append(self.etag(path))
+        self.assertNotEqual(self.etag('/'), listing_etag)
+
+        Komentaras.objects.create(receptas=self.recipe, profilis=self.other, turinys='Skanu')
+        etags.append(self.etag(path))
+
+        ReceptoRaktazodis.objects.create(
+            receptas=self.recipe, raktazodis=Raktazodis.objects.create(raktazodis='greita'),
+        )
+        etags.append(self.etag(path))
+
+        self.keyword.raktazodis = 'sriubos'
+        self.keyword.save()
+        etags.append(self.etag(path))
+
+        self.assertEqual(len(set(etags)), len(etags))
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+
+    def test_etag_changes_with_commenter_prestige(self):
+        for points in (0, 10):
+            Prestizas.objects.create(tasku_reikalavimas=points)
+        Komentaras.objects.create(receptas=self.recipe, profilis=self.other, turinys='Skanu')
+        apply_prestige_change(self.other.id, 1)
+        path = f'/recipe/{self.recipe.id}/'
+        etags = [self.etag(path)]
+
+        # taškai be naujo lygio puslapio nekeičia
+        apply_prestige_change(self.other.id, 4)
+        self.assertEqual(self.etag(path), etags[-1])
+
+        apply_prestige_change(self.other.id, 5)
+        etags.append(self.etag(path))
+
+        # perskaičiavus iš balsų (jų nėra) lygis grįžta į žemiausią
+        refresh_prestige([self.other.id])
+        etags.append(self.etag(path))
+
+        commenter = Profilis.objects.get(pk=self.other.pk)
+        commenter.prestizas = Prestizas.objects.get(tasku_reikalavimas=10)
+        commenter.save()
+        etags.append(self.etag(path))
+
+        Prestizas.objects.filter(pk=commenter.prestizas_id).get().save()
+        etags.append(self.etag(path))
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_etag_varies_by_viewer(self):
+        for path in (f'/recipe/{self.recipe.id}/', '/', f'/profile/{self.author.profilis.username}/'):
+            with self.subTest(path=path):
+                self.client.logout()
+                anonymous = self.etag(path)
+
+                self.client.force_login(self.voter.profilis)
+                voter = self.etag(path)
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=voter).status_code, 304)
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=anonymous).status_code, 200)
+
+                self.client.force_login(self.other.profilis)
+                other = self.etag(path)
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=voter).status_code, 200)
+
+                self.assertEqual(len({anonymous, voter, other}), 3)
+
+
+@override_settings(
+    DEBUG=False, ALLOWED_HOSTS=['testserver'], PROFILING={'SAMPLE_RATE': 1.0},
+    VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'},
+)
+class ServerTimingTests(TestCase):
+    """
+    Server-Timing antraštė (Diplominis/profiling.py) rodo SQL užklausų kiekį ir trukmes, todėl produkcijoje ji
+    pridedama tik personalui.
+    """
+
+    def setUp(self):
+        self.user, self.staff = (profile.profilis for profile in create_profiles(2))
+        self.staff.is_staff = True
+        self.staff.save(update_fields=['is_staff'])
+
+    def test_header_only_for_staff(self):
+        self.assertFalse(self.client.get('/leaderboard/').has_header('Server-Timing'))
+
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get('/leaderboard/').has_header('Server-Timing'))
+
+        self.client.force_login(self.staff)
+        self.assertTrue(self.client.get('/leaderboard/').has_header('Server-Timing'))
+
+    async def test_header_only_for_staff_async(self):
+        client = AsyncClient()
+        self.assertFalse((await client.get('/leaderboard/')).has_header('Server-Timing'))
+
+        await client.aforce_login(self.staff)
+        self.assertTrue((await client.get('/leaderboard/')).has_header('Server-Timing'))
+
+    @override_settings(PROFILING={'SAMPLE_RATE': 0.0, 'SLOW_THRESHOLD_MS': 0})
+    def test_unsampled_slow_request_is_logged_without_sql(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('Diplominis.profiling', 'WARNING') as logs:
+            response = self.client.get('/leaderboard/')
+
+        self.assertFalse(response.has_header('Server-Timing'))
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((entry['path'], entry['sampled']), ('/leaderboard/', False))
+        self.assertNotIn('queries', entry)
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class RatingCounterTests(TestCase):
+
+    def test_rating_changes_update_counters(self):
+        """
+        Pateikus, pakeitus ir pakartojus reitingą recepto skaitikliai ir autoriaus prestižas
+        pasikeičia tik tiek, kiek pasikeitė balsas.
+        """
+        author, first, second = create_profiles(3)
+        recipe = create_recipe(author)
+
+        for voter, reitingas, favoritas in (
+            (first, 5, True), (second, 3, False), (first, 4, True), (first, 4, True), (second, 5, False),
+        ):
+            self.client.force_login(voter.profilis)
+            data = {'rating': '1', 'reitingas': reitingas}
+            if favoritas:
+                data['favoritas'] = 'on'
+            self.assertEqual(self.client.post(f'/recipe/{recipe.id}/', data).status_code, 302)
+
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.reitingu_kiekis, recipe.reitingu_suma, recipe.favoritu_kiekis, recipe.vidutinis_reitingas),
+            (2, 9, 1, 4.5),
+        )
+        self.assertEqual(Reitingas.objects.filter(receptas=recipe).count(), 2)
+        self.assertEqual(
+            Profilis.objects.get(pk=author.pk).prestizo_taskai, FAVORITE_POINTS + FIVE_STAR_POINTS,
+        )
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class RankingTests(TestCase):
+
+    def test_new_recipe_starts_at_prior_mean(self):
+        """
+        Naujo recepto be balsų Bajeso reitingas yra visų reitingų vidurkis, todėl jis rikiuojamas virš prastai
+        įvertintų receptų, o ne sąrašo pabaigoje.
+        """
+        cache.clear()
+        author, *voters = create_profiles(3)
+        low, high = create_recipe(author, 'Prastas'), create_recipe(author, 'Geras')
+        for recipe, reitingas in ((low, 1), (high, 5)):
+            for voter in voters:
+                Reitingas.objects.create(receptas=recipe, profilis=voter, reitingas=reitingas)
+                enqueue_rating_change(recipe, None, (reitingas, False))
+        update_rankings()
+
+        recipe = Receptas.objects.get(pk=create_recipe(author, 'Naujas').pk)
+
+        self.assertAlmostEqual(recipe.bayeso_reitingas, prior_mean())
+        self.assertEqual(
+            list(Receptas.objects.order_by('-bayeso_reitingas').values_list('titulas', flat=True)),
+            ['Geras', 'Naujas', 'Prastas'],
+        )
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class LeaderboardTests(TestCase):
+    """
+    Lyderių lentelės medis (leaderboard.py) atnaujinamas po kiekvieno pakeitimo, todėl vietos ir geriausi lygio
+    autoriai turi sutapti su ORDER BY/COUNT skaičiavimu per visus profilius.
+    """
+
+    LIMIT = 3
+
+    def assertMatchesOracle(self):
+        profiles = list(Profilis.objects.all())
+        total = len(profiles)
+        for profile in profiles:
+            oracle = 1 + Profilis.objects.filter(prestizo_taskai__gt=profile.prestizo_taskai).count()
+            self.assertEqual(profile_rank(profile), (oracle, total))
+
+        levels = list(Prestizas.objects.order_by('tasku_reikalavimas'))
+        tiers = tier_leaders(self.LIMIT)
+        self.assertEqual([level.id for level, _ in tiers], [level.id for level in reversed(levels)])
+
+        for (level, leaders), number in zip(tiers, reversed(range(len(levels)))):
+            expected = Profilis.objects.all()
+            if number > 0:
+                expected = expected.filter(prestizo_taskai__gte=level.tasku_reikalavimas)
+            if number + 1 < len(levels):
+                expected = expected.filter(prestizo_taskai__lt=levels[number + 1].tasku_reikalavimas)
+            expected = expected.order_by('-prestizo_taskai', '-id')[:self.LIMIT]
+
+            self.assertEqual(
+                [(profile.id, profile.vieta) for profile in leaders],
+                [
+                    (profile.id, 1 + Profilis.objects.filter(prestizo_taskai__gt=profile.prestizo_taskai).count())
+                    for profile in expected
+                ],
+            )
+
+    def test_incremental_changes_match_oracle(self):
+        for points in (0, 10, 30):
+            Prestizas.objects.create(tasku_reikalavimas=points)
+
+        randomness = random.Random(22)
+        profiles = create_profiles(12)
+        self.assertMatchesOracle()
+
+        for round_number in range(5):
+            with self.subTest(round=round_number):
+                # taškai nemažėja žemiau nulio - atimami tik anksčiau už balsus gauti taškai
+                for profile in randomness.sample(profiles, 4):
+                    points = Profilis.objects.get(pk=profile.pk).prestizo_taskai
+                    deltas = [delta for delta in (-6, -3, 2, 6, 12) if points + delta >= 0]
+                    apply_prestige_change(profile.id, randomness.choice(deltas))
+
+                # pakeitimas per admin (Profilis.save) ir vienodi taškai keliems profiliams
+                edited = Profilis.objects.get(pk=randomness.choice(profiles).pk)
+                edited.prestizo_taskai = 10
+                edited.save()
+
+                removed = profiles.pop(randomness.randrange(len(profiles)))
+                removed.profilis.delete()
+                profiles += create_profiles(1, prefix=f'naujas{round_number}-')
+
+                self.assertMatchesOracle()
+
+        self.assertEqual(rebuild_leaderboard(), (Profilis.objects.count(), 0))
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class ReconcileTests(TestCase):
+
+    def test_reconcile_fixes_drift_once(self):
+        """
+        reconcile_*() randa išsiderinusius skaitiklius, juos perskaičiuoja, o antras paleidimas neranda nieko.
+        """
+        author, voter = create_profiles(2)
+        recipe = create_recipe(author)
+        old_rating = Reitingas.upsert(recipe.id, voter.id, 5, True)
+        enqueue_rating_change(recipe, old_rating, (5, True))
+
+        Receptas.objects.filter(pk=recipe.pk).update(reitingu_kiekis=3, vidutinis_reitingas=1.0)
+        Profilis.objects.filter(pk=author.pk).update(prestizo_taskai=0)
+
+        for reconcile in (reconcile_recipes, reconcile_prestige):
+            self.assertEqual(reconcile(dry_run=True).rows, 1)
+            self.assertEqual(reconcile(settle_seconds=0).rows, 1)
+            self.assertEqual(reconcile(settle_seconds=0).rows, 0)
+
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.reitingu_kiekis, recipe.vidutinis_reitingas), (1, 5.0))
+        self.assertEqual(
+            Profilis.objects.get(pk=author.pk).prestizo_taskai, FAVORITE_POINTS + FIVE_STAR_POINTS,
+        )
+
+    def test_recompute_query_count_does_not_grow_with_rows(self):
+        """
+        recompute_*() skaičiuoja dalį viena GROUP BY užklausa ir įrašo ją bulk_update, todėl užklausų kiekis
+        nepriklauso nuo receptų ir profilių kiekio.
+        """
+        voter, = create_profiles(1)
+        query_counts = []
+
+        for count in (2, 20):
+            authors = create_profiles(count, prefix=f'autorius{count}-')
+            for author in authors:
+                Reitingas.upsert(create_recipe(author).id, voter.id, 5, True)
+
+            with CaptureQueriesContext(connections['default']) as queries:
+                recompute_recipe_aggregates()
+                recompute_prestige()
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(reconcile_recipes(settle_seconds=0).rows + reconcile_prestige(settle_seconds=0).rows, 0)
+
+    def test_recently_rated_rows_are_rechecked(self):
+        """
+        Ką tik įvertinto recepto užduotis dar galėtų laukti LocalBackend eilėje, todėl jo skirtumas patikrinamas dar
+        kartą praėjus settle_seconds. Nepasikeitęs skirtumas pataisomas, o pasikeitęs (užduotis per tą laiką
+        pritaikyta) - ne.
+        """
+        author, voter, other = create_profiles(3)
+        recipe = create_recipe(author)
+        for profile in (voter, other):
+            Reitingas.upsert(recipe.id, profile.id, 4, False)
+        Receptas.objects.filter(pk=recipe.pk).update(reitingu_kiekis=1, reitingu_suma=4, vidutinis_reitingas=4.0)
+
+        # antras patikrinimas nelaukia tikrų settle_seconds
+        with mock.patch('Vyrtuve.aggregates.time.sleep') as sleep:
+            drift = reconcile_recipes(settle_seconds=60)
+        sleep.assert_called_once()
+        self.assertEqual((drift.rows, drift.skipped), (1, 0))
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.reitingu_kiekis, recipe.reitingu_suma), (2, 8))
+
+        # laukiantis pokytis pritaikomas, kol reconcile laukia antro patikrinimo
+        Receptas.objects.filter(pk=recipe.pk).update(reitingu_kiekis=1, reitingu_suma=4, vidutinis_reitingas=4.0)
+
+        def apply_pending_job(seconds):
+            Receptas.apply_rating_delta(recipe.id, suma=4, kiekis=1)
+
+        with mock.patch('Vyrtuve.aggregates.time.sleep', apply_pending_job):
+            drift = reconcile_recipes(settle_seconds=60)
+        self.assertEqual((drift.rows, drift.skipped), (1, 1))
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.reitingu_kiekis, recipe.reitingu_suma, recipe.vidutinis_reitingas), (2, 8, 4.0))
+
+    @override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.DatabaseBackend'})
+    def test_reconcile_skips_pending_jobs(self):
+        """
+        reconcile_*() praleidžia įrašus, kurių balso užduotys dar laukia eilėje, todėl vėliau įvykdytos užduotys
+        pokyčio nepritaiko antrą kartą.
+        """
+        author, voter = create_profiles(2)
+        recipe = create_recipe(author)
+        Reitingas.upsert(
+            recipe.id, voter.id, 5, True,
+            on_write=lambda old_rating: enqueue_rating_change(recipe, old_rating, (5, True)),
+        )
+
+        for reconcile in (reconcile_recipes, reconcile_prestige):
+            drift = reconcile(settle_seconds=0)
+            self.assertEqual((drift.rows, drift.skipped), (1, 1))
+
+        DatabaseBackend().drain()
+
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.reitingu_kiekis, recipe.reitingu_suma, recipe.favoritu_kiekis, recipe.vidutinis_reitingas),
+            (1, 5, 1, 5.0),
+        )
+        self.assertEqual(
+            Profilis.objects.get(pk=author.pk).prestizo_taskai, FAVORITE_POINTS + FIVE_STAR_POINTS,
+        )
+        self.assertEqual(reconcile_recipes(settle_seconds=0).rows + reconcile_prestige(settle_seconds=0).rows, 0)
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class ConcurrentRatingTests(TransactionTestCase):
+    """
+    Daug gijų vienu metu balsuoja už kelis receptus (Reitingas.upsert) ir iškart pritaiko skaitiklių pokyčius.
+    Nė vienas balsas neturi nepavykti ar pasimesti: receptų skaitikliai ir autoriaus prestižas turi sutapti
+    su perskaičiuotais iš reitingų. Reikalauja bazės failo (settings.py DATABASES TEST NAME), nes atminties
+    bazė su bendru podėliu nenaudoja busy_timeout.
+
+    Užklausos metu balsas kartojamas tik retry.REQUEST_TIMEOUT sekundžių, todėl kelis kartus perkrautame procesoriuje
+    jis gali nepavykti - tada vartotojas balsą pateikia dar kartą. Gijos daro tą patį (vote), kol praeina
+    retry.TIMEOUT.
+    """
+
+    THREADS = 8
+    VOTES = 25
+
+    def test_concurrent_votes_keep_counters(self):
+        author, *voters = create_profiles(11)
+        recipes = [create_recipe(author, f'Receptas {number}') for number in range(3)]
+        barrier = threading.Barrier(self.THREADS)
+        failures = []
+
+        # pakartotinai pateikiamas tik pats balsas: jį atšaukia visą, o skaitiklių užduotį kartoja run_job
+        vote = retry_on_locked()(Reitingas.upsert)
+
+        def worker(number):
+            rng = random.Random(number)
+            barrier.wait()
+
+            try:
+                for _ in range(self.VOTES):
+                    recipe, voter = rng.choice(recipes), rng.choice(voters)
+                    new_rating = (rng.randint(1, 5), rng.random() < 0.5)
+
+                    try:
+                        old_rating = vote(recipe.id, voter.id, *new_rating)
+                        enqueue_rating_change(recipe, old_rating, new_rating)
+                    except Exception as error:
+                        failures.append(repr(error))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+
+        for recipe in Receptas.objects.filter(id__in=[recipe.id for recipe in recipes]):
+            expected = recipe.reitingai.aggregate(
+                kiekis=Count('id'), suma=Sum('reitingas'), favoritai=Count('id', filter=Q(favoritas=True)),
+            )
+            self.assertEqual(
+                (recipe.reitingu_kiekis, recipe.reitingu_suma, recipe.favoritu_kiekis),
+                (expected['kiekis'], expected['suma'] or 0, expected['favoritai']),
+            )
+
+        totals = Reitingas.objects.filter(receptas__profilis=author).aggregate(
+            favoritai=Count('id', filter=Q(favoritas=True)), penketai=Count('id', filter=Q(reitingas=5)),
+        )
+        self.assertEqual(
+            Profilis.objects.get(pk=author.pk).prestizo_taskai,
+            totals['favoritai'] * FAVORITE_POINTS + totals['penketai'] * FIVE_STAR_POINTS,
+        )
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class RatingUpsertRetryTests(TransactionTestCase):
+
+    def test_failing_receiver_does_not_repeat_the_write(self):
+        """
+        Jei post_save gavėjas nepavyksta dėl užrakintos bazės, įrašymas nekartojamas (Reitingas._write), kitaip
+        pakartotas upsert() gražintų jau naują reitingą kaip ankstesnį ir balso pokytis būtų prarastas.
+        """
+        author, voter = create_profiles(2)
+        recipe = create_recipe(author)
+        created = []
+
+        def locked(sender, **kwargs):
+            created.append(kwargs['created'])
+            raise OperationalError('database is locked')
+
+        post_save.connect(locked, sender=Reitingas)
+        try:
+            with self.assertRaises(OperationalError):
+                Reitingas.upsert(recipe.id, voter.id, 5, True)
+        finally:
+            post_save.disconnect(locked, sender=Reitingas)
+
+        self.assertEqual(created, [True])
+        self.assertEqual(Reitingas.upsert(recipe.id, voter.id, 4, False), (5, True))
+
+
+@override_settings(VYRTUVE_JOBS={'BACKEND': 'Vyrtuve.jobs.ImmediateBackend'})
+class ConcurrentPrestigeTests(TransactionTestCase):
+
+    def test_concurrent_changes_keep_points_and_leaderboard(self):
+        """
+        Keli užduočių vykdytojai vienu metu keičia to paties profilio taškus. Taškai turi būti visų pokyčių suma,
+        o lyderių lentelės medis - sutapti su iš naujo sukurtu (rebuild_leaderboard gražina 0 neteisingų mazgų).
+        """
+        profile, _ = create_profiles(2)
+        barrier = threading.Barrier(8)
+        failures = []
+
+        def worker(number):
+            barrier.wait()
+            try:
+                for step in range(25):
+                    apply_prestige_change(profile.id, 6 if (number + step) % 3 else -4)
+            except Exception as error:
+                failures.append(repr(error))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected = sum(6 if (number + step) % 3 else -4 for number in range(8) for step in range(25))
+        self.assertEqual(failures, [])
+        self.assertEqual(Profilis.objects.get(pk=profile.pk).prestizo_taskai, expected)
+        self.assertEqual(rebuild_leaderboard(), (2, 0))
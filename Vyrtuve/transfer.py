@@ -0,0 +1,251 @@
+"""
+transfer modulis eksportuoja ir importuoja receptus su raktažodžiais, reitingais, komentarais ir nuotraukų
+keliais JSONL arba CSV formatu (žr. `manage.py export_recipes` ir `manage.py import_recipes`).
+
+Vienas įrašas yra vienas receptas. Autoriai ir balsuotojai nurodomi vartotojo vardu, šablonas - pavadinimu,
+raktažodžiai - tekstu, o nuotrauka - keliu MEDIA_ROOT kataloge (patys failai nekopijuojami). CSV faile
+sąrašai (raktažodžiai, reitingai, komentarai) įrašomi kaip JSON tekstas vienoje ląstelėje.
+
+Eksportas skaito receptus paketais su iterator(), todėl naudoja pastovų atminties kiekį. Importas kiekvieną
+paketą įrašo su bulk_create vienoje transakcijoje ir po jo vieną kartą perskaičiuoja skaitiklius (aggregates.py)
+bei paieškos indeksą, nes bulk_create nesiunčia signalų.
+"""
+import csv
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+
+from .aggregates import recompute_prestige, recompute_recipe_aggregates
+from .models import (
+    Komentaras, Prestizas, Profilis, Raktazodis, Receptas, ReceptoRaktazodis, Reitingas, Sablonas, User,
+)
+from .rankings import recompute_bayes
+from .search import index_recipes
+
+RECIPE_FIELDS = [
+    'titulas', 'aprasas', 'ingridientai', 'instrukcijos', 'gaminimo_laikas', 'ar_vegetariskas', 'ar_veganiskas',
+]
+LIST_FIELDS = ['raktazodziai', 'reitingai', 'komentarai']
+CSV_FIELDS = ['id', *RECIPE_FIELDS, 'nuotrauka', 'data', 'autorius', 'sablonas', *LIST_FIELDS]
+
+
+def _username(profile):
+    return profile.profilis.username if profile is not None else None
+
+
+def recipe_record(recipe):
+    """
+    recipe_record() paverčia receptą (su prefetch_related ryšiais) į eksportuojamą žodyną.
+    """
+    return {
+        'id': recipe.id,
+        **{field: getattr(recipe, field) for field in RECIPE_FIELDS},
+        'nuotrauka': recipe.nuotrauka.name or None,
+        'data': recipe.data.isoformat(),
+        'autorius': _username(recipe.profilis),
+        'sablonas': recipe.sablonas.pavadinimas if recipe.sablonas else None,
+        'raktazodziai': [link.raktazodis.raktazodis for link in recipe.raktazodziai_recepto.all()],
+        'reitingai': [
+            {'vartotojas': _username(rating.profilis), 'reitingas': rating.reitingas, 'favoritas': rating.favoritas}
+            for rating in recipe.reitingai.all()
+        ],
+        'komentarai': [
+            {'vartotojas': _username(comment.profilis), 'turinys': comment.turinys, 'data': comment.data.isoformat()}
+            for comment in recipe.komentarai.all()
+        ],
+    }
+
+
+def export_records(recipes=None, chunk_size=1000):
+    """
+    export_records() generuoja receptų įrašus. Ryšiai užkraunami kiekvienam chunk_size receptų paketui atskirai.
+    """
+    if recipes is None:
+        recipes = Receptas.objects.all()
+
+    recipes = recipes.select_related('profilis__profilis', 'sablonas').prefetch_related(
+        Prefetch('raktazodziai_recepto', ReceptoRaktazodis.objects.select_related('raktazodis').order_by('id')),
+        Prefetch('reitingai', Reitingas.objects.select_related('profilis__profilis').order_by('id')),
+        Prefetch('komentarai', Komentaras.objects.select_related('profilis__profilis').order_by('id')),
+    ).order_by('id')
+
+    for recipe in recipes.iterator(chunk_size=chunk_size):
+        yield recipe_record(recipe)
+
+
+def write_jsonl(records, output):
+    count = 0
+    for record in records:
+        output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(records, output):
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+
+    count = 0
+    for record in records:
+        writer.writerow({
+            **record,
+            **{field: json.dumps(record[field], ensure_ascii=False) for field in LIST_FIELDS},
+        })
+        count += 1
+    return count
+
+
+def read_jsonl(source):
+    for line in source:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(source):
+    """
+    read_csv() skaito write_csv() įrašytą failą ir atkuria tipus (CSV visas reikšmes laiko tekstu).
+    """
+    # populiaraus recepto reitingų sąrašas gali viršyti numatytąjį 128 KB ląstelės dydį
+    csv.field_size_limit(2 ** 31 - 1)
+
+    for row in csv.DictReader(source):
+        record = {field: value or None for field, value in row.items()}
+
+        for field in LIST_FIELDS:
+            record[field] = json.loads(row.get(field) or '[]')
+
+        for field in ('ar_vegetariskas', 'ar_veganiskas'):
+            record[field] = row.get(field) in ('True', 'true', '1')
+
+        yield record
+
+
+def batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class Importer:
+    """
+    Importer importuoja įrašus paketais. Žinomi vartotojai, raktažodžiai ir šablonai laikomi atmintyje,
+    kad kiekvienam paketui nereikėtų jų ieškoti iš naujo.
+    """
+
+    def __init__(self):
+        self.profiles = {}
+        self.keywords = dict(Raktazodis.objects.values_list('raktazodis', 'id'))
+        self.templates = dict(Sablonas.objects.values_list('pavadinimas', 'id'))
+        self.prestizas = Prestizas.objects.order_by('tasku_reikalavimas').first()
+        self.password = make_password(None)
+
+    def resolve_profiles(self, usernames):
+        """
+        resolve_profiles() suranda profilius pagal vartotojo vardą. Trūkstami vartotojai sukuriami
+        su nenaudojamu slaptažodžiu (jie gali atsistatyti slaptažodį per el. paštą).
+        """
+        missing = {name for name in usernames if name and name not in self.profiles}
+        if not missing:
+            return
+
+        self.profiles.update(
+            Profilis.objects.filter(profilis__username__in=missing).values_list('profilis__username', 'id')
+        )
+        missing -= self.profiles.keys()
+
+        if missing:
+            users = User.objects.bulk_create([User(username=name, password=self.password) for name in missing])
+            profiles = Profilis.objects.bulk_create([
+                Profilis(profilis=user, vardas=user.username, aprasas='', prestizas=self.prestizas) for user in users
+            ])
+            self.profiles.update((profile.vardas, profile.id) for profile in profiles)
+
+    def resolve_keywords(self, names):
+        missing = {name for name in names if name not in self.keywords}
+        if missing:
+            created = Raktazodis.objects.bulk_create([Raktazodis(raktazodis=name) for name in missing])
+            self.keywords.update((keyword.raktazodis, keyword.id) for keyword in created)
+
+    def import_batch(self, records):
+        """
+        import_batch() įrašo vieną įrašų paketą vienoje transakcijoje. Gražina sukurtų receptų id sąrašą.
+        """
+        with transaction.atomic():
+            usernames = set()
+            keywords = set()
+            for record in records:
+                usernames.add(record.get('autorius'))
+                usernames.update(item.get('vartotojas') for item in record.get('reitingai', []))
+                usernames.update(item.get('vartotojas') for item in record.get('komentarai', []))
+                keywords.update(record.get('raktazodziai', []))
+
+            self.resolve_profiles(usernames)
+            self.resolve_keywords(keywords)
+
+            recipes = Receptas.objects.bulk_create([
+                Receptas(
+                    **{field: record[field] for field in RECIPE_FIELDS},
+                    nuotrauka=record.get('nuotrauka') or None,
+                    profilis_id=self.profiles.get(record.get('autorius')),
+                    sablonas_id=self.templates.get(record.get('sablonas')),
+                )
+                for record in records
+            ])
+
+            # auto_now_add perrašo datą kuriant, todėl originalios datos atkuriamos atskirai
+            dated = []
+            for recipe, record in zip(recipes, records):
+                if record.get('data'):
+                    recipe.data = parse_datetime(record['data'])
+                    dated.append(recipe)
+            Receptas.objects.bulk_update(dated, ['data'])
+
+            links = []
+            ratings = []
+            comments = []
+
+            for recipe, record in zip(recipes, records):
+                for name in dict.fromkeys(record.get('raktazodziai', [])):
+                    links.append(ReceptoRaktazodis(receptas=recipe, raktazodis_id=self.keywords[name]))
+
+                for item in record.get('reitingai', []):
+                    ratings.append(Reitingas(
+                        receptas=recipe,
+                        profilis_id=self.profiles.get(item.get('vartotojas')),
+                        reitingas=item['reitingas'],
+                        favoritas=bool(item.get('favoritas')),
+                    ))
+
+                for item in record.get('komentarai', []):
+                    comment = Komentaras(
+                        receptas=recipe, profilis_id=self.profiles.get(item.get('vartotojas')), turinys=item['turinys'],
+                    )
+                    comments.append((comment, item.get('data')))
+
+            ReceptoRaktazodis.objects.bulk_create(links)
+            Reitingas.objects.bulk_create(ratings, ignore_conflicts=True)
+
+            created_comments = Komentaras.objects.bulk_create([comment for comment, _ in comments])
+            dated_comments = []
+            for comment, (_, data) in zip(created_comments, comments):
+                if data:
+                    comment.data = parse_datetime(data)
+                    dated_comments.append(comment)
+            Komentaras.objects.bulk_update(dated_comments, ['data'])
+
+            recipe_ids = [recipe.id for recipe in recipes]
+            recompute_recipe_aggregates(recipe_ids)
+            recompute_bayes(recipe_ids)
+            recompute_prestige({recipe.profilis_id for recipe in recipes if recipe.profilis_id is not None})
+            index_recipes(recipe_ids)
+
+        return recipe_ids
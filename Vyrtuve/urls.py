@@ -1,16 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from . import views
-from .views import ReceptasDetail
+from .views import AsyncReceptasDetail, ReceptasDetail
+
+# Async view versijos naudojamos tik paleidus per ASGI (Diplominis/asgi.py), žr. VYRTUVE_ASYNC_VIEWS
+if settings.VYRTUVE_ASYNC_VIEWS:
+    index_view = views.index_async
+    recipe_view = AsyncReceptasDetail.as_view()
+    other_profile_view = views.view_other_profile_async
+else:
+    index_view = views.index
+    recipe_view = ReceptasDetail.as_view()
+    other_profile_view = views.view_other_profile
 
 urlpatterns = [
- path('', views.index, name='index'),
+ path('', index_view, name='index'),
  path('register/', views.register_user, name='register'),
  path('profile/', views.get_user_profile, name='user-profile'),
  path('submit-recipe/', views.submit_recipe, name='submit-recipe'),
- path('recipe/<int:pk>/', ReceptasDetail.as_view(), name='recipe'),
- path('recipe/<int:recipe_id>/', ReceptasDetail.as_view(), name='Receptas'),
- path('profile/<str:username>/', views.view_other_profile, name='view-other-profile'),
+ path('recipe/<int:pk>/', recipe_view, name='recipe'),
+ path('recipe/<int:recipe_id>/', recipe_view, name='Receptas'),
+ path('profile/<str:username>/', other_profile_view, name='view-other-profile'),
  path('mano-receptai/', views.mano_receptai, name='mano-receptai'),
+ path('leaderboard/', views.leaderboard, name='leaderboard'),
 ]
 
 
@@ -1,13 +1,26 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
+from django.template.response import TemplateResponse
 from django.views.generic import DetailView
 from django.views.generic.edit import FormMixin
-from django.shortcuts import render, redirect
-from django.core.paginator import Paginator
+from django.shortcuts import aget_object_or_404, get_object_or_404, render, redirect
+from django.utils.functional import SimpleLazyObject
+from django.db.models import Prefetch
 from django.views.decorators.csrf import csrf_protect
-from django.db.models import Q
 
 from .forms import ProfileUpdateForm, UserUpdateForm, RecipeForm, RatingForm, CommentForm
-from .models import User, Receptas, ReceptoRaktazodis, Komentaras, Reitingas, Profilis, Prestizas
+from .models import User, Receptas, ReceptoRaktazodis, Komentaras, Reitingas, Profilis
+from .jobs import enqueue, enqueue_rating_change
+from .caching import cache_alias, cache_timeout, invalidate_listing, profile_version
+from .concurrency import gather
+from .conditional import listing_validators, not_modified, profile_validators, recipe_validators, set_validators
+from .facets import get_facets
+from .leaderboard import profile_rank, tier_leaders
+from .listing import PROFILE_ORDERING, favorite_recipe_ids, get_listing_page, get_profile_page, parse_filters
+from .pagination import cursor_key
+from .recommendations import recommended_recipes
+from .search import index_recipes
+from . import reference
 from .utils import check_pasword
 
 
@@ -18,66 +31,60 @@ def index(request):
     Ji ištraukia duomenis iš URL ir juos priskiria kintamiesiems kurie bus naudojami filtruose
     ir gražina prafiltruotus duomenis kurie bus naudojami index.html.
 
-    Be to ši funkcija irgi pasirūpina index.html elementų rūšiavimu, puslapiavimu ir duplikatų panaikinimu.
+    Filtravimas, paieška ir puslapiavimas pagal žymeklį atliekami listing.py, šoninės juostos skaitikliai - facets.py,
+    o rezultatai laikomi podėlyje (caching.py), todėl dažni filtrų rinkiniai nebeperskaičiuojami kiekvienai užklausai.
+    Nepasikeitęs puslapis atsakomas 304 Not Modified (conditional.py).
     """
+    filters = parse_filters(request.GET, request.user)
 
-    query = request.GET.get('query', '')
+    validators = listing_validators(filters, request)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
 
-    min_rating = request.GET.get('min_rating', None)
+    receptai = get_listing_page(filters, request.GET.get('cursor'), request.user)
+    facets = get_facets(filters, request.user)
 
-    vegetarian = request.GET.get('ar_vegetariskas', None)
-    if vegetarian is not None:
-        vegetarian = vegetarian == 'True'
+    response = render(request, 'index.html', index_context(filters, receptai, facets))
+    return set_validators(response, validators, request.user)
 
-    vegan = request.GET.get('ar_veganiskas', None)
-    if vegan is not None:
-        vegan = vegan == 'True'
 
-    favoritas = request.GET.get('favoritas', None)
-    if favoritas is not None:
-        favoritas = favoritas == 'True'
-
-    recipes = Receptas.objects.all().order_by('-vidutinis_reitingas')
-
-    recipes = recipes.filter(
-        Q(titulas__icontains=query) |
-        Q(aprasas__icontains=query) |
-        Q(ingridientai__icontains=query) |
-        Q(raktazodziai_recepto__raktazodis__raktazodis__icontains=query)
+async def index_async(request):
+    """
+    index_async() yra async index() versija (ASGI). Receptų puslapis ir šoninės juostos skaitikliai
+    vienas nuo kito nepriklauso, todėl gaunami lygiagrečiai (concurrency.gather).
+    """
+    user = request.user = await request.auser()
+    filters = parse_filters(request.GET, user)
+    cursor = request.GET.get('cursor')
+
+    validators = await sync_to_async(listing_validators)(filters, request)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+
+    context = await gather(
+        receptai=lambda: get_listing_page(filters, cursor, user),
+        facets=lambda: get_facets(filters, user),
     )
 
-    if min_rating:
-        recipes = recipes.filter(vidutinis_reitingas__gte=min_rating)
-
-    if vegetarian is not None:
-        recipes = recipes.filter(ar_vegetariskas=vegetarian)
-
-    if vegan is not None:
-        recipes = recipes.filter(ar_veganiskas=vegan)
-
-    if favoritas is not None:
-        favorite_ratings = Reitingas.objects.filter(profilis=request.user.profilis, favoritas=True)
-        favorite_recipes = [rating.receptas for rating in favorite_ratings]
-
-        if favoritas:
-            recipes = recipes.filter(id__in=[recipe.id for recipe in favorite_recipes])
-        else:
-            recipes = recipes.exclude(id__in=[recipe.id for recipe in favorite_recipes])
+    # TemplateResponse Django atvaizduoja sinchroninėje gijoje, todėl šablonas gali naudoti sesiją ir ORM
+    response = TemplateResponse(request, 'index.html', index_context(filters, **context))
+    return set_validators(response, validators, user)
 
-    recipes = recipes.distinct()
 
-    page = request.GET.get('page', 1)
-    paginator = Paginator(recipes, 8)
-    receptai = paginator.get_page(page)
-
-    return render(request, 'index.html', {
+def index_context(filters, receptai, facets):
+    return {
         'receptai': receptai,
-        'query': query,
-        'min_rating': min_rating,
-        'vegetarian': vegetarian,
-        'vegan': vegan,
-        'favoritas': favoritas,
-    })
+        'facets': facets,
+        'query': filters.query,
+        'min_rating': filters.min_rating,
+        'vegetarian': filters.vegetarian,
+        'vegan': filters.vegan,
+        'favoritas': filters.favoritas,
+        'raktazodis': filters.raktazodis,
+        'rusiavimas': filters.rusiavimas,
+    }
 
 
 @csrf_protect
@@ -110,11 +117,8 @@ def register_user(request):
         if User.objects.filter(email=email).exists():
             return redirect('register')
 
-        user = User.objects.create_user(username=username, email=email, password=password)
-
-        default_prestizas = Prestizas.objects.first()
-
-        profilis = Profilis.objects.create(profilis=user, prestizas=default_prestizas)
+        # Profilis su pradiniu prestižu sukuriamas create_profile signale (signals.py)
+        User.objects.create_user(username=username, email=email, password=password)
 
         return redirect('login')
 
@@ -131,22 +135,42 @@ def get_user_profile(request):
         u_form = UserUpdateForm(request.POST, instance=request.user)
 
         if p_form.is_valid() and u_form.is_valid():
-            p_form.save()
             u_form.save()
+            p_form.save()
             return redirect('user-profile')
 
     else:
         p_form = ProfileUpdateForm(instance=request.user.profilis)
         u_form = UserUpdateForm(instance=request.user)
 
+    reference.attach_prestige([request.user.profilis])
+    vieta, profiliu_kiekis = profile_rank(request.user.profilis)
+
     context = {
         'p_form': p_form,
         'u_form': u_form,
+        'vieta': vieta,
+        'profiliu_kiekis': profiliu_kiekis,
     }
 
     return render(request, 'profile.html', context=context)
 
 
+def leaderboard(request):
+    """
+    leaderboard() funkcija pasirūpina lyderių lentelės leaderboard.html template funkcionalumu.
+
+    Rodomi geriausi kiekvieno prestižo lygio autoriai ir prisijungusio vartotojo vieta. Vietos skaičiuojamos
+    iš lyderių lentelės medžio (leaderboard.py), todėl užklausų kiekis nepriklauso nuo profilių kiekio.
+    """
+    context = {'tiers': tier_leaders()}
+
+    if request.user.is_authenticated:
+        context['vieta'], context['profiliu_kiekis'] = profile_rank(request.user.profilis)
+
+    return render(request, 'leaderboard.html', context)
+
+
 @login_required
 def submit_recipe(request):
     """
@@ -162,9 +186,12 @@ def submit_recipe(request):
             recipe.profilis = request.user.profilis
             recipe.save()
 
+            # bulk_create nesiunčia signalų, todėl indeksas, podėlis ir rekomendacijos atnaujinami vieną kartą
             tags = form.cleaned_data['raktazodziai']
-            for tag in tags:
-                ReceptoRaktazodis.objects.create(receptas=recipe, raktazodis=tag)
+            ReceptoRaktazodis.objects.bulk_create([ReceptoRaktazodis(receptas=recipe, raktazodis=tag) for tag in tags])
+            index_recipes([recipe.pk])
+            invalidate_listing()
+            enqueue('recommendations', recipe.pk)
 
             return redirect('index')
 
@@ -175,6 +202,11 @@ def submit_recipe(request):
     return render(request, 'submit_recipe.html', context)
 
 
+def recipe_pk(kwargs):
+    # tas pats view naudojamas 'recipe' (pk) ir 'Receptas' (recipe_id) maršrutams
+    return kwargs.get('pk', kwargs.get('recipe_id'))
+
+
 class ReceptasDetail(FormMixin, DetailView):
     """
     ReceptasDetail() yra klasė kuri pagrinde dirba su visais esamais recipe_detail template ir Receptas modeliu.
@@ -184,13 +216,78 @@ class ReceptasDetail(FormMixin, DetailView):
     model = Receptas
     context_object_name = 'recipe'
     form_class = CommentForm
+    # reference.py kopija, paimta attach_reference()
+    reference_data = None
+
+    def get_queryset(self):
+        """
+        get_queryset() iš karto užkrauna autorių ir recepto raktažodžius, kad template nedarytų papildomų užklausų
+        kiekvienam objektui. Šablonas ir prestižo lygis priskiriami iš reference.py kopijos (attach_reference).
+        """
+        return Receptas.objects.select_related('profilis__profilis').prefetch_related(
+            Prefetch('raktazodziai_recepto', queryset=ReceptoRaktazodis.objects.select_related('raktazodis'))
+        )
+
+    def get_object(self, queryset=None):
+        recipe = super().get_object(queryset)
+        self.attach_reference(recipe)
+        return recipe
+
+    def attach_reference(self, recipe):
+        """
+        attach_reference() priskiria receptui šabloną ir autoriaus prestižo lygį iš reference.py kopijos.
+        Kopija paimama vieną kartą ir naudojama ir komentarų autoriams (get_comments).
+        """
+        self.reference_data = reference.get_reference()
+
+        sablonas = self.reference_data.sablonai_by_id.get(recipe.sablonas_id)
+        if sablonas is not None:
+            recipe.sablonas = sablonas
+
+        reference.attach_prestige([recipe.profilis], self.reference_data)
 
-    def get_context_data(self, **kwargs):
+    def get(self, request, *args, **kwargs):
+        """
+        get() atsako 304 Not Modified, jei receptas, jo rekomendacijos ir autorius nepasikeitė (conditional.py).
+        """
+        validators = recipe_validators(recipe_pk(kwargs), request)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+
+        return set_validators(super().get(request, *args, **kwargs), validators, request.user)
+
+    def context_queries(self, user):
+        """
+        context_queries() gražina vienas nuo kito nepriklausomas konteksto dalis kaip funkcijas.
+        Sinchroninis view jas vykdo paeiliui, o AsyncReceptasDetail - lygiagrečiai.
+        """
+        return {
+            'comments': self.get_comments,
+            'recommended_recipes': lambda: recommended_recipes(self.object),
+            'user_rating': lambda: self.get_user_rating(user),
+        }
+
+    def get_comments(self):
+        comments = list(
+            Komentaras.objects.filter(receptas=self.object).select_related('profilis__profilis').order_by('-data')
+        )
+        reference.attach_prestige((comment.profilis for comment in comments), self.reference_data)
+        return comments
+
+    def get_user_rating(self, user):
+        if not user.is_authenticated:
+            return None
+
+        return Reitingas.objects.filter(receptas=self.object, profilis__profilis=user).first()
+
+    def get_context_data(self, queried=None, **kwargs):
         """
         get_context_data() funkcija pasirūpina visų recepto template funkcionalumu. (recipe detail)
 
         Pagrinde ši funkcija surenka visą reikalingą informaciją (kontekstą) pavaizdavimui template.
         Be to, ji suteikia formas komentarų, reitingų ir favoritų įkėlimui.
+        queried - jau gautos context_queries() reikšmės (async versijoje), kitaip jos užklausiamos čia.
         """
         context = super().get_context_data(**kwargs)
 
@@ -199,11 +296,6 @@ class ReceptasDetail(FormMixin, DetailView):
 
         current_user = self.request.user
 
-        if current_user.is_authenticated:
-            user_profile = current_user.profilis
-        else:
-            user_profile = None
-
         context['current_user'] = current_user
 
         if self.object.profilis:
@@ -211,26 +303,17 @@ class ReceptasDetail(FormMixin, DetailView):
         else:
             context['recipe_user'] = None
 
-        context['comments'] = Komentaras.objects.filter(receptas=self.object).order_by('-data')
+        if queried is None:
+            queried = {name: query() for name, query in self.context_queries(current_user).items()}
 
-        recipe_tags = self.object.raktazodziai_recepto.all()
-        if recipe_tags.exists():
-            recommended_recipes = Receptas.objects.filter(
-                raktazodziai_recepto__raktazodis__in=recipe_tags.values_list('raktazodis', flat=True)).exclude(
-                id=self.object.id)[:4]
-            context['recommended_recipes'] = recommended_recipes
-        else:
-            context['recommended_recipes'] = []
+        context['comments'] = queried['comments']
+        context['recommended_recipes'] = queried['recommended_recipes']
 
-        if user_profile:
-            user_rating = Reitingas.objects.filter(receptas=self.object, profilis=user_profile).first()
+        user_rating = queried['user_rating']
 
-            if user_rating:
-                context['user_rating'] = user_rating.reitingas
-                context['is_favorite'] = user_rating.favoritas
-            else:
-                context['user_rating'] = None
-                context['is_favorite'] = False
+        if user_rating:
+            context['user_rating'] = user_rating.reitingas
+            context['is_favorite'] = user_rating.favoritas
         else:
             context['user_rating'] = None
             context['is_favorite'] = False
@@ -247,12 +330,13 @@ class ReceptasDetail(FormMixin, DetailView):
         get_template_names() funkcija gražina tinkamą template pagal recepto parinktą šabloną.
         """
         sablonas = self.object.sablonas
+        pavadinimas = sablonas.pavadinimas if sablonas else None
 
-        if sablonas.pavadinimas == 'Paprastas':
+        if pavadinimas == 'Paprastas':
             return ['recipe_detail_template_1.html']
-        elif sablonas.pavadinimas == 'Horizontalus':
+        elif pavadinimas == 'Horizontalus':
             return ['recipe_detail_template_2.html']
-        elif sablonas.pavadinimas == 'Dvi nuotraukos':
+        elif pavadinimas == 'Dvi nuotraukos':
             return ['recipe_detail_template_3.html']
         else:
             return ['recipe_detail.html']
@@ -261,8 +345,8 @@ class ReceptasDetail(FormMixin, DetailView):
         """
         post() funkcija pasirūpina visų vartotojo įkeliamais duomenimis recepto (recipe_detai.html) puslapyje.
 
-        Ši funkcija dirba su komentarų, reitingų ir favoritų įkėlimu ir iškviečia funkcijas kurios skaičiuoja
-        reitingų ir favoritų kiekį bei vykdo prestižo taškų skaičiavimus.
+        Ši funkcija dirba su komentarų, reitingų ir favoritų įkėlimu. Reitingų ir favoritų kiekio bei prestižo taškų
+        skaičiavimai įdedami į užduočių eilę (jobs.py) ir atliekami už užklausos ribų.
         """
         self.object = self.get_object()
         comment_form = self.get_form()
@@ -278,24 +362,13 @@ class ReceptasDetail(FormMixin, DetailView):
 
         elif 'rating' in request.POST:
             if rating_form.is_valid():
-                user_profile = request.user.profilis
-                user_rating = Reitingas.objects.filter(receptas=self.object, profilis=user_profile).first()
-
-                if user_rating:
-                    user_rating.reitingas = rating_form.cleaned_data['reitingas']
-                    user_rating.favoritas = rating_form.cleaned_data['favoritas']
-                    user_rating.save()
-                else:
-                    Reitingas.objects.create(
-                        receptas=self.object,
-                        profilis=user_profile,
-                        reitingas=rating_form.cleaned_data['reitingas'],
-                        favoritas=rating_form.cleaned_data['favoritas']
-                    )
-
-                self.object.start_counting()
-
-                user_profile.recalculate_prestige(recipe_id=self.object.id)
+                new_rating = (rating_form.cleaned_data['reitingas'], rating_form.cleaned_data['favoritas'])
+                # dvigubas paspaudimas ar kelios kortelės nebesukelia IntegrityError (Reitingas.upsert),
+                # o skaitiklių užduotys įdedamos į eilę toje pačioje transakcijoje kaip ir balsas
+                Reitingas.upsert(
+                    self.object.id, request.user.profilis.id, *new_rating,
+                    on_write=lambda old_rating: enqueue_rating_change(self.object, old_rating, new_rating),
+                )
 
                 return redirect('Receptas', recipe_id=self.object.id)
 
@@ -318,29 +391,99 @@ class ReceptasDetail(FormMixin, DetailView):
         return self.render_to_response(self.get_context_data(form=form))
 
 
+class AsyncReceptasDetail(ReceptasDetail):
+    """
+    AsyncReceptasDetail yra async ReceptasDetail versija (ASGI). Receptas gaunamas async ORM, o komentarai,
+    rekomendacijos ir vartotojo reitingas - lygiagrečiai (concurrency.gather). POST apdorojamas
+    sinchroniškai, nes jis rašo į duomenų bazę.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user = await request.auser()
+
+        validators = await sync_to_async(recipe_validators)(recipe_pk(kwargs), request)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+
+        self.object = await aget_object_or_404(self.get_queryset(), pk=recipe_pk(kwargs))
+        await sync_to_async(self.attach_reference)(self.object)
+        queried = await gather(**self.context_queries(user))
+
+        return set_validators(self.render_to_response(self.get_context_data(queried=queried)), validators, user)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
 def view_other_profile(request, username):
     """
     view_other_profile() funkcija pasirūpina visų vartotojų viešo profilio profile_view_other.html template funkcionalumu.
 
-    Pagrinde ši funkcija tiesiog surenka visą reikalingą informaciją (kontekstą) pavaizdavimui template.
+    Profilis gaunamas viena užklausa, o favoritai ir įkeltų receptų puslapis yra tinginiai (lazy) - jie užklausiami
+    tik tada, kai atitinkamo fragmento nėra podėlyje. Fragmentų versija padidinama pasikeitus profiliui,
+    jo receptams, favoritams ar prestižui (signals.py, jobs.py).
     """
-    profile = Profilis.objects.get(profilis__username=username)
+    profile = get_object_or_404(Profilis.objects.select_related('profilis'), profilis__username=username)
+    reference.attach_prestige([profile])
+    cursor = request.GET.get('cursor') or ''
 
-    favorite_ratings = Reitingas.objects.filter(profilis=profile, favoritas=True)
+    vieta, profiliu_kiekis = profile_rank(profile)
 
-    favorite_recipes = [rating.receptas for rating in favorite_ratings if rating.receptas is not None]
+    validators = profile_validators(profile, request, vieta)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+
+    context = {
+        'profile': profile,
+        'vieta': vieta,
+        'profiliu_kiekis': profiliu_kiekis,
+        'favorite_recipes': Receptas.objects.filter(id__in=favorite_recipe_ids(profile)).order_by('id')[:4],
+        'uploaded_recipes': SimpleLazyObject(lambda: get_profile_page(profile, cursor or None)),
+        'cursor_key': cursor_key(cursor, PROFILE_ORDERING),
+        'cache_alias': cache_alias(),
+        'cache_timeout': cache_timeout(),
+        'cache_version': profile_version(profile.id),
+    }
 
-    uploaded_recipes = Receptas.objects.filter(profilis=profile)
+    return set_validators(render(request, 'profile_view_other.html', context), validators, request.user)
 
-    favorite_recipes = favorite_recipes[:4]
+
+async def view_other_profile_async(request, username):
+    """
+    view_other_profile_async() yra async view_other_profile() versija (ASGI).
+
+    Favoritai ir įkeltų receptų puslapis lieka tinginiai, nes dažniausiai jų fragmentai yra podėlyje,
+    todėl lygiagrečiai užklausti jų neapsimoka. Atvaizduojama sinchroninėje gijoje (TemplateResponse).
+    """
+    user = request.user = await request.auser()
+    profile = await aget_object_or_404(
+        Profilis.objects.select_related('profilis'), profilis__username=username
+    )
+    await sync_to_async(reference.attach_prestige)([profile])
+    cursor = request.GET.get('cursor') or ''
+
+    vieta, profiliu_kiekis = await sync_to_async(profile_rank)(profile)
+
+    validators = await sync_to_async(profile_validators)(profile, request, vieta)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
 
     context = {
         'profile': profile,
-        'favorite_recipes': favorite_recipes,
-        'uploaded_recipes': uploaded_recipes,
+        'vieta': vieta,
+        'profiliu_kiekis': profiliu_kiekis,
+        'favorite_recipes': Receptas.objects.filter(id__in=favorite_recipe_ids(profile)).order_by('id')[:4],
+        'uploaded_recipes': SimpleLazyObject(lambda: get_profile_page(profile, cursor or None)),
+        'cursor_key': cursor_key(cursor, PROFILE_ORDERING),
+        'cache_alias': cache_alias(),
+        'cache_timeout': cache_timeout(),
+        'cache_version': await sync_to_async(profile_version)(profile.id),
     }
 
-    return render(request, 'profile_view_other.html', context)
+    return set_validators(TemplateResponse(request, 'profile_view_other.html', context), validators, user)
 
 
 @login_required
@@ -354,10 +497,7 @@ def mano_receptai(request):
 
     uploaded_recipes = user_profile.receptai.all()
 
-    favorited_recipes = Receptas.objects.filter(
-        reitingai__profilis=user_profile,
-        reitingai__favoritas=True
-    ).distinct()
+    favorited_recipes = Receptas.objects.filter(id__in=favorite_recipe_ids(user_profile))
 
     context = {
         'uploaded_recipes': uploaded_recipes,